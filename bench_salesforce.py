@@ -0,0 +1,210 @@
+# bench_salesforce.py
+"""
+Offline benchmarks for the Salesforce bridge, run against mock_agent_server.py.
+
+    python bench_salesforce.py --bench tool,llm --iterations 200 --concurrency 8 --json run.json
+    python bench_salesforce.py --bench tool --compare run.json
+
+Reports p50/p95/p99 latency, throughput and Salesforce round-trips per call for
+SalesforceAgentCrewTool._run, SalesforceAgentLLM.call and (with crewai installed) kickoff.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from mock_agent_server import ENDPOINTS, MockAgentServer, MockConfig, _parse_latency_args
+
+BENCHES = ("tool", "llm", "kickoff")
+
+
+# --- Stats ---
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile (p in 0..100); 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(p / 100.0 * len(ordered)) - 1))
+    return ordered[k]
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": (sum(latencies) / len(latencies) * 1000) if latencies else 0.0,
+        "max_ms": max(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+def run_load(fn: Callable[[int], None], iterations: int, concurrency: int):
+    """Call fn(i) `iterations` times on `concurrency` threads; returns (latencies, errors, wall seconds)."""
+    latencies: List[float] = []
+    errors: List[str] = []
+
+    def one(i: int):
+        t0 = time.perf_counter()
+        try:
+            fn(i)
+            latencies.append(time.perf_counter() - t0)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {str(e)[:120]}")
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        list(pool.map(one, range(iterations)))
+    return latencies, errors, time.perf_counter() - t0
+
+
+def _measure(name: str, server: MockAgentServer, fn: Callable[[int], None], iterations: int,
+             concurrency: int, warmup: int) -> dict:
+    for i in range(warmup):
+        try:
+            fn(i)
+        except Exception:
+            pass
+    before = server.stats()
+    latencies, errors, wall = run_load(fn, iterations, concurrency)
+    after = server.stats()
+    sf_calls = after["salesforce_requests"] - before["salesforce_requests"]
+    per_endpoint = {ep: after["requests"][ep] - before["requests"][ep] for ep in ENDPOINTS}
+    return {
+        "bench": name,
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "wall_s": wall,
+        "throughput_per_s": (len(latencies) / wall) if wall else 0.0,
+        "round_trips_per_call": sf_calls / iterations if iterations else 0.0,
+        "requests_by_endpoint": per_endpoint,
+        "sessions_opened": after["sessions_opened"] - before["sessions_opened"],
+        **latency_summary(latencies),
+    }
+
+
+# --- Benchmarks ---
+PROMPTS = [
+    "What time is check-in?",
+    "Is there a kids club and what ages?",
+    "How much is parking?",
+    "When is the spa open?",
+    "What is the cancellation policy?",
+]
+
+
+def bench_tool(server, iterations, concurrency, warmup) -> dict:
+    from salesforce_agent_tool import SalesforceAgentCrewTool
+
+    tool = SalesforceAgentCrewTool(pool_size=concurrency)
+    try:
+        return _measure("tool._run", server, lambda i: tool._run(PROMPTS[i % len(PROMPTS)]),
+                        iterations, concurrency, warmup)
+    finally:
+        tool.close()
+
+
+def bench_llm(server, iterations, concurrency, warmup) -> dict:
+    from salesforce_llm_adapter import SalesforceAgentLLM
+
+    # One adapter (= one Agent session) per worker thread, growing chat history like a crew would
+    local = threading.local()
+
+    def call(i: int):
+        if not hasattr(local, "llm"):
+            local.llm = SalesforceAgentLLM()
+            local.messages = [{"role": "system", "content": "You are the Coral Cloud FAQ assistant."}]
+        local.messages.append({"role": "user", "content": PROMPTS[i % len(PROMPTS)]})
+        reply = local.llm.call(messages=local.messages)
+        local.messages.append({"role": "assistant", "content": reply})
+
+    return _measure("llm.call", server, call, iterations, concurrency, warmup)
+
+
+def bench_kickoff(server, iterations, concurrency, warmup) -> dict:
+    os.environ.setdefault("CREW_LLM_BASE_URL", f"{server.url}/v1")
+    import crew_salesforce_tool_app as app
+
+    messages = [
+        "Family of 4, 3-night stay next month with a historical tour and a seaside dinner.",
+        "We’re planning a March beach wedding for ~50 guests, vegan menu, drone photography.",
+    ]
+    return _measure("kickoff", server, lambda i: app.kickoff(messages[i % len(messages)]),
+                    iterations, concurrency, warmup)
+
+
+BENCH_FUNCS = {"tool": bench_tool, "llm": bench_llm, "kickoff": bench_kickoff}
+
+
+# --- Reporting ---
+def _print_report(results: List[dict], baseline: Optional[Dict[str, dict]] = None):
+    cols = ("p50_ms", "p95_ms", "p99_ms", "throughput_per_s", "round_trips_per_call")
+    print(f"{'bench':<12}" + "".join(f"{c:>22}" for c in cols) + f"{'errors':>8}")
+    for r in results:
+        row = f"{r['bench']:<12}"
+        base = (baseline or {}).get(r["bench"])
+        for c in cols:
+            cell = f"{r[c]:.2f}"
+            if base and base.get(c):
+                cell += f" ({(r[c] - base[c]) / base[c] * 100:+.0f}%)"
+            row += f"{cell:>22}"
+        print(row + f"{r['errors']:>8}")
+
+
+def configure_env(url: str):
+    """Point every SalesforceAgentAPI constructed from env at the mock server."""
+    os.environ["SF_ORG_DOMAIN"] = url
+    os.environ["SF_API_HOST"] = url
+    os.environ.setdefault("SF_CLIENT_ID", "bench-client")
+    os.environ.setdefault("SF_CLIENT_SECRET", "bench-secret")
+    os.environ.setdefault("SF_AGENT_ID", "bench-agent")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline Salesforce bridge benchmarks (mock Agent API).")
+    parser.add_argument("--bench", default="tool,llm", help=f"comma list of {BENCHES}")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--latency", action="append", metavar="ENDPOINT=DIST",
+                        help="mock latency, e.g. all=lognormal:-3,0.5 or messages=fixed:0.2")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-401", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--shape", default="inform")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="previous --json output to diff against")
+    args = parser.parse_args(argv)
+
+    cfg = MockConfig(
+        latency=_parse_latency_args(args.latency or ["all=fixed:0.02"]), error_rate=args.error_rate,
+        rate_401=args.rate_401, rate_429=args.rate_429, shape=args.shape, seed=args.seed,
+    )
+    results = []
+    with MockAgentServer(config=cfg) as server:
+        configure_env(server.url)
+        for name in [b.strip() for b in args.bench.split(",") if b.strip()]:
+            if name not in BENCH_FUNCS:
+                parser.error(f"unknown bench {name!r}")
+            results.append(BENCH_FUNCS[name](server, args.iterations, args.concurrency, args.warmup))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = {r["bench"]: r for r in json.load(f)["results"]}
+    _print_report(results, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "argv": sys.argv[1:], "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+# crew_cassette_llm.py
+from typing import Any, Dict, List, Optional, Union
+
+from crewai import BaseLLM
+
+from salesforce_cassette import Cassette
+
+
+class CassetteLLM(BaseLLM):
+    """
+    Records or replays a CrewAI LLM's calls through a Cassette. Everything except
+    call() is delegated to the wrapped LLM, including the stop words CrewAI sets.
+    """
+
+    def __init__(self, llm: BaseLLM, cassette: Cassette):
+        self._inner = llm
+        self._cassette = cassette
+        super().__init__(model=getattr(llm, "model", "cassette"), temperature=getattr(llm, "temperature", None))
+
+    @property
+    def stop(self) -> List[str]:
+        return getattr(self._inner, "stop", None) or []
+
+    @stop.setter
+    def stop(self, value):
+        # BaseLLM.__init__ assigns this too, before _inner necessarily matters
+        if hasattr(self, "_inner"):
+            self._inner.stop = value
+
+    def call(self, messages: Union[str, List[Dict[str, str]]], tools: Optional[List[dict]] = None,
+             callbacks: Optional[List[Any]] = None, available_functions: Optional[Dict[str, Any]] = None,
+             **kwargs: Any) -> str:
+        request = {"model": self.model, "messages": messages, "tools": tools, "stop": self.stop}
+        return self._cassette.call(
+            "llm", request,
+            lambda: self._inner.call(messages, tools=tools, callbacks=callbacks,
+                                     available_functions=available_functions, **kwargs),
+        )
+
+    def supports_function_calling(self) -> bool:
+        return self._inner.supports_function_calling()
+
+    def supports_stop_words(self) -> bool:
+        return self._inner.supports_stop_words()
+
+    def get_context_window_size(self) -> int:
+        return self._inner.get_context_window_size()
@@ -0,0 +1,233 @@
+# crew_conversation_pipeline.py
+"""
+Pipelined guest <-> Coral Cloud conversations.
+
+The simulation crew runs sequentially, so the customer LLM idles while Einstein
+answers and Einstein idles while the next guest message is written. Here the two
+sides are separate stages, each with its own worker threads, joined by bounded
+queues:
+
+    submit -> [guest queue] -> guest stage -> [answer queue] -> answer stage --+
+                   ^                                                          |
+                   +------------------- next turn ----------------------------+
+
+Many conversations are in flight at once, so both backends stay busy. A
+conversation is only ever in one stage at a time, so its turns stay in order.
+Admission is capped at `max_in_flight` and each queue holds that many items, so
+the feedback edge can never deadlock.
+"""
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+Message = Dict[str, str]
+# (conversation_id, history) -> text. History is from the resort's point of view:
+# "user" = guest, "assistant" = Coral Cloud.
+StageFn = Callable[[str, List[Message]], str]
+
+DEFAULT_GUEST_WORKERS = 2
+DEFAULT_ANSWER_WORKERS = 4
+DEFAULT_MAX_IN_FLIGHT = 16
+
+
+class _Conversation:
+    __slots__ = ("id", "turns", "history", "future", "started", "enqueued")
+
+    def __init__(self, conversation_id: str, turns: int):
+        self.id = conversation_id
+        self.turns = turns
+        self.history: List[Message] = []
+        self.future: Future = Future()
+        self.started = time.perf_counter()
+        self.enqueued = self.started
+
+
+class _Stage:
+    """Worker threads draining one bounded queue, with busy/wait accounting."""
+
+    def __init__(self, name: str, fn: StageFn, workers: int, capacity: int):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, int(workers))
+        self.queue: "queue.Queue" = queue.Queue(maxsize=capacity)
+        self.threads: List[threading.Thread] = []
+        self.lock = threading.Lock()
+        self.busy_s = 0.0
+        self.wait_s = 0.0
+        self.items = 0
+        self.errors = 0
+        self.max_depth = 0
+
+    def put(self, conv: _Conversation):
+        conv.enqueued = time.perf_counter()
+        self.queue.put(conv)
+        depth = self.queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def record(self, waited: float, busy: float, ok: bool):
+        with self.lock:
+            self.wait_s += waited
+            self.busy_s += busy
+            self.items += 1
+            if not ok:
+                self.errors += 1
+
+    def stats(self, wall: float) -> dict:
+        with self.lock:
+            busy, wait, items, errors = self.busy_s, self.wait_s, self.items, self.errors
+        return {
+            "workers": self.workers,
+            "items": items,
+            "errors": errors,
+            "utilization": busy / (self.workers * wall) if wall > 0 else 0.0,
+            "avg_service_s": busy / items if items else 0.0,
+            "avg_queue_wait_s": wait / items if items else 0.0,
+            "queued": self.queue.qsize(),
+            "max_queue_depth": self.max_depth,
+        }
+
+
+class ConversationPipeline:
+    """
+    guest_fn writes the next guest message, answer_fn produces the Coral Cloud
+    reply; both get (conversation_id, history). on_end(conversation_id) runs once
+    per conversation (e.g. to end its Agent session).
+    """
+
+    def __init__(self, guest_fn: StageFn, answer_fn: StageFn,
+                 guest_workers: int = DEFAULT_GUEST_WORKERS, answer_workers: int = DEFAULT_ANSWER_WORKERS,
+                 max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, on_end: Optional[Callable[[str], None]] = None):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.on_end = on_end
+        self._guest = _Stage("guest", guest_fn, guest_workers, self.max_in_flight)
+        self._answer = _Stage("answer", answer_fn, answer_workers, self.max_in_flight)
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._lock = threading.Lock()
+        self._started_at: Optional[float] = None
+        self._closed = False
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._turns = 0
+        self._latency_s = 0.0
+
+    # --- Lifecycle ---
+    def start(self) -> "ConversationPipeline":
+        if self._started_at is None:
+            self._started_at = time.perf_counter()
+            for stage, nxt in ((self._guest, self._answer), (self._answer, None)):
+                for i in range(stage.workers):
+                    t = threading.Thread(target=self._worker, args=(stage, nxt),
+                                         name=f"pipeline-{stage.name}-{i}", daemon=True)
+                    t.start()
+                    stage.threads.append(t)
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def submit(self, turns: int = 1, conversation_id: Optional[str] = None) -> Future:
+        """Start a conversation of `turns` guest/Coral Cloud exchanges. Blocks while max_in_flight are running."""
+        if self._closed:
+            raise RuntimeError("pipeline is shut down")
+        self.start()
+        self._slots.acquire()
+        conv = _Conversation(conversation_id or f"pipe-{uuid.uuid4()}", max(1, int(turns)))
+        with self._lock:
+            self._in_flight += 1
+        self._guest.put(conv)
+        return conv.future
+
+    def run(self, conversations: int, turns: int = 1) -> List[List[Message]]:
+        """Run `conversations` conversations to completion; returns their transcripts (failures raise)."""
+        futures = [self.submit(turns) for _ in range(conversations)]
+        return [f.result() for f in futures]
+
+    def shutdown(self):
+        """Stop the workers once everything already submitted has finished."""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in range(self.max_in_flight):
+            self._slots.acquire()  # every conversation is done; the queues are empty
+        for stage in (self._guest, self._answer):
+            for _ in stage.threads:
+                stage.queue.put(None)
+        for stage in (self._guest, self._answer):
+            for t in stage.threads:
+                t.join()
+
+    # --- Workers ---
+    def _worker(self, stage: _Stage, nxt: Optional[_Stage]):
+        while True:
+            conv = stage.queue.get()
+            if conv is None:
+                return
+            start = time.perf_counter()
+            error = None
+            try:
+                text = stage.fn(conv.id, list(conv.history))
+            except BaseException as e:
+                error = e
+            stage.record(start - conv.enqueued, time.perf_counter() - start, error is None)
+            if error is not None:
+                self._finish(conv, error)
+                continue
+            if nxt is not None:
+                conv.history.append({"role": "user", "content": str(text)})
+                nxt.put(conv)
+                continue
+            conv.history.append({"role": "assistant", "content": str(text)})
+            with self._lock:
+                self._turns += 1
+            if len(conv.history) // 2 < conv.turns:
+                self._guest.put(conv)
+            else:
+                self._finish(conv)
+
+    def _finish(self, conv: _Conversation, error: Optional[BaseException] = None):
+        if self.on_end is not None:
+            try:
+                self.on_end(conv.id)
+            except Exception:
+                pass
+        with self._lock:
+            self._in_flight -= 1
+            if error is None:
+                self._completed += 1
+                self._latency_s += time.perf_counter() - conv.started
+            else:
+                self._failed += 1
+        if error is None:
+            conv.future.set_result(conv.history)
+        else:
+            conv.future.set_exception(error)
+        self._slots.release()
+
+    def stats(self) -> dict:
+        """Throughput, per-stage utilization and how much stage work overlapped."""
+        wall = time.perf_counter() - self._started_at if self._started_at is not None else 0.0
+        with self._lock:
+            completed, failed, in_flight, turns, latency = (
+                self._completed, self._failed, self._in_flight, self._turns, self._latency_s)
+        guest, answer = self._guest.stats(wall), self._answer.stats(wall)
+        busy = sum(st["avg_service_s"] * st["items"] for st in (guest, answer))
+        return {
+            "elapsed_s": wall,
+            "completed": completed,
+            "failed": failed,
+            "in_flight": in_flight,
+            "turns": turns,
+            "conversations_per_hour": completed * 3600.0 / wall if wall > 0 else 0.0,
+            "avg_conversation_s": latency / completed if completed else 0.0,
+            # Stage work done per second of wall time; a sequential run is ~1.0
+            "overlap": busy / wall if wall > 0 else 0.0,
+            "stages": {"guest": guest, "answer": answer},
+        }
@@ -1,119 +1,302 @@
 # crew_salesforce_app.py
 import os, re
-from dotenv import load_dotenv, find_dotenv
-from crewai import Agent, Task, Crew, Process, LLM
+import threading
+import uuid
+from types import SimpleNamespace
+from typing import Optional
 
+from startup_profile import phase
 
-from salesforce_agent_API import SalesforceAgentAPI
-from salesforce_crew_llm import SalesforceCrewLLM
+# Nothing (crewai, LLMs, the Salesforce client) is built until the crew is needed
+_build_lock = threading.Lock()
+_sim: Optional[SimpleNamespace] = None
 
-load_dotenv(find_dotenv(), override=False)
 
-# ---------- LLMs ----------
-# Customer "mind" (any provider you prefer; keeping HF 8B w/ tight tokens)
-customer_llm = LLM(
-    provider="huggingface",
-    model="huggingface/meta-llama/Meta-Llama-3-8B-Instruct",
-    api_key=os.getenv("HF_TOKEN"),
-    max_tokens=220,
-    temperature=0.7,
-)
+def _build() -> SimpleNamespace:
+    with phase("load .env"):
+        from dotenv import load_dotenv, find_dotenv
+        load_dotenv(find_dotenv(), override=False)
+    with phase("import crewai"):
+        from crewai import Agent, Task, Crew, Process, LLM
+        import tracing
+        tracing.instrument_crewai()
+    with phase("import salesforce llm"):
+        from salesforce_agent_API import SalesforceAgentAPI
+        from salesforce_crew_llm import SalesforceCrewLLM
+        from salesforce_cassette import maybe_wrap_llm
+        from salesforce_faq_index import faq_index_from_env
 
-# Coral Cloud agent "mind" (Salesforce Einstein via your bridge)
-sf_llm = SalesforceCrewLLM(api=SalesforceAgentAPI())
-
-# ---------- Agents ----------
-# 1) Customer Simulator: generates one crisp, on-topic resort question
-customer = Agent(
-    role="Guest Trip Planner",
-    goal=(
-        "Compose a single, clear question to Coral Cloud Resort to plan a stay, "
-        "including relevant details (party size, dates or timeframe, room type, "
-        "amenities/activities, dining preferences) that are likely covered by resort FAQs."
-    ),
-    backstory=(
-        "You are a prospective guest planning a vacation at Coral Cloud Resort. "
-        "Stay strictly within resort-relevant topics: rooms/suites, check-in/out, amenities "
-        "(pool, spa, fitness, kids club), water sports/activities, resort/local tours offered "
-        "through the resort, on-site dining (including seaside dinners), basic transport/parking, "
-        "policies (cancellations, deposits), and how to start booking. "
-        "Avoid non-resort topics such as flights, third-party attractions, car rentals, or discounts "
-        "not mentioned in FAQs."
-    ),
-    llm=customer_llm,
-    allow_delegation=False,
-    verbose=False,
-    memory=False,
-)
+    with phase("build llms, agents, tasks and crew"):
+        # ---------- LLMs ----------
+        # Customer "mind" (any provider you prefer; keeping HF 8B w/ tight tokens)
+        customer_llm = maybe_wrap_llm(LLM(
+            provider="huggingface",
+            model="huggingface/meta-llama/Meta-Llama-3-8B-Instruct",
+            api_key=os.getenv("HF_TOKEN"),
+            max_tokens=220,
+            temperature=0.7,
+        ))
 
-# 2) Coral Cloud FAQ Agent: answers only if within FAQ scope
-coral_cloud = Agent(
-    role="Coral Cloud FAQ Specialist",
-    goal=(
-        "Answer Coral Cloud Resort FAQ questions accurately, concisely, and helpfully. "
-        "Stay strictly within published FAQs and allowed service information."
-    ),
-    backstory=(
-        "You are the embedded Coral Cloud Resort assistant connected to Salesforce Einstein Agent. "
-        "You ONLY cover official FAQ topics (rooms, rates/policies, check-in/out, amenities, dining, "
-        "spa & fitness, water sports/activities, family options, resort/local tours offered by the resort, "
-        "parking/transport basics, contact/booking steps). "
-        "If a request is outside FAQs or requires staff action (custom packages, price quotes not listed, "
-        "availability holds), say you can only handle FAQs and provide the correct next steps (phone/email/booking link). "
-        "Keep answers friendly and structured with short headings and bullet points."
-    ),
-    llm=sf_llm,
-    allow_delegation=False,
-    verbose=False,
-    memory=False,
-)
+        # Coral Cloud agent "mind" (Salesforce Einstein via your bridge)
+        sf_llm = SalesforceCrewLLM(api=SalesforceAgentAPI())
+        # Harvested FAQ answers (SF_FAQ_INDEX), checked on raw guest messages before the crew runs
+        faq = faq_index_from_env()
 
-# ---------- Tasks ----------
-customer_task = Task(
-    description=(
-        "Create ONE guest message to Coral Cloud Resort asking about planning a vacation. "
-        "Must include:\n"
-        "- party size (e.g., 2 adults + 2 kids),\n"
-        "- stay length/timeframe (e.g., 3 nights in late November),\n"
-        "- at least two interest areas (e.g., family suite, kids club, water sports, historical tour, seaside dinner).\n\n"
-        "Constraints:\n"
-        "- Only resort-relevant topics (rooms, amenities, dining, spa, activities, tours offered by the resort, check-in/out, policies, basic transport/parking, how to book).\n"
-        "- 1–2 sentences max. No preamble, no bullet points. Return ONLY the message text you would send to the resort."
-    ),
-    agent=customer,
-    expected_output="A single-line or two-sentence guest question suitable to send to Coral Cloud Resort.",
-)
+        # ---------- Agents ----------
+        # 1) Customer Simulator: generates one crisp, on-topic resort question
+        customer = Agent(
+            role="Guest Trip Planner",
+            goal=(
+                "Compose a single, clear question to Coral Cloud Resort to plan a stay, "
+                "including relevant details (party size, dates or timeframe, room type, "
+                "amenities/activities, dining preferences) that are likely covered by resort FAQs."
+            ),
+            backstory=(
+                "You are a prospective guest planning a vacation at Coral Cloud Resort. "
+                "Stay strictly within resort-relevant topics: rooms/suites, check-in/out, amenities "
+                "(pool, spa, fitness, kids club), water sports/activities, resort/local tours offered "
+                "through the resort, on-site dining (including seaside dinners), basic transport/parking, "
+                "policies (cancellations, deposits), and how to start booking. "
+                "Avoid non-resort topics such as flights, third-party attractions, car rentals, or discounts "
+                "not mentioned in FAQs."
+            ),
+            llm=customer_llm,
+            allow_delegation=False,
+            verbose=False,
+            memory=False,
+        )
+
+        # 2) Coral Cloud FAQ Agent: answers only if within FAQ scope
+        coral_cloud = Agent(
+            role="Coral Cloud FAQ Specialist",
+            goal=(
+                "Answer Coral Cloud Resort FAQ questions accurately, concisely, and helpfully. "
+                "Stay strictly within published FAQs and allowed service information."
+            ),
+            backstory=(
+                "You are the embedded Coral Cloud Resort assistant connected to Salesforce Einstein Agent. "
+                "You ONLY cover official FAQ topics (rooms, rates/policies, check-in/out, amenities, dining, "
+                "spa & fitness, water sports/activities, family options, resort/local tours offered by the resort, "
+                "parking/transport basics, contact/booking steps). "
+                "If a request is outside FAQs or requires staff action (custom packages, price quotes not listed, "
+                "availability holds), say you can only handle FAQs and provide the correct next steps (phone/email/booking link). "
+                "Keep answers friendly and structured with short headings and bullet points."
+            ),
+            llm=sf_llm,
+            allow_delegation=False,
+            verbose=False,
+            memory=False,
+        )
+
+        # ---------- Tasks ----------
+        customer_task = Task(
+            description=(
+                "Create ONE guest message to Coral Cloud Resort asking about planning a vacation. "
+                "Must include:\n"
+                "- party size (e.g., 2 adults + 2 kids),\n"
+                "- stay length/timeframe (e.g., 3 nights in late November),\n"
+                "- at least two interest areas (e.g., family suite, kids club, water sports, historical tour, seaside dinner).\n\n"
+                "Constraints:\n"
+                "- Only resort-relevant topics (rooms, amenities, dining, spa, activities, tours offered by the resort, check-in/out, policies, basic transport/parking, how to book).\n"
+                "- 1–2 sentences max. No preamble, no bullet points. Return ONLY the message text you would send to the resort."
+            ),
+            agent=customer,
+            expected_output="A single-line or two-sentence guest question suitable to send to Coral Cloud Resort.",
+        )
+
+        coral_cloud_task = Task(
+            description=(
+                "You are Coral Cloud’s FAQ assistant. Reply to the guest message below.\n\n"
+                "Rules:\n"
+                "- If info is missing, ask up to 2 brief clarifying questions first, then answer.\n"
+                "- If the request is outside FAQs or needs staff intervention, say so and provide contact/next steps.\n"
+                "- Use short headings and bullet points; keep it friendly and concise.\n\n"
+                "Guest message:\n{customer_message}"
+            ),
+            agent=coral_cloud,
+            expected_output=(
+                "A friendly, structured answer with short headings and bullet points. "
+                "If out of scope, a brief note plus contact/booking steps."
+            ),
+        )
+
+        # ---------- Crew orchestration ----------
+        crew = Crew(
+            agents=[customer, coral_cloud],
+            tasks=[customer_task, coral_cloud_task],
+            process=Process.sequential,
+            verbose=True,
+        )
+
+        # Coral Cloud agent alone, answering a guest message supplied as {customer_message}
+        faq_crew = Crew(
+            agents=[coral_cloud],
+            tasks=[coral_cloud_task],
+            process=Process.sequential,
+            verbose=False,
+        )
+
+    return SimpleNamespace(
+        customer_llm=customer_llm, sf_llm=sf_llm, customer=customer, coral_cloud=coral_cloud,
+        customer_task=customer_task, coral_cloud_task=coral_cloud_task, crew=crew, faq_crew=faq_crew, faq=faq,
+    )
+
+
+def get_simulation() -> SimpleNamespace:
+    """Build (once) and return the LLMs, agents, tasks and crew."""
+    global _sim
+    if _sim is None:
+        with _build_lock:
+            if _sim is None:
+                with phase("build simulation"):
+                    _sim = _build()
+    return _sim
+
+
+def is_built() -> bool:
+    return _sim is not None
+
+
+def __getattr__(name):
+    # `crew_salesforce_agent_interaction.crew` etc. still work, built on first access
+    if name in ("customer_llm", "sf_llm", "customer", "coral_cloud", "customer_task", "coral_cloud_task", "crew",
+                "faq_crew", "faq"):
+        return getattr(get_simulation(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+_thread_crews = threading.local()
+
+
+def _get_crews():
+    """(crew, faq_crew) for this thread: Crew.kickoff mutates task state, so worker threads use copies."""
+    sim = get_simulation()
+    if threading.current_thread() is threading.main_thread():
+        return sim.crew, sim.faq_crew
+    crews = getattr(_thread_crews, "crews", None)
+    if crews is None:
+        crews = _thread_crews.crews = (sim.crew.copy(), sim.faq_crew.copy())
+    return crews
+
+
+def _run_conversation(crew, inputs=None, conversation_id=None, end_session=True):
+    # One Agent session per run, ended afterwards, so concurrent runs never share a session.
+    # With end_session=False (and an explicit conversation_id) the session stays open for the
+    # next turn; the caller ends it with sf_llm.end_conversation(conversation_id).
+    from salesforce_conversations import conversation
+
+    import tracing
+
+    key = conversation_id or f"sim-{uuid.uuid4()}"
+    try:
+        with tracing.trace_run("conversation", "run", conversation_id=key), conversation(key):
+            return crew.kickoff(inputs=inputs) if inputs else crew.kickoff()
+    finally:
+        if end_session or conversation_id is None:
+            try:
+                get_simulation().sf_llm.end_conversation(key)
+            except Exception:
+                pass
+
+
+def _local_answer(message: str) -> Optional[str]:
+    faq = get_simulation().faq
+    match = faq.lookup(message) if faq is not None else None
+    return match.answer if match is not None else None
+
+
+def answer_guest(message: str, conversation_id=None, end_session=True):
+    """
+    Have the Coral Cloud agent answer one guest message (from the FAQ index when it is confident).
+    Pass end_session=False with a conversation_id to keep the Agent session (and its context) for
+    follow-up messages.
+    """
+    local = _local_answer(message)
+    if local is not None:
+        return local
+    return _run_conversation(_get_crews()[1], {"customer_message": message}, conversation_id, end_session)
 
-coral_cloud_task = Task(
-    description=(
-        "You are Coral Cloud’s FAQ assistant. Reply to the guest message below.\n\n"
-        "Rules:\n"
-        "- If info is missing, ask up to 2 brief clarifying questions first, then answer.\n"
-        "- If the request is outside FAQs or needs staff intervention, say so and provide contact/next steps.\n"
-        "- Use short headings and bullet points; keep it friendly and concise.\n\n"
-        "Guest message:\n{customer_message}"
-    ),
-    agent=coral_cloud,
-    expected_output=(
-        "A friendly, structured answer with short headings and bullet points. "
-        "If out of scope, a brief note plus contact/booking steps."
-    ),
-)
 
-# ---------- Crew orchestration ----------
-crew = Crew(
-    agents=[customer, coral_cloud],
-    tasks=[customer_task, coral_cloud_task],
-    process=Process.sequential,
-    verbose=True,
+def faq_stats() -> dict:
+    """Local-answer and fall-through counters of the FAQ index ({} when none is loaded)."""
+    if not is_built() or get_simulation().faq is None:
+        return {}
+    return get_simulation().faq.stats()
+
+
+def simulate(conversation_id=None):
+    """Customer agent writes one guest question; the Coral Cloud agent answers it via Salesforce."""
+    from salesforce_scheduler import BATCH, priority
+
+    # runs customer_task then coral_cloud_task with no inputs yet; simulated traffic
+    # yields Agent API capacity to live guests
+    with priority(BATCH):
+        return _run_conversation(_get_crews()[0], None, conversation_id)
+
+
+# --- Pipelined simulation ---
+GUEST_FOLLOW_UP = (
+    "You are the same prospective Coral Cloud Resort guest. Read the resort's last reply and write your "
+    "next message in 1-2 sentences, staying on resort FAQ topics. Return ONLY the message text."
 )
 
+
+def _guest_stage(conversation_id: str, history):
+    sim = get_simulation()
+    if not history:
+        prompt = [{"role": "system", "content": sim.customer.backstory},
+                  {"role": "user", "content": sim.customer_task.description}]
+    else:
+        # From the guest's side the resort is the "user"
+        flipped = [{"role": "assistant" if m["role"] == "user" else "user", "content": m["content"]}
+                   for m in history]
+        prompt = [{"role": "system", "content": GUEST_FOLLOW_UP}] + flipped
+    return str(sim.customer_llm.call(prompt) or "").strip()
+
+
+def _answer_stage(conversation_id: str, history):
+    from salesforce_scheduler import BATCH, priority
+
+    # Only opening questions stand on their own; follow-ups depend on the conversation
+    local = _local_answer(history[-1]["content"]) if len(history) == 1 else None
+    if local is not None:
+        return local
+    sim = get_simulation()
+    system = {"role": "system", "content": sim.coral_cloud.backstory}
+    with priority(BATCH):
+        return sim.sf_llm.call(messages=[system] + history, conversation_id=conversation_id)
+
+
+def build_pipeline(guest_workers: int = 2, answer_workers: int = 4, max_in_flight: int = 16):
+    """
+    Pipelined engine over the same two LLMs as `crew`: the customer LLM and the
+    Salesforce agent work on different conversations at the same time instead of
+    taking turns. Call the LLMs directly with each agent's brief (no ReAct loop).
+    """
+    from crew_conversation_pipeline import ConversationPipeline
+
+    sim = get_simulation()
+    return ConversationPipeline(
+        _guest_stage, _answer_stage,
+        guest_workers=guest_workers, answer_workers=answer_workers, max_in_flight=max_in_flight,
+        on_end=sim.sf_llm.end_conversation,
+    )
+
+
+def simulate_many(conversations: int, turns: int = 1, guest_workers: int = 2, answer_workers: int = 4,
+                  max_in_flight: int = 16):
+    """Run many simulated conversations through the pipeline; returns (transcripts, stats)."""
+    with build_pipeline(guest_workers, answer_workers, max_in_flight) as pipe:
+        futures = [pipe.submit(turns) for _ in range(conversations)]
+        transcripts = []
+        for f in futures:
+            try:
+                transcripts.append(f.result())
+            except Exception as e:
+                transcripts.append({"error": f"{type(e).__name__}: {e}"})
+    return transcripts, pipe.stats()
+
+
 if __name__ == "__main__":
     # Run the first task to get the customer's message
-    result1 = crew.kickoff()  # runs customer_task then coral_cloud_task with no inputs yet    
-
-    # Always close Salesforce session at the end
-    try:
-        sf_llm.close()
-    except Exception:
-        pass
\ No newline at end of file
+    result1 = simulate()
@@ -0,0 +1,240 @@
+# crew_salesforce_cli.py
+"""
+Single entry point for the Coral Cloud / Salesforce bridge.
+
+    python crew_salesforce_cli.py route "We're planning a beach wedding for 50 guests"
+    python crew_salesforce_cli.py route --label-only "Family of 4, 3 nights, kids club?"
+    python crew_salesforce_cli.py route --batch messages.jsonl --out results.jsonl
+    python crew_salesforce_cli.py ask "What time is check-in?" --stream
+    python crew_salesforce_cli.py simulate
+    python crew_salesforce_cli.py simulate --conversations 40 --turns 3 --answer-workers 8
+    python crew_salesforce_cli.py bench --bench tool,llm --iterations 50
+    python crew_salesforce_cli.py serve --port 8080 --workers 4
+    python crew_salesforce_cli.py loadsim --mock --rate 2 --duration 60
+    python crew_salesforce_cli.py faq-index runs/peak.db faq.jsonl --out runs/faq.idx
+    python crew_salesforce_cli.py faq-index --out runs/faq.idx --query "What time is check-in?"
+
+--trace FILE (or SF_TRACE=FILE) records nested spans for each kickoff or
+conversation in Chrome trace format and prints the last run's critical path.
+
+Only the stdlib is imported up front; crewai, the LLMs, agents and crews are built
+the first time a command needs them. --timings (or SF_STARTUP_TIMINGS=1) prints a
+startup-time breakdown to stderr.
+"""
+import startup_profile  # first, so T0 is as early as possible
+
+import argparse
+import json
+import os
+import sys
+
+from startup_profile import phase
+
+
+# --- Commands ---
+def cmd_route(args) -> int:
+    if args.speculative:
+        os.environ["CREW_SPECULATIVE"] = "1"
+    with phase("import app"):
+        import crew_salesforce_tool_app as app
+    try:
+        return _route(app, args)
+    finally:
+        if app.speculation_stats():
+            print("speculation: " + json.dumps(app.speculation_stats()), file=sys.stderr)
+
+
+def _route(app, args) -> int:
+    if args.batch:
+        out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+        try:
+            for res in app.iter_kickoff_many(app.read_jsonl_messages(args.batch), max_workers=args.max_workers):
+                out.write(json.dumps(res, ensure_ascii=False) + "\n")
+                out.flush()
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        return 0
+
+    if not args.message:
+        print("route: a message or --batch is required", file=sys.stderr)
+        return 2
+    message = " ".join(args.message)
+    if args.label_only:
+        # Confident local classifications never build a crew (or import crewai)
+        with phase("route"):
+            print(app.route_message(message))
+        return 0
+    with phase("kickoff"):
+        print(app.kickoff(message))
+    return 0
+
+
+def cmd_ask(args) -> int:
+    """Ask the Salesforce Agent directly: no crewai, one session, ended on exit."""
+    with phase("import salesforce llm"):
+        from salesforce_llm_adapter import SalesforceAgentLLM
+    with phase("build client"):
+        from salesforce_faq_index import faq_index_from_env
+        llm = SalesforceAgentLLM(faq=faq_index_from_env())
+
+    def _echo(chunk: str):
+        sys.stdout.write(chunk)
+        sys.stdout.flush()
+
+    try:
+        with phase("ask"):
+            if args.stream:
+                llm.call_stream(prompt=" ".join(args.message), stream_callback=_echo)
+                print()
+            else:
+                print(llm.call(prompt=" ".join(args.message)))
+    finally:
+        llm.close()
+    return 0
+
+
+def cmd_simulate(args) -> int:
+    with phase("import simulation"):
+        import crew_salesforce_agent_interaction as interaction
+    if args.conversations > 1 or args.turns > 1:
+        with phase("simulate pipelined"):
+            transcripts, stats = interaction.simulate_many(
+                args.conversations, args.turns, args.guest_workers, args.answer_workers, args.max_in_flight)
+        for t in transcripts:
+            print(json.dumps(t, ensure_ascii=False))
+        print("pipeline: " + json.dumps(stats), file=sys.stderr)
+        return 0
+    with phase("simulate"):
+        result = interaction.simulate()
+    print(result)
+    return 0
+
+
+def cmd_faq_index(args) -> int:
+    with phase("import faq index"):
+        import salesforce_faq_index as faq_index
+    if args.sources:
+        with phase("build faq index"):
+            summary = faq_index.rebuild(args.out, args.sources, min_count=args.min_count,
+                                        first_turn_only=not args.all_turns)
+        print(json.dumps(summary))
+    if args.query:
+        index = faq_index.FaqIndex(args.out, threshold=args.threshold)
+        try:
+            for m in index.search(args.query, k=args.top):
+                mark = "local" if m.confidence >= index.threshold else "fall-through"
+                print(json.dumps(dict(m.as_dict(), decision=mark), ensure_ascii=False))
+        finally:
+            index.close()
+    elif not args.sources:
+        print("faq-index: give sources to build from and/or --query", file=sys.stderr)
+        return 2
+    return 0
+
+
+def cmd_bench(args) -> int:
+    with phase("import bench"):
+        import bench_salesforce
+    return bench_salesforce.main(args.passthrough)
+
+
+def cmd_loadsim(args) -> int:
+    with phase("import load simulator"):
+        import load_simulator
+    return load_simulator.main(args.passthrough)
+
+
+def cmd_serve(args) -> int:
+    with phase("import server"):
+        import crew_salesforce_server
+    return crew_salesforce_server.main(args.passthrough)
+
+
+# --- Entry point ---
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Coral Cloud resort crews backed by the Salesforce Agent API.")
+    parser.add_argument("--timings", action="store_true", help="print a startup-time breakdown to stderr")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="append Chrome trace events for each kickoff to FILE and print its critical path (SF_TRACE)")
+    parser.add_argument("--cassette", help="record/replay Salesforce and LLM traffic in this file (SF_CASSETTE)")
+    parser.add_argument("--cassette-mode", choices=("record", "replay", "auto"),
+                        help="record, replay (default) or auto = replay hits and record misses")
+    parser.add_argument("--cassette-latency", type=float,
+                        help="replay delay as a multiple of the recorded time (0 = none, 1 = original)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("route", help="route guest message(s) to the wedding/vacation crews")
+    p.add_argument("message", nargs="*")
+    p.add_argument("--label-only", action="store_true", help="print only the chosen flow")
+    p.add_argument("--batch", help="JSONL file of messages ({\"message\": ...} or a JSON string per line)")
+    p.add_argument("--out", help="write JSONL results here (default: stdout)")
+    p.add_argument("--max-workers", type=int, default=4)
+    p.add_argument("--speculative", action="store_true",
+                   help="start the guessed flow crew while the LLM router runs (CREW_SPECULATIVE=1)")
+    p.set_defaults(func=cmd_route)
+
+    p = sub.add_parser("ask", help="send one question straight to the Salesforce Agent")
+    p.add_argument("message", nargs="+")
+    p.add_argument("--stream", action="store_true", help="print the reply as it streams in")
+    p.set_defaults(func=cmd_ask)
+
+    p = sub.add_parser("simulate", help="customer agent asks, Coral Cloud agent answers via Salesforce")
+    p.add_argument("--conversations", type=int, default=1,
+                   help="run this many conversations through the pipelined engine (JSONL transcripts)")
+    p.add_argument("--turns", type=int, default=1, help="guest/Coral Cloud exchanges per conversation")
+    p.add_argument("--guest-workers", type=int, default=2, help="concurrent customer-LLM calls")
+    p.add_argument("--answer-workers", type=int, default=4, help="concurrent Salesforce Agent calls")
+    p.add_argument("--max-in-flight", type=int, default=16, help="conversations admitted at once")
+    p.set_defaults(func=cmd_simulate)
+
+    p = sub.add_parser("faq-index", help="rebuild the local FAQ index from recorded traffic, or query it")
+    p.add_argument("sources", nargs="*", help="cassette files and/or JSONL files of {\"question\", \"answer\"}")
+    p.add_argument("--out", default=os.getenv("SF_FAQ_INDEX", "faq.idx"), help="index file (default: SF_FAQ_INDEX)")
+    p.add_argument("--min-count", type=int, default=1, help="drop questions seen fewer times than this")
+    p.add_argument("--all-turns", action="store_true", help="also harvest follow-up turns, not just openers")
+    p.add_argument("--query", help="show the best matches for this question")
+    p.add_argument("--top", type=int, default=3)
+    p.add_argument("--threshold", type=float, help="confidence needed to answer locally (SF_FAQ_THRESHOLD)")
+    p.set_defaults(func=cmd_faq_index)
+
+    # Everything after `bench` / `loadsim` / `serve` is handed to the target script untouched (see main)
+    p = sub.add_parser("bench", help="offline benchmarks (arguments are passed to bench_salesforce.py)", add_help=False)
+    p.set_defaults(func=cmd_bench)
+
+    p = sub.add_parser("loadsim", help="open-loop guest load simulation (arguments go to load_simulator.py)",
+                       add_help=False)
+    p.set_defaults(func=cmd_loadsim)
+
+    p = sub.add_parser("serve", help="long-running HTTP service (arguments are passed to crew_salesforce_server.py)",
+                       add_help=False)
+    p.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.command in ("bench", "loadsim", "serve"):
+        args.passthrough = extra
+    elif extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    # Cassette settings travel as env vars so lazily-built clients and LLMs pick them up
+    for flag, env in (("cassette", "SF_CASSETTE"), ("cassette_mode", "SF_CASSETTE_MODE"),
+                      ("cassette_latency", "SF_CASSETTE_LATENCY"), ("trace", "SF_TRACE")):
+        if getattr(args, flag) is not None:
+            os.environ[env] = str(getattr(args, flag))
+    timings = args.timings or os.getenv("SF_STARTUP_TIMINGS", "").lower() in ("1", "true", "yes")
+    try:
+        return args.func(args)
+    finally:
+        if timings:
+            print(startup_profile.report(f"crew_salesforce_cli {args.command}"), file=sys.stderr)
+        if os.getenv("SF_TRACE"):
+            import tracing
+            if tracing.last_report():
+                print(tracing.format_report(tracing.last_report()), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,410 @@
+# crew_salesforce_server.py
+"""
+Long-running HTTP service: crews, the Salesforce tool, its warm session pool and
+the access token are built once and reused by every request.
+
+    python crew_salesforce_server.py --port 8080 --workers 4 --queue-size 16
+
+    POST /v1/kickoff   {"message": "..."}  route + run the wedding/vacation crew
+    POST /v1/faq       {"message": "..."}  Coral Cloud FAQ agent answers a guest message
+    POST /v1/simulate  {}                  customer agent asks, Coral Cloud agent answers
+    GET  /healthz                          process is up
+    GET  /readyz                           warmed up and accepting work (503 otherwise)
+
+Work runs on a fixed pool of worker threads behind a bounded queue; when the queue
+is full new requests get 503 with Retry-After instead of piling up. SIGTERM/SIGINT
+stop intake, drain in-flight work and end every open Agent session.
+"""
+import argparse
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 16
+DEFAULT_REQUEST_TIMEOUT = 300.0
+DEFAULT_SHUTDOWN_GRACE = 30.0
+
+
+class ServiceBusy(Exception):
+    """The request queue is full (or the service is draining)."""
+
+
+class BadRequest(ValueError):
+    """The request body is unusable; reported as 400."""
+
+
+# --- Jobs ---
+def _job_kickoff(body: dict) -> dict:
+    import crew_salesforce_tool_app as app
+
+    flow, result = app.kickoff_with_flow(_require_message(body))
+    return {"flow": flow, "result": str(result)}
+
+
+def _job_faq(body: dict) -> dict:
+    import crew_salesforce_agent_interaction as interaction
+
+    return {"result": str(interaction.answer_guest(_require_message(body)))}
+
+
+def _job_simulate(body: dict) -> dict:
+    import crew_salesforce_agent_interaction as interaction
+
+    return {"result": str(interaction.simulate())}
+
+
+def _require_message(body: dict) -> str:
+    message = body.get("message")
+    if not isinstance(message, str) or not message.strip():
+        raise BadRequest('body must be JSON with a non-empty "message" string')
+    return message
+
+
+JOBS: Dict[str, Callable[[dict], dict]] = {
+    "/v1/kickoff": _job_kickoff,
+    "/v1/faq": _job_faq,
+    "/v1/simulate": _job_simulate,
+}
+
+
+class CrewService:
+    """
+    Bounded worker pool in front of the crews. submit() never blocks: it either
+    queues the job or raises ServiceBusy.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 warm_faq: bool = True):
+        self.workers = max(1, int(workers))
+        self.warm_faq = warm_faq
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._draining = False
+        self._busy = 0
+        self.started_at = time.time()
+
+        # stats
+        self._accepted = 0
+        self._rejected = 0
+        self._completed = 0
+        self._failed = 0
+
+    # --- Lifecycle ---
+    def warm(self):
+        """Build crews and the tool, fetch a token and open pooled sessions before taking traffic."""
+        import crew_salesforce_tool_app as app
+
+        tool_app = app.get_app()
+        app.get_intent_router()
+        tool_app.sf_tool._client.get_access_token()
+        if self.warm_faq:
+            import crew_salesforce_agent_interaction as interaction
+            interaction.get_simulation()
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"crew-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        self.warm()
+        # Per-thread crew copies are made once per worker, off the request path. The
+        # barrier makes every worker take exactly one warm-up job.
+        barrier = threading.Barrier(self.workers)
+        done = []
+        for _ in range(self.workers):
+            fut: Future = Future()
+            self._queue.put((self._warm_worker, {"barrier": barrier}, fut))
+            done.append(fut)
+        for f in done:
+            f.result()
+        with self._lock:
+            self._completed = 0  # count real requests only
+        self._ready.set()
+
+    def _warm_worker(self, body: dict) -> dict:
+        import crew_salesforce_tool_app as app
+        body["barrier"].wait(timeout=60)
+        app._get_crews()
+        if self.warm_faq:
+            import crew_salesforce_agent_interaction as interaction
+            interaction._get_crews()
+        return {}
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set() and not self._draining
+
+    def submit(self, job: Callable[[dict], dict], body: dict) -> Future:
+        fut: Future = Future()
+        with self._lock:
+            if self._draining:
+                self._rejected += 1
+                raise ServiceBusy("service is shutting down")
+            try:
+                self._queue.put_nowait((job, body, fut))
+            except queue.Full:
+                self._rejected += 1
+                raise ServiceBusy("request queue is full")
+            self._accepted += 1
+        return fut
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            job, body, fut = item
+            if not fut.set_running_or_notify_cancel():
+                continue
+            with self._lock:
+                self._busy += 1
+            try:
+                fut.set_result(job(body))
+                ok = True
+            except BaseException as e:
+                fut.set_exception(e)
+                ok = False
+            finally:
+                with self._lock:
+                    self._busy -= 1
+                    if ok:
+                        self._completed += 1
+                    else:
+                        self._failed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {
+                "ready": self.ready,
+                "draining": self._draining,
+                "workers": self.workers,
+                "busy": self._busy,
+                "queued": self._queue.qsize(),
+                "queue_size": self._queue.maxsize,
+                "accepted": self._accepted,
+                "rejected": self._rejected,
+                "completed": self._completed,
+                "failed": self._failed,
+                "uptime_s": time.time() - self.started_at,
+            }
+        import crew_salesforce_tool_app as app
+        if app.is_built():
+            out["session_pool"] = app.get_app().sf_tool.pool_stats()
+            out["session_prefetch"] = app.get_app().sf_tool.prefetch_stats()
+            out["agent_latency"] = app.get_app().sf_tool._client.latency_stats()
+            out["admission"] = app.get_app().sf_tool._client.scheduler_stats()
+        if app.speculation_stats():
+            out["speculation"] = app.speculation_stats()
+        import crew_salesforce_agent_interaction as interaction
+        if interaction.faq_stats():
+            out["faq_index"] = interaction.faq_stats()
+        return out
+
+    def shutdown(self, grace: float = DEFAULT_SHUTDOWN_GRACE):
+        """Stop intake, let queued and in-flight jobs finish (up to `grace` s), then end Agent sessions."""
+        with self._lock:
+            if self._draining:
+                return
+            self._draining = True
+        deadline = time.monotonic() + grace
+        for _ in self._threads:
+            # Sentinels queue up behind the remaining work, so workers drain before exiting
+            while True:
+                try:
+                    self._queue.put(None, timeout=max(0.1, deadline - time.monotonic()))
+                    break
+                except queue.Full:
+                    if time.monotonic() >= deadline:
+                        break
+        for t in self._threads:
+            t.join(max(0.0, deadline - time.monotonic()))
+        self._close_sessions()
+
+    @staticmethod
+    def _close_sessions():
+        import crew_salesforce_tool_app as app
+        if app.is_built():
+            try:
+                app.get_app().sf_tool.close()
+            except Exception:
+                pass
+        interaction = sys.modules.get("crew_salesforce_agent_interaction")
+        if interaction is not None and interaction.is_built():
+            try:
+                interaction.get_simulation().sf_llm.close()
+            except Exception:
+                pass
+
+
+# --- HTTP ---
+class _ActiveRequests:
+    """Requests being handled right now (idle keep-alive connections excluded), so shutdown can let them finish."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._count = 0
+
+    @contextmanager
+    def track(self):
+        with self._cond:
+            self._count += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._count -= 1
+                self._cond.notify_all()
+
+    def wait_idle(self, timeout: float) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: self._count == 0, timeout)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service: CrewService = None
+    active: _ActiveRequests = None
+    request_timeout: float = DEFAULT_REQUEST_TIMEOUT
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        with self.active.track():
+            self._get()
+
+    def do_POST(self):
+        with self.active.track():
+            self._post()
+
+    def _get(self):
+        path = self.path.split("?")[0]
+        if path == "/healthz":
+            self._send_json(200, {"status": "ok"})
+        elif path == "/readyz":
+            stats = self.service.stats()
+            self._send_json(200 if stats["ready"] else 503, stats)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _post(self):
+        job = JOBS.get(self.path.split("?")[0])
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if job is None:
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            body = json.loads(raw or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("body must be a JSON object")
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        if not self.service.ready:
+            self._send_json(503, {"error": "not ready"}, {"Retry-After": "1"})
+            return
+
+        start = time.perf_counter()
+        try:
+            fut = self.service.submit(job, body)
+        except ServiceBusy as e:
+            self._send_json(503, {"error": str(e)}, {"Retry-After": "1"})
+            return
+        try:
+            result = fut.result(timeout=self.request_timeout)
+        except FutureTimeout:
+            fut.cancel()  # only helps if it has not started yet
+            self._send_json(504, {"error": f"timed out after {self.request_timeout:.0f}s"})
+            return
+        except BadRequest as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+        self._send_json(200, {**result, "elapsed_ms": (time.perf_counter() - start) * 1000})
+
+
+def serve(host: str = "127.0.0.1", port: int = 8080, workers: int = DEFAULT_WORKERS,
+          queue_size: int = DEFAULT_QUEUE_SIZE, request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+          grace: float = DEFAULT_SHUTDOWN_GRACE, warm_faq: bool = True):
+    """Warm up, serve until SIGTERM/SIGINT, then shut down gracefully."""
+    service = CrewService(workers=workers, queue_size=queue_size, warm_faq=warm_faq)
+    active = _ActiveRequests()
+    handler = type("CrewHandler", (_Handler,),
+                   {"service": service, "active": active, "request_timeout": request_timeout})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True  # idle keep-alive connections must not block exit; see wait_idle below
+
+    def _drain_then_stop():
+        # Drain while still serving, so /readyz reports draining and new work gets 503;
+        # then stop accepting connections
+        service.shutdown(grace)
+        httpd.shutdown()
+
+    def _stop(signum, _frame):
+        # Both calls block, and httpd.shutdown() must not run on the serving thread
+        threading.Thread(target=_drain_then_stop, name="crew-drain", daemon=True).start()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    # /healthz answers while warming; /readyz flips to 200 once start() returns
+    server_thread = threading.Thread(target=httpd.serve_forever, name="crew-http", daemon=True)
+    server_thread.start()
+    print(f"warming up on http://{host}:{httpd.server_address[1]} ...", file=sys.stderr)
+    service.start()
+    print("ready", file=sys.stderr)
+    try:
+        while server_thread.is_alive():
+            server_thread.join(0.5)
+    finally:
+        service.shutdown(grace)
+        # Handler threads are daemons: let the ones still writing a response finish first
+        active.wait_idle(grace)
+        httpd.server_close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the resort crews over local HTTP.")
+    parser.add_argument("--host", default=os.getenv("SF_SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SF_SERVER_PORT", "8080")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SF_SERVER_WORKERS", DEFAULT_WORKERS)))
+    parser.add_argument("--queue-size", type=int, default=int(os.getenv("SF_SERVER_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)))
+    parser.add_argument("--request-timeout", type=float, default=DEFAULT_REQUEST_TIMEOUT)
+    parser.add_argument("--grace", type=float, default=DEFAULT_SHUTDOWN_GRACE, help="shutdown drain timeout")
+    parser.add_argument("--no-faq", action="store_true", help="do not pre-build the FAQ/simulation crews")
+    parser.add_argument("--speculative", action="store_true",
+                        help="run the guessed flow crew alongside the LLM router (CREW_SPECULATIVE)")
+    args = parser.parse_args(argv)
+    if args.speculative:
+        os.environ["CREW_SPECULATIVE"] = "1"
+    serve(args.host, args.port, args.workers, args.queue_size, args.request_timeout, args.grace,
+          warm_faq=not args.no_faq)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
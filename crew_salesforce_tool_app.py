@@ -1,116 +1,412 @@
 # crew_app.py
-from crewai import Agent, Task, Crew, Process, LLM
-from salesforce_agent_tool import SalesforceAgentCrewTool
-from dotenv import load_dotenv
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Iterable, Iterator, List, Optional, Union
+import argparse
+import json
 import os
+import sys
+import threading
+import time
+import uuid
 
-load_dotenv()
-
-sf_tool = SalesforceAgentCrewTool()
-
-# ✅ Correct model id + attach HF token
-llm = LLM(
-    provider="huggingface",
-    model= "huggingface/meta-llama/Meta-Llama-3-8B-Instruct",
-    api_key=os.getenv("HF_TOKEN"),
-    max_tokens=512,
-    # optional tuning:
-    # temperature=0.7, top_p=0.9
-)
-
-# --- Agents (attach llm so any Crew using them inherits it) ---
-router = Agent(
-    role="Intent Router",
-    goal="Decide if the user needs the Wedding flow or the Vacation flow.",
-    backstory="You are the front-desk dispatcher. You ONLY decide the flow.",
-    llm=llm,           # 👈 important
-    verbose=True
-)
-
-wedding_planner = Agent(
-    role="Wedding Planner",
-    goal="Propose 2–3 wedding package options with add-ons.",
-    backstory="Destination wedding specialist.",
-    tools=[sf_tool],
-    llm=llm,           # 👈 important
-    verbose=True
-)
-
-vacation_planner = Agent(
-    role="Vacation Planner",
-    goal="Propose a short family vacation plan (rooms + experiences).",
-    backstory="Family-centric curator.",
-    tools=[sf_tool],
-    llm=llm,           # 👈 important
-    verbose=True
-)
-
-# --- Tasks ---
-t_route = Task(
-    description=(
-        "Read the user's message and return ONLY one word:\n"
-        "- 'wedding' if the query is about weddings/packages/ceremonies/receptions, OR\n"
-        "- 'vacation' if the query is about short stays/rooms/experiences/family trips."
-    ),
-    agent=router,
-    expected_output="Exactly one word: 'wedding' or 'vacation'. No extra text."
-)
-
-t_wedding = Task(
-    description=(
-        "Check 2–3 wedding package options (Intimate/Classic/Luxury or Custom) with add-ons "
-        "(hair & makeup, photography w/ drone, floral, menu, beverages). "
-    ),
-    agent=wedding_planner,
-    expected_output="A concise proposal with 2–3 package options."
-)
-
-t_vacation = Task(
-    description=(
-        "Check a 2–5 day family vacation plan with room options and day-wise experiences "
-        "(e.g., historical tour, culinary experience, seaside dinner). "
-    ),
-    agent=vacation_planner,
-    expected_output="A concise plan (rooms + experiences by day)"
-)
+import crew_speculation
+import tracing
+from startup_profile import phase
+
+# crewai, the LLM, the Salesforce tool, agents, tasks and crews are all built on
+# first use, so routing a confidently-classified message never imports crewai.
+_build_lock = threading.RLock()
+_app: Optional[SimpleNamespace] = None
+_env_loaded = False
+
+def _load_env():
+    global _env_loaded
+    if not _env_loaded:
+        with phase("load .env"):
+            from dotenv import load_dotenv
+            load_dotenv()
+        _env_loaded = True
+
+def _build_llm():
+    from crewai import LLM
+    from salesforce_cassette import maybe_wrap_llm
+
+    if os.getenv("CREW_LLM_BASE_URL"):
+        # Any OpenAI-compatible endpoint (e.g. mock_agent_server.py for offline benchmarks)
+        llm = LLM(
+            model=os.getenv("CREW_LLM_MODEL", "openai/mock-llama"),
+            base_url=os.getenv("CREW_LLM_BASE_URL"),
+            api_key=os.getenv("CREW_LLM_API_KEY", "mock"),
+            max_tokens=512,
+        )
+    else:
+        # ✅ Correct model id + attach HF token
+        llm = LLM(
+            provider="huggingface",
+            model= "huggingface/meta-llama/Meta-Llama-3-8B-Instruct",
+            api_key=os.getenv("HF_TOKEN"),
+            max_tokens=512,
+            # optional tuning:
+            # temperature=0.7, top_p=0.9
+        )
+    # Recorded / replayed when SF_CASSETTE is set
+    return maybe_wrap_llm(llm)
+
+def _build_app() -> SimpleNamespace:
+    _load_env()
+    with phase("import crewai"):
+        from crewai import Agent, Task, Crew, Process
+        tracing.instrument_crewai()  # spans for crews, tasks and LLM calls when SF_TRACE is set
+    with phase("import salesforce tool"):
+        from salesforce_agent_tool import SalesforceAgentCrewTool
+
+    with phase("build salesforce tool"):
+        # Size the warm session pool for the batch worker count
+        sf_tool = SalesforceAgentCrewTool(pool_size=int(os.getenv("SF_SESSION_POOL_SIZE", "4")))
+    with phase("build llm"):
+        llm = _build_llm()
+
+    with phase("build agents and tasks"):
+        # --- Agents (attach llm so any Crew using them inherits it) ---
+        router = Agent(
+            role="Intent Router",
+            goal="Decide if the user needs the Wedding flow or the Vacation flow.",
+            backstory="You are the front-desk dispatcher. You ONLY decide the flow.",
+            llm=llm,           # 👈 important
+            verbose=True
+        )
+
+        wedding_planner = Agent(
+            role="Wedding Planner",
+            goal="Propose 2–3 wedding package options with add-ons.",
+            backstory="Destination wedding specialist.",
+            tools=[sf_tool],
+            llm=llm,           # 👈 important
+            verbose=True
+        )
+
+        vacation_planner = Agent(
+            role="Vacation Planner",
+            goal="Propose a short family vacation plan (rooms + experiences).",
+            backstory="Family-centric curator.",
+            tools=[sf_tool],
+            llm=llm,           # 👈 important
+            verbose=True
+        )
+
+        # --- Tasks ---
+        t_route = Task(
+            description=(
+                "Read the user's message and return ONLY one word:\n"
+                "- 'wedding' if the query is about weddings/packages/ceremonies/receptions, OR\n"
+                "- 'vacation' if the query is about short stays/rooms/experiences/family trips."
+            ),
+            agent=router,
+            expected_output="Exactly one word: 'wedding' or 'vacation'. No extra text."
+        )
+
+        t_wedding = Task(
+            description=(
+                "Check 2–3 wedding package options (Intimate/Classic/Luxury or Custom) with add-ons "
+                "(hair & makeup, photography w/ drone, floral, menu, beverages). "
+            ),
+            agent=wedding_planner,
+            expected_output="A concise proposal with 2–3 package options."
+        )
+
+        t_vacation = Task(
+            description=(
+                "Check a 2–5 day family vacation plan with room options and day-wise experiences "
+                "(e.g., historical tour, culinary experience, seaside dinner). "
+            ),
+            agent=vacation_planner,
+            expected_output="A concise plan (rooms + experiences by day)"
+        )
+
+    with phase("build crews"):
+        # 1) Route (✅ ensure llm is set here too; either via Agent or Crew)
+        route_crew = Crew(
+            agents=[router],
+            tasks=[t_route],
+            process=Process.sequential,
+            llm=llm,        # redundant since agent has llm, but safe
+            verbose=True
+        )
+        # 2) Flows (✅ llm attached). The step callback counts LLM calls of speculative
+        #    runs and stops them once the router picks the other flow.
+        flow_crews = {
+            "wedding": Crew(agents=[wedding_planner], tasks=[t_wedding], process=Process.sequential, llm=llm, verbose=False,
+                            step_callback=crew_speculation.on_step),
+            "vacation": Crew(agents=[vacation_planner], tasks=[t_vacation], process=Process.sequential, llm=llm, verbose=False,
+                             step_callback=crew_speculation.on_step),
+        }
+
+    return SimpleNamespace(
+        sf_tool=sf_tool, llm=llm,
+        router=router, wedding_planner=wedding_planner, vacation_planner=vacation_planner,
+        t_route=t_route, t_wedding=t_wedding, t_vacation=t_vacation,
+        crews=(route_crew, flow_crews),
+    )
+
+def get_app() -> SimpleNamespace:
+    """Build (once) and return the tool, LLM, agents, tasks and crews."""
+    global _app
+    if _app is None:
+        with _build_lock:
+            if _app is None:
+                with phase("build app"):
+                    _app = _build_app()
+    return _app
+
+def is_built() -> bool:
+    return _app is not None
+
+_APP_ATTRS = ("sf_tool", "llm", "router", "wedding_planner", "vacation_planner", "t_route", "t_wedding", "t_vacation")
+
+def __getattr__(name):
+    # Keeps `app.sf_tool`, `app.router`, ... working for callers of the old eager module
+    if name in _APP_ATTRS:
+        return getattr(get_app(), name)
+    if name == "intent_router":
+        return get_intent_router()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def _to_text(x) -> str:
     return str(x).strip().lower()
 
-def kickoff(user_message: str):
-    # 1) Route (✅ ensure llm is set here too; either via Agent or Crew)
-    route_crew = Crew(
-        agents=[router],
-        tasks=[t_route],
-        process=Process.sequential,
-        llm=llm,        # redundant since agent has llm, but safe
-        verbose=True
-    )
-    route_raw = route_crew.kickoff(inputs={"user_message": user_message})
-    route = _to_text(route_raw)
+# --- Crews (built once, reused across messages) ---
+_thread_crews = threading.local()
+
+def _get_crews():
+    """Crew.kickoff mutates task/agent state, so each worker thread gets its own copy (made once)."""
+    base = get_app().crews
+    if threading.current_thread() is threading.main_thread():
+        return base
+    crews = getattr(_thread_crews, "crews", None)
+    if crews is None:
+        route_crew, flow_crews = base
+        crews = _thread_crews.crews = (route_crew.copy(), {k: c.copy() for k, c in flow_crews.items()})
+    return crews
+
+# --- Routing ---
+# Local fast path; the LLM router only runs below ROUTER_CONFIDENCE_THRESHOLD
+_intent_router = None
+
+def get_intent_router():
+    global _intent_router
+    if _intent_router is None:
+        with _build_lock:
+            if _intent_router is None:
+                _load_env()  # ROUTER_CONFIDENCE_THRESHOLD may come from .env
+                from intent_router import IntentRouter
+                _intent_router = IntentRouter()
+    return _intent_router
+
+def route_message(user_message: str) -> str:
+    intent_router = get_intent_router()
+    label, confidence = intent_router.classify(user_message)
+    return _route_classified(user_message, label, confidence)
+
+def _route_classified(user_message: str, label: str, confidence: float) -> str:
+    with tracing.span("route", "route", guess=label, confidence=round(confidence, 3)) as sp:
+        flow = _route_decide(user_message, label, confidence)
+        if sp is not None:
+            sp.set(flow=flow)
+        return flow
 
+def _route_decide(user_message: str, label: str, confidence: float) -> str:
+    intent_router = get_intent_router()
+    if intent_router.is_confident(confidence):
+        intent_router.record(label, "local", confidence, user_message)
+        return label
+
+    route_crew, _ = _get_crews()
+    route = _to_text(route_crew.kickoff(inputs={"user_message": user_message}))
     if "wedding" in route:
-        chosen_task = t_wedding
-        chosen_agents = [wedding_planner]
-    elif "vacation" in route:
-        chosen_task = t_vacation
-        chosen_agents = [vacation_planner]
-    else:
-        guess = "wedding" if any(k in user_message.lower() for k in ["wedding", "bride", "ceremony", "reception"]) else "vacation"
-        chosen_task = t_wedding if guess == "wedding" else t_vacation
-        chosen_agents = [wedding_planner] if guess == "wedding" else [vacation_planner]
-
-    # 2) Run selected flow (✅ llm attached)
-    flow_crew = Crew(
-        agents=chosen_agents,
-        tasks=[chosen_task],
-        process=Process.sequential,
-        llm=llm,
-        verbose=False
-    )
-    return flow_crew.kickoff(inputs={"user_message": user_message})
+        intent_router.record("wedding", "llm", confidence, user_message)
+        return "wedding"
+    if "vacation" in route:
+        intent_router.record("vacation", "llm", confidence, user_message)
+        return "vacation"
+    # LLM answered something else: trust the local guess
+    intent_router.record(label, "local-fallback", confidence, user_message)
+    return label
+
+def _run_flow(flow: str, user_message: str):
+    _, flow_crews = _get_crews()
+    with tracing.span(flow, "flow"):
+        return flow_crews[flow].kickoff(inputs={"user_message": user_message})
+
+def kickoff_with_flow(user_message: str, speculative: Optional[bool] = None):
+    """Route and run the chosen flow crew; returns (flow, crew output)."""
+    if speculative is None:
+        speculative = crew_speculation.is_enabled()
+    # Token + Agent session are prepared in the background while the router runs;
+    # the planner's first tool call adopts them (SF_PREFETCH=0 turns this off).
+    # With SF_TRACE=<file> the whole run is traced (see tracing.py).
+    # Planner traffic ranks below live guest questions in the Agent API scheduler;
+    # batch callers keep their own (lower) class.
+    # Each kickoff is its own Agent conversation (unless the caller opened one), so pooled
+    # sessions never carry one request's context into another's answers.
+    from salesforce_conversations import conversation, current_conversation
+    from salesforce_scheduler import PLANNER, current_priority, priority
+    key = current_conversation()
+    owned = key is None
+    if owned:
+        key = f"kickoff-{uuid.uuid4()}"
+    try:
+        with tracing.trace_run("kickoff", "kickoff", message=user_message[:80], speculative=speculative), \
+                priority(current_priority() or PLANNER), conversation(key), get_app().sf_tool.prefetch():
+            if speculative:
+                return _kickoff_speculative(user_message)
+
+            # 1) Route
+            flow = route_message(user_message)
+
+            # 2) Run selected flow
+            return flow, _run_flow(flow, user_message)
+    finally:
+        if owned and is_built():
+            get_app().sf_tool.end_conversation(key)
+
+def kickoff(user_message: str, speculative: Optional[bool] = None):
+    return kickoff_with_flow(user_message, speculative)[1]
+
+# --- Speculative kickoff ---
+# The locally-guessed flow crew starts alongside the LLM router. If the router
+# agrees its result is used (latency ~ max(route, flow) instead of the sum);
+# otherwise it is cancelled at its next step or tool call and the right flow runs.
+_speculator = None
+
+def get_speculator() -> "crew_speculation.Speculator":
+    global _speculator
+    if _speculator is None:
+        with _build_lock:
+            if _speculator is None:
+                _speculator = crew_speculation.Speculator()
+    return _speculator
+
+def speculation_stats() -> dict:
+    """Hit rate and wasted Salesforce/LLM calls of speculative kickoffs (empty if never used)."""
+    return _speculator.stats() if _speculator is not None else {}
+
+def _kickoff_speculative(user_message: str):
+    spec = get_speculator()
+    intent_router = get_intent_router()
+    label, confidence = intent_router.classify(user_message)
+    if intent_router.is_confident(confidence):
+        # No LLM routing call, so nothing to overlap
+        spec.count("not_needed")
+        flow = _route_classified(user_message, label, confidence)
+        return flow, _run_flow(flow, user_message)
+
+    get_app()  # build before forking so both sides share one tool/LLM
+    started = spec.start(label, lambda: _run_flow(label, user_message))
+    if started is None:
+        flow = _route_classified(user_message, label, confidence)
+        return flow, _run_flow(flow, user_message)
+
+    scope, fut = started
+    t0 = time.perf_counter()
+    try:
+        flow = _route_classified(user_message, label, confidence)
+    except BaseException:
+        spec.discard(scope, fut)
+        raise
+    route_s = time.perf_counter() - t0
+    if flow == label:
+        result = fut.result()
+        spec.hit(min(route_s, scope.elapsed))
+        return flow, result
+    spec.discard(scope, fut)
+    return flow, _run_flow(flow, user_message)
+
+# --- Batch mode ---
+def _kickoff_item(index: int, user_message: str) -> dict:
+    from salesforce_scheduler import BATCH, priority
+    try:
+        with priority(BATCH):
+            result = str(kickoff(user_message))
+        return {"index": index, "message": user_message, "ok": True, "result": result}
+    except Exception as e:
+        # one bad message must not take the batch down
+        return {"index": index, "message": user_message, "ok": False, "error": f"{type(e).__name__}: {e}"}
+
+class InvalidLine:
+    """A batch input line that could not be read; iter_kickoff_many reports it instead of running it."""
+
+    __slots__ = ("line", "text", "error")
+
+    def __init__(self, line: int, text: str, error: Exception):
+        self.line = line
+        self.text = text
+        self.error = error
+
+    def result(self, index: int) -> dict:
+        return {"index": index, "line": self.line, "message": self.text, "ok": False,
+                "error": f"line {self.line}: {type(self.error).__name__}: {self.error}"}
+
+
+def iter_kickoff_many(messages: Iterable[Union[str, InvalidLine]], max_workers: int = 4) -> Iterator[dict]:
+    """
+    Run kickoff over many messages with at most `max_workers` in flight.
+    Yields one result dict per message, in input order, as soon as it (and all before it) finish.
+    """
+    max_workers = max(1, int(max_workers))
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="kickoff") as pool:
+        for i, msg in enumerate(messages):
+            if isinstance(msg, InvalidLine):
+                done: Future = Future()
+                done.set_result(msg.result(i))
+                pending.append(done)
+                continue
+            pending.append(pool.submit(_kickoff_item, i, msg))
+            # bounded read-ahead so huge inputs don't all sit in memory
+            while len(pending) >= max_workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def kickoff_many(messages: Iterable[str], max_workers: int = 4) -> List[dict]:
+    return list(iter_kickoff_many(messages, max_workers=max_workers))
+
+def read_jsonl_messages(path: str) -> Iterator[Union[str, InvalidLine]]:
+    """Messages from a JSONL file; a malformed line is yielded as an InvalidLine so the rest still run."""
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+                message = item if isinstance(item, str) else item["message"]
+                if not isinstance(message, str):
+                    raise TypeError(f"\"message\" must be a string, got {type(message).__name__}")
+            except (ValueError, KeyError, TypeError) as e:
+                yield InvalidLine(n, line, e)
+                continue
+            yield message
 
 if __name__ == "__main__":
-    msg = "Family of 4, 3-night stay next month with a historical tour and a seaside dinner."
-    # msg = "We’re planning a March beach wedding for ~50 guests, vegan menu, drone photography."
-    print(kickoff(msg))
+    parser = argparse.ArgumentParser(description="Route resort guest messages to the wedding/vacation crews.")
+    parser.add_argument("--batch", help="JSONL file of messages ({\"message\": ...} or a JSON string per line)")
+    parser.add_argument("--out", help="Write JSONL results here (default: stdout)")
+    parser.add_argument("--max-workers", type=int, default=4)
+    args = parser.parse_args()
+
+    if not args.batch:
+        msg = "Family of 4, 3-night stay next month with a historical tour and a seaside dinner."
+        # msg = "We’re planning a March beach wedding for ~50 guests, vegan menu, drone photography."
+        print(kickoff(msg))
+    else:
+        out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+        try:
+            for res in iter_kickoff_many(read_jsonl_messages(args.batch), max_workers=args.max_workers):
+                out.write(json.dumps(res, ensure_ascii=False) + "\n")
+                out.flush()
+        finally:
+            if out is not sys.stdout:
+                out.close()
@@ -0,0 +1,159 @@
+# crew_speculation.py
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+DEFAULT_MAX_SPECULATIONS = 4
+
+
+class SpeculationCancelled(BaseException):
+    """
+    Raised inside a speculative flow run once the router has picked a different flow.
+    A BaseException, like KeyboardInterrupt: CrewAI catches Exception to turn tool errors
+    into observations and to retry failed tasks, which would keep a discarded run going.
+    """
+
+
+class SpeculationScope:
+    """Cancel flag and call counters for one speculative flow-crew run."""
+
+    __slots__ = ("label", "cancelled", "sf_calls", "llm_steps", "elapsed", "_lock")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.cancelled = threading.Event()
+        self.sf_calls = 0
+        self.llm_steps = 0
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def add(self, sf_calls: int = 0, llm_steps: int = 0):
+        with self._lock:
+            self.sf_calls += sf_calls
+            self.llm_steps += llm_steps
+
+
+_scope: contextvars.ContextVar = contextvars.ContextVar("crew_speculation_scope", default=None)
+
+
+def current_scope() -> Optional[SpeculationScope]:
+    return _scope.get()
+
+
+# --- Hooks called from the tool and the crews (no-ops outside a speculative run) ---
+def check_cancelled():
+    scope = _scope.get()
+    if scope is not None and scope.cancelled.is_set():
+        raise SpeculationCancelled(f"speculative {scope.label!r} run discarded by the router")
+
+
+def count_sf_call():
+    """Called by the Salesforce tool before each upstream Agent call."""
+    scope = _scope.get()
+    if scope is not None:
+        check_cancelled()
+        scope.add(sf_calls=1)
+
+
+def on_step(_step=None):
+    """Crew step_callback: one agent step is one LLM call. Aborts the crew once cancelled."""
+    scope = _scope.get()
+    if scope is not None:
+        scope.add(llm_steps=1)
+        check_cancelled()
+
+
+def is_enabled() -> bool:
+    return os.getenv("CREW_SPECULATIVE", "").lower() in ("1", "true", "yes")
+
+
+class Speculator:
+    """
+    Runs the locally-guessed flow crew alongside the LLM router. At most
+    `max_in_flight` speculative runs exist at once; beyond that kickoff stays
+    serial instead of queueing, so speculation never adds latency.
+    """
+
+    def __init__(self, max_in_flight: Optional[int] = None):
+        if max_in_flight is None:
+            max_in_flight = int(os.getenv("CREW_SPECULATION_MAX", DEFAULT_MAX_SPECULATIONS))
+        self.max_in_flight = max(1, int(max_in_flight))
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="speculate")
+        self._lock = threading.Lock()
+        self._counts = {
+            "speculated": 0,          # flow crew started before the router answered
+            "hits": 0,                # router agreed; speculative result used
+            "misses": 0,              # router disagreed; result discarded
+            "not_needed": 0,          # local router was confident, nothing to overlap
+            "skipped_busy": 0,        # no free slot, ran serially
+            "wasted_sf_calls": 0,     # Agent API calls made by discarded runs
+            "wasted_llm_calls": 0,    # LLM calls made by discarded runs
+        }
+        self._overlap_saved_s = 0.0
+
+    def count(self, key: str, n: int = 1):
+        with self._lock:
+            self._counts[key] += n
+
+    def start(self, label: str, fn: Callable[[], object]) -> Optional[tuple]:
+        """Start fn() speculatively; returns (scope, future) or None when no slot is free."""
+        if not self._slots.acquire(blocking=False):
+            self.count("skipped_busy")
+            return None
+        scope = SpeculationScope(label)
+
+        def _run():
+            _scope.set(scope)
+            start = time.perf_counter()
+            try:
+                return fn()
+            finally:
+                scope.elapsed = time.perf_counter() - start
+                self._slots.release()
+
+        try:
+            fut = self._pool.submit(contextvars.copy_context().run, _run)
+        except RuntimeError:
+            self._slots.release()
+            self.count("skipped_busy")
+            return None
+        self.count("speculated")
+        return scope, fut
+
+    def hit(self, overlap_s: float):
+        with self._lock:
+            self._counts["hits"] += 1
+            self._overlap_saved_s += overlap_s
+
+    def discard(self, scope: SpeculationScope, fut: Future):
+        """Cancel a losing run; its calls are counted as waste once it stops."""
+        scope.cancel()
+        self.count("misses")
+
+        def _account(_f):
+            with self._lock:
+                self._counts["wasted_sf_calls"] += scope.sf_calls
+                self._counts["wasted_llm_calls"] += scope.llm_steps
+
+        fut.add_done_callback(_account)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._counts)
+            saved = self._overlap_saved_s
+        decided = out["hits"] + out["misses"]
+        out["hit_rate"] = out["hits"] / decided if decided else 0.0
+        out["overlap_saved_s"] = saved
+        out["max_in_flight"] = self.max_in_flight
+        return out
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
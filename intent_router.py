@@ -0,0 +1,98 @@
+# intent_router.py
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("intent_router")
+
+DEFAULT_CONFIDENCE_THRESHOLD = 0.6
+
+# Weighted lexical cues per flow. Patterns are matched on lower-cased text.
+WEDDING_TERMS: List[Tuple[str, float]] = [
+    (r"\bweddings?\b", 3.0),
+    (r"\bbrides?\b|\bbridal\b", 3.0),
+    (r"\bgrooms?\b", 3.0),
+    (r"\belop(e|ing|ement)\b", 3.0),
+    (r"\bofficiant\b", 3.0),
+    (r"\bvows?\b", 2.5),
+    (r"\bceremon(y|ies)\b", 2.5),
+    (r"\brehearsal dinner\b", 2.5),
+    (r"\breceptions?\b", 2.0),
+    (r"\bmarr(y|ied|iage|ying)\b", 2.0),
+    (r"\bengage(d|ment)\b", 1.5),
+    (r"\bhair (and|&) makeup\b", 1.5),
+    (r"\bflor(al|ist|als)\b|\bbouquets?\b", 1.0),
+    (r"\bhoneymoon\b", 1.0),
+    (r"\b\d+\s*guests\b|\bguest list\b", 1.0),
+    (r"\bpackages?\b", 0.5),
+]
+
+VACATION_TERMS: List[Tuple[str, float]] = [
+    (r"\bvacations?\b|\bholidays?\b", 3.0),
+    (r"\bfamily\b|\bkids?\b|\bchildren\b", 2.0),
+    (r"\btrips?\b|\bgetaway\b", 2.0),
+    (r"\b\d+[- ]nights?\b|\bnights?\b", 1.5),
+    (r"\bstay(ing)?\b", 1.5),
+    (r"\brooms?\b|\bsuites?\b", 1.5),
+    (r"\btours?\b|\bexcursions?\b|\bsightseeing\b", 1.5),
+    (r"\bcheck[- ]?(in|out)\b", 1.5),
+    (r"\bkids club\b|\bwater sports?\b|\bsnorkel(ing)?\b", 1.5),
+    (r"\bseaside dinner\b|\bculinary\b", 1.0),
+    (r"\bspa\b|\bpool\b|\bbeach\b", 0.5),
+]
+
+
+class IntentRouter:
+    """
+    In-process wedding/vacation classifier. Scores weighted keyword hits per label
+    and reports a confidence in [0, 1); callers fall back to the LLM router when
+    the confidence is below `threshold`.
+    """
+
+    def __init__(self, threshold: Optional[float] = None, smoothing: float = 1.0):
+        self.threshold = (
+            float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", DEFAULT_CONFIDENCE_THRESHOLD))
+            if threshold is None else float(threshold)
+        )
+        # Added to the denominator so a single weak cue never looks certain
+        self.smoothing = smoothing
+        self._terms: Dict[str, List[Tuple[re.Pattern, float]]] = {
+            "wedding": [(re.compile(p), w) for p, w in WEDDING_TERMS],
+            "vacation": [(re.compile(p), w) for p, w in VACATION_TERMS],
+        }
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+
+    def scores(self, text: str) -> Dict[str, float]:
+        text = (text or "").lower()
+        return {
+            label: sum(w for pat, w in terms if pat.search(text))
+            for label, terms in self._terms.items()
+        }
+
+    def classify(self, text: str) -> Tuple[str, float]:
+        """Return (label, confidence); ties and empty matches lean 'vacation' with zero confidence."""
+        s = self.scores(text)
+        wedding, vacation = s["wedding"], s["vacation"]
+        label = "wedding" if wedding > vacation else "vacation"
+        confidence = abs(wedding - vacation) / (wedding + vacation + self.smoothing)
+        return label, confidence
+
+    def is_confident(self, confidence: float) -> bool:
+        return confidence >= self.threshold
+
+    def record(self, label: str, source: str, confidence: float, text: str = ""):
+        """Log a routing decision (and count it per source) so the threshold can be tuned."""
+        with self._lock:
+            key = f"{source}:{label}"
+            self._counts[key] = self._counts.get(key, 0) + 1
+        logger.info(
+            "route=%s source=%s confidence=%.3f threshold=%.2f message=%r",
+            label, source, confidence, self.threshold, text[:80],
+        )
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
@@ -0,0 +1,382 @@
+# load_simulator.py
+"""
+Open-loop load simulation for the Coral Cloud FAQ agent (Salesforce Einstein Agent).
+
+Synthetic guest conversations arrive as a Poisson process at `--rate` per second
+for `--duration` seconds. Each one runs several turns (guest question -> Coral
+Cloud answer) on its own Agent session. Arrivals never wait for earlier
+conversations to finish, so an overloaded org shows up as queueing delay and
+errors rather than a lower offered rate.
+
+    python load_simulator.py --mock --rate 2 --duration 60 --turns 3 --max-concurrency 16
+    python load_simulator.py --rate 0.5 --duration 300 --json peak.json     # real org from .env
+
+Guests are scripted by default; --guest llm uses the customer agent's LLM from
+crew_salesforce_agent_interaction. The Coral Cloud side is SalesforceAgentLLM
+(the engine behind SalesforceCrewLLM); --agent crew runs the full FAQ crew instead.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import salesforce_metrics as metrics
+from bench_salesforce import configure_env, latency_summary
+
+# --- Synthetic guests ---
+PARTIES = ["2 adults", "2 adults + 2 kids", "a family of 5", "4 friends", "a couple with a baby", "6 adults"]
+STAYS = ["3 nights in late November", "a long weekend in March", "5 nights over spring break",
+         "a week in July", "2 nights next month"]
+INTERESTS = ["family suite", "kids club", "water sports", "historical tour", "seaside dinner", "spa",
+             "early check-in", "parking", "cancellation policy", "vegan dining options"]
+FOLLOW_UPS = [
+    "What time is check-in and can we check in early?",
+    "How much is parking?",
+    "What are the kids club hours and ages?",
+    "When is the spa open?",
+    "What is the cancellation policy for the deposit?",
+    "Can we book the seaside dinner in advance?",
+]
+
+
+class ScriptedGuest:
+    """Cheap, deterministic guest: an opening question from templates, then FAQ follow-ups."""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+
+    def next_message(self, history: List[Dict[str, str]]) -> str:
+        if not history:
+            a, b = self.rng.sample(INTERESTS, 2)
+            return (f"We are {self.rng.choice(PARTIES)} planning {self.rng.choice(STAYS)} at Coral Cloud. "
+                    f"Can you tell us about the {a} and the {b}?")
+        return self.rng.choice(FOLLOW_UPS)
+
+
+class LLMGuest:
+    """Guest questions written by the customer agent's LLM (crewai), given the conversation so far."""
+
+    PROMPT = ("You are a prospective Coral Cloud Resort guest. Write your next message to the resort "
+              "in 1-2 sentences, staying on resort FAQ topics. Return only the message.")
+
+    def __init__(self, rng: random.Random):
+        import crew_salesforce_agent_interaction as interaction
+        self.llm = interaction.get_simulation().customer_llm
+        self.fallback = ScriptedGuest(rng)
+
+    def next_message(self, history: List[Dict[str, str]]) -> str:
+        # From the guest's point of view the resort is the "user"
+        flipped = [{"role": "assistant" if m["role"] == "user" else "user", "content": m["content"]} for m in history]
+        text = str(self.llm.call([{"role": "system", "content": self.PROMPT}] + flipped) or "").strip()
+        return text or self.fallback.next_message(history)
+
+
+# --- Coral Cloud side ---
+class LLMAgent:
+    """One SalesforceAgentLLM shared by every conversation; each conversation gets its own session."""
+
+    def __init__(self, llm=None):
+        if llm is None:
+            from salesforce_llm_adapter import SalesforceAgentLLM
+            llm = SalesforceAgentLLM(max_sessions=10_000)
+        self.llm = llm
+
+    def reply(self, conversation_id: str, history: List[Dict[str, str]]) -> str:
+        return self.llm.call(messages=history, conversation_id=conversation_id)
+
+    def end(self, conversation_id: str):
+        self.llm.end_conversation(conversation_id)
+
+    def close(self):
+        self.llm.close()
+
+
+class CrewAgent:
+    """
+    The full Coral Cloud FAQ crew (CrewAI agent + SalesforceCrewLLM); one kickoff per turn, all
+    on one Agent session that stays open until end().
+    """
+
+    def __init__(self):
+        import crew_salesforce_agent_interaction as interaction
+        self.interaction = interaction
+        interaction.get_simulation()
+
+    def reply(self, conversation_id: str, history: List[Dict[str, str]]) -> str:
+        return str(self.interaction.answer_guest(history[-1]["content"], conversation_id=conversation_id,
+                                                 end_session=False))
+
+    def end(self, conversation_id: str):
+        self.interaction.get_simulation().sf_llm.end_conversation(conversation_id)
+
+    def close(self):
+        self.interaction.get_simulation().sf_llm.close()
+
+
+# --- Recording ---
+class _AgentCounters(metrics.MetricsHook):
+    """Counts Agent API traffic (works the same against a real org or the mock)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests: Counter = Counter()
+        self.retries = 0
+        self.sessions_opened = 0
+        self.sessions_ended = 0
+
+    def on_request(self, endpoint, method, status, duration, bytes_out, bytes_in, retries=0):
+        with self.lock:
+            self.requests[f"{endpoint}|{status}"] += 1
+            self.retries += retries
+
+    def on_sessions(self, delta):
+        with self.lock:
+            if delta > 0:
+                self.sessions_opened += delta
+            else:
+                self.sessions_ended -= delta
+
+
+class LoadRecorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.turn_latencies: List[float] = []
+        self.start_delays: List[float] = []
+        self.turn_errors: Counter = Counter()
+        self.conversations_started = 0
+        self.conversations_completed = 0
+        self.conversations_failed = 0
+        self.dropped = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.timeline: List[tuple] = []  # (end offset s, turn latency s, ok)
+        self.wall = 0.0
+
+    def turn(self, t0: float, latency: float, error: Optional[BaseException] = None, stage: str = ""):
+        with self.lock:
+            if error is None:
+                self.turn_latencies.append(latency)
+            else:
+                name = type(error).__name__
+                self.turn_errors[f"{stage}:{name}" if stage else name] += 1
+            self.timeline.append((time.perf_counter() - t0, latency, error is None))
+
+
+def run_conversation(agent, guest, turns: int, think_time: float, rng: random.Random,
+                     rec: LoadRecorder, t0: float):
+    cid = f"load-{uuid.uuid4()}"
+    history: List[Dict[str, str]] = [{"role": "system", "content": "You are the Coral Cloud Resort FAQ assistant."}]
+    ok = True
+    try:
+        for i in range(turns):
+            if i and think_time > 0:
+                time.sleep(rng.expovariate(1.0 / think_time))
+            start = time.perf_counter()
+            try:
+                message = guest.next_message(history[1:])
+            except Exception as e:
+                # A failed guest LLM fails the conversation just like a failed Agent reply
+                rec.turn(t0, time.perf_counter() - start, e, stage="guest")
+                ok = False
+                break
+            history.append({"role": "user", "content": message})
+            start = time.perf_counter()
+            try:
+                answer = agent.reply(cid, history)
+            except Exception as e:
+                rec.turn(t0, time.perf_counter() - start, e)
+                ok = False
+                break
+            rec.turn(t0, time.perf_counter() - start)
+            history.append({"role": "assistant", "content": answer})
+    finally:
+        try:
+            agent.end(cid)
+        except Exception:
+            pass
+        with rec.lock:
+            rec.in_flight -= 1
+            if ok:
+                rec.conversations_completed += 1
+            else:
+                rec.conversations_failed += 1
+
+
+def run_load(agent, guest_factory: Callable[[random.Random], object], rate: float, duration: float,
+             turns: int, think_time: float, max_concurrency: int, max_backlog: int = 0,
+             seed: Optional[int] = None) -> LoadRecorder:
+    """Poisson arrivals at `rate`/s for `duration` s; at most `max_concurrency` conversations run at once."""
+    rng = random.Random(seed)
+    rec = LoadRecorder()
+    pool = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="guest")
+    t0 = time.perf_counter()
+
+    def _start(scheduled: float, conv_seed: int):
+        conv_rng = random.Random(conv_seed)
+        with rec.lock:
+            rec.start_delays.append(time.perf_counter() - scheduled)
+        run_conversation(agent, guest_factory(conv_rng), turns, think_time, conv_rng, rec, t0)
+
+    next_at = t0 + rng.expovariate(rate)
+    while next_at < t0 + duration:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        with rec.lock:
+            # conversations accepted but not yet finished (running or waiting for a worker)
+            if max_backlog and rec.in_flight >= max_concurrency + max_backlog:
+                rec.dropped += 1
+                submit = False
+            else:
+                rec.in_flight += 1
+                rec.peak_in_flight = max(rec.peak_in_flight, rec.in_flight)
+                rec.conversations_started += 1
+                submit = True
+        if submit:
+            pool.submit(_start, next_at, rng.getrandbits(32))
+        next_at += rng.expovariate(rate)
+    pool.shutdown(wait=True)
+    rec.wall = time.perf_counter() - t0
+    return rec
+
+
+# --- Reporting ---
+def build_report(rec: LoadRecorder, counters: _AgentCounters, args) -> dict:
+    turns_ok = len(rec.turn_latencies)
+    turns_failed = sum(rec.turn_errors.values())
+    turns_total = turns_ok + turns_failed
+    wall = rec.wall or 1e-9
+    mean_turn = (sum(rec.turn_latencies) / turns_ok) if turns_ok else 0.0
+    return {
+        "target": {"rate_per_s": args.rate, "duration_s": args.duration, "turns": args.turns,
+                   "think_time_s": args.think_time, "max_concurrency": args.max_concurrency},
+        "wall_s": rec.wall,
+        "conversations": {
+            "started": rec.conversations_started,
+            "completed": rec.conversations_completed,
+            "failed": rec.conversations_failed,
+            "dropped": rec.dropped,
+            "achieved_rate_per_s": rec.conversations_started / args.duration if args.duration else 0.0,
+            "peak_in_flight": rec.peak_in_flight,
+        },
+        "turns": {
+            "total": turns_total,
+            "ok": turns_ok,
+            "failed": turns_failed,
+            "error_rate": turns_failed / turns_total if turns_total else 0.0,
+            "errors_by_type": dict(rec.turn_errors),
+            "throughput_per_s": turns_ok / wall,
+            # Little's law: average number of turns waiting on the Agent at once
+            "mean_concurrency": turns_ok / wall * mean_turn,
+            **latency_summary(rec.turn_latencies),
+        },
+        "start_delay": latency_summary(rec.start_delays),
+        "agent_api": {
+            "sessions_opened": counters.sessions_opened,
+            "sessions_ended": counters.sessions_ended,
+            "retries": counters.retries,
+            "requests": dict(sorted(counters.requests.items())),
+        },
+        "timeline": _timeline(rec, bucket=max(1.0, args.duration / 20)),
+    }
+
+
+def _timeline(rec: LoadRecorder, bucket: float) -> List[dict]:
+    """Per-bucket completed turns, errors and p95, to spot degradation over the run."""
+    buckets: Dict[int, List[tuple]] = {}
+    for end, lat, ok in rec.timeline:
+        buckets.setdefault(int(end // bucket), []).append((lat, ok))
+    out = []
+    for b in sorted(buckets):
+        lats = [lat for lat, ok in buckets[b] if ok]
+        out.append({
+            "t_s": b * bucket,
+            "turns": len(lats),
+            "errors": sum(1 for _, ok in buckets[b] if not ok),
+            "p95_ms": latency_summary(lats)["p95_ms"],
+        })
+    return out
+
+
+def print_report(report: dict, out=sys.stdout):
+    c, t, d, a = report["conversations"], report["turns"], report["start_delay"], report["agent_api"]
+    tgt = report["target"]
+    print(f"Offered {tgt['rate_per_s']:.2f} conv/s for {tgt['duration_s']:.0f}s "
+          f"({tgt['turns']} turns, think {tgt['think_time_s']:.1f}s, max {tgt['max_concurrency']} concurrent)", file=out)
+    print(f"  conversations  started {c['started']}  completed {c['completed']}  failed {c['failed']}  "
+          f"dropped {c['dropped']}  peak in flight {c['peak_in_flight']}", file=out)
+    print(f"  turns          {t['ok']} ok / {t['total']}  error rate {t['error_rate'] * 100:.1f}%  "
+          f"{t['throughput_per_s']:.2f} turns/s  mean concurrency {t['mean_concurrency']:.1f}", file=out)
+    print(f"  turn latency   p50 {t['p50_ms']:.0f} ms  p95 {t['p95_ms']:.0f} ms  p99 {t['p99_ms']:.0f} ms  "
+          f"max {t['max_ms']:.0f} ms", file=out)
+    print(f"  start delay    p50 {d['p50_ms']:.0f} ms  p95 {d['p95_ms']:.0f} ms  max {d['max_ms']:.0f} ms", file=out)
+    print(f"  agent api      sessions opened {a['sessions_opened']}  ended {a['sessions_ended']}  "
+          f"retries {a['retries']}", file=out)
+    for k, n in a["requests"].items():
+        print(f"                 {k:<24} {n}", file=out)
+    if t["errors_by_type"]:
+        print(f"  errors         {t['errors_by_type']}", file=out)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Open-loop (Poisson) load simulation of guest conversations.")
+    parser.add_argument("--rate", type=float, default=1.0, help="conversation arrivals per second")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of arrivals")
+    parser.add_argument("--turns", type=int, default=3, help="guest messages per conversation")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean seconds between a reply and the next message")
+    parser.add_argument("--max-concurrency", type=int, default=32, help="conversations running at once")
+    parser.add_argument("--max-backlog", type=int, default=0, help="drop arrivals beyond this many waiting (0 = never)")
+    parser.add_argument("--guest", choices=("scripted", "llm"), default="scripted")
+    parser.add_argument("--agent", choices=("llm", "crew"), default="llm")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--mock", action="store_true", help="run against a local mock_agent_server")
+    parser.add_argument("--latency", action="append", metavar="ENDPOINT=DIST",
+                        help="mock latency, e.g. messages=lognormal:-1.2,0.5 (with --mock)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="mock 5xx rate (with --mock)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="mock 429 rate (with --mock)")
+    parser.add_argument("--json", help="write the full report (with timeline) here")
+    args = parser.parse_args(argv)
+    if args.rate <= 0:
+        parser.error("--rate must be > 0")
+
+    server = None
+    if args.mock:
+        from mock_agent_server import MockAgentServer, MockConfig, _parse_latency_args
+        cfg = MockConfig(latency=_parse_latency_args(args.latency or ["all=lognormal:-1.6,0.4"]),
+                         error_rate=args.error_rate, rate_429=args.rate_429, seed=args.seed)
+        server = MockAgentServer(config=cfg).start()
+        configure_env(server.url)
+        os.environ.setdefault("CREW_LLM_BASE_URL", f"{server.url}/v1")
+    else:
+        from dotenv import load_dotenv
+        load_dotenv()
+
+    counters = metrics.add_hook(_AgentCounters())
+    agent = CrewAgent() if args.agent == "crew" else LLMAgent()
+    guest_factory = LLMGuest if args.guest == "llm" else ScriptedGuest
+    try:
+        rec = run_load(agent, guest_factory, args.rate, args.duration, args.turns, args.think_time,
+                       args.max_concurrency, args.max_backlog, args.seed)
+    finally:
+        agent.close()
+        metrics.remove_hook(counters)
+        if server is not None:
+            server.stop()
+
+    report = build_report(rec, counters, args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "argv": sys.argv[1:], **report}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
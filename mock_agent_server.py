@@ -0,0 +1,350 @@
+# mock_agent_server.py
+"""
+Local stand-in for the Salesforce endpoints SalesforceAgentAPI talks to
+(oauth2/token, Agent sessions create/delete, messages and messages/stream),
+plus a tiny OpenAI-compatible /v1/chat/completions for the CrewAI LLMs.
+
+    python mock_agent_server.py --port 8765 --latency messages=lognormal:-1.6,0.4 --rate-429 0.02
+
+Point the clients at it with SF_ORG_DOMAIN=SF_API_HOST=http://127.0.0.1:8765.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+ENDPOINTS = ("token", "start_session", "messages", "messages_stream", "end_session", "chat")
+
+# Reply shapes _extract_sf_text understands, plus the Agent API's own "Inform" shape
+SHAPES = ("inform", "message_text", "messages_content", "outputs", "answer")
+
+FAQ_ANSWERS = [
+    "Check-in is at 3 PM and check-out is at 11 AM.\\nEarly check-in is subject to availability.",
+    "The Kids Club is open daily from 9 AM to 5 PM for ages 4-12.",
+    "Self-parking is complimentary; valet parking is $25 per night.",
+    "The spa is open 8 AM to 8 PM. We recommend booking treatments 24 hours ahead.",
+    "Cancellations made 72 hours before arrival receive a full refund of the deposit.",
+]
+
+
+# --- Latency distributions ---
+def parse_latency(spec: str) -> Callable[[], float]:
+    """'fixed:0.05', 'uniform:0.02,0.2', 'normal:0.1,0.02', 'lognormal:mu,sigma' (seconds)."""
+    kind, _, args = spec.partition(":")
+    vals = [float(a) for a in args.split(",") if a]
+    if kind == "fixed":
+        return lambda: vals[0]
+    if kind == "uniform":
+        return lambda: random.uniform(vals[0], vals[1])
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(vals[0], vals[1]))
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(vals[0], vals[1])
+    raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+
+class MockConfig:
+    def __init__(
+        self,
+        latency: Optional[Dict[str, str]] = None,
+        error_rate: float = 0.0,
+        rate_401: float = 0.0,
+        rate_429: float = 0.0,
+        retry_after: float = 1.0,
+        token_ttl: float = 3600.0,
+        shape: str = "inform",
+        chunk_size: int = 16,
+        chunk_delay: float = 0.01,
+        seed: Optional[int] = None,
+    ):
+        self.latency = {ep: parse_latency((latency or {}).get(ep, "fixed:0")) for ep in ENDPOINTS}
+        self.error_rate = error_rate
+        self.rate_401 = rate_401
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.token_ttl = token_ttl
+        self.shape = shape  # one of SHAPES, or "mixed"
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        if seed is not None:
+            random.seed(seed)
+
+
+class _State:
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.lock = threading.Lock()
+        self.tokens: Dict[str, float] = {}
+        self.sessions: Dict[str, int] = {}
+        self.counts: Dict[str, int] = {ep: 0 for ep in ENDPOINTS}
+        self.statuses: Dict[str, int] = {}
+        self.sessions_opened = 0
+
+    def count(self, endpoint: str, status: int):
+        with self.lock:
+            self.counts[endpoint] += 1
+            self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "requests": dict(self.counts),
+                "salesforce_requests": sum(self.counts.values()) - self.counts["chat"],
+                "statuses": dict(self.statuses),
+                "sessions_open": len(self.sessions),
+                "sessions_opened": self.sessions_opened,
+            }
+
+
+def _reply_payload(text: str, shape: str) -> dict:
+    if shape == "mixed":
+        shape = random.choice(SHAPES)
+    if shape == "message_text":
+        return {"message": {"text": text}}
+    if shape == "messages_content":
+        return {"messages": [{"content": [{"type": "text", "text": text}]}]}
+    if shape == "outputs":
+        return {"outputs": [{"content": text}]}
+    if shape == "answer":
+        return {"answer": text}
+    return {"messages": [{"type": "Inform", "id": str(uuid.uuid4()), "message": text}]}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real endpoints
+    state: _State = None
+
+    def log_message(self, *args):
+        pass
+
+    # --- helpers ---
+    def _body(self) -> bytes:
+        n = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(n) if n else b""
+
+    def _send_json(self, endpoint: Optional[str], status: int, payload, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+        if endpoint:
+            self.state.count(endpoint, status)
+
+    def _inject(self, endpoint: str, check_auth: bool = True) -> bool:
+        """Sleep per the latency model and maybe answer with an injected error. True = handled."""
+        cfg = self.state.config
+        time.sleep(cfg.latency[endpoint]())
+        r = random.random()
+        if r < cfg.rate_429:
+            self._send_json(endpoint, 429, [{"errorCode": "REQUEST_LIMIT_EXCEEDED", "message": "mock rate limit"}],
+                            {"Retry-After": str(cfg.retry_after)})
+            return True
+        if r < cfg.rate_429 + cfg.error_rate:
+            self._send_json(endpoint, 500, {"error": "mock internal error"})
+            return True
+        if check_auth:
+            auth = self.headers.get("Authorization", "")
+            token = auth[7:] if auth.startswith("Bearer ") else ""
+            with self.state.lock:
+                exp = self.state.tokens.get(token)
+            if exp is None or exp < time.time() or random.random() < cfg.rate_401:
+                self._send_json(endpoint, 401, [{"errorCode": "INVALID_SESSION_ID", "message": "Session expired or invalid"}])
+                return True
+        return False
+
+    # --- routes ---
+    def do_GET(self):
+        if self.path == "/__stats__":
+            return self._send_json(None, 200, self.state.snapshot())
+        self._send_json(None, 404, {"error": "not found"})
+
+    def do_POST(self):
+        body = self._body()
+        path = self.path.split("?")[0]
+        if path == "/services/oauth2/token":
+            return self._token()
+        if re.fullmatch(r"/einstein/ai-agent/v1/agents/[^/]+/sessions", path):
+            return self._start_session()
+        m = re.fullmatch(r"/einstein/ai-agent/v1/sessions/([^/]+)/messages(/stream)?", path)
+        if m:
+            return self._message(m.group(1), bool(m.group(2)), body)
+        if path in ("/v1/chat/completions", "/chat/completions"):
+            return self._chat(body)
+        self._send_json(None, 404, {"error": "not found"})
+
+    def do_DELETE(self):
+        m = re.fullmatch(r"/einstein/ai-agent/v1/sessions/([^/]+)", self.path.split("?")[0])
+        if not m:
+            return self._send_json(None, 404, {"error": "not found"})
+        if self._inject("end_session"):
+            return
+        with self.state.lock:
+            self.state.sessions.pop(m.group(1), None)
+        self._send_json("end_session", 200, {"messages": [{"type": "SessionEnded", "id": str(uuid.uuid4())}]})
+
+    def _token(self):
+        if self._inject("token", check_auth=False):
+            return
+        token = f"mock-{uuid.uuid4().hex}"
+        with self.state.lock:
+            self.state.tokens[token] = time.time() + self.state.config.token_ttl
+        self._send_json("token", 200, {
+            "access_token": token,
+            "instance_url": f"http://{self.headers.get('Host', 'localhost')}",
+            "token_type": "Bearer",
+            "issued_at": str(int(time.time() * 1000)),
+        })
+
+    def _start_session(self):
+        if self._inject("start_session"):
+            return
+        sid = str(uuid.uuid4())
+        with self.state.lock:
+            self.state.sessions[sid] = 0
+            self.state.sessions_opened += 1
+        self._send_json("start_session", 200, {
+            "sessionId": sid,
+            "messages": [{"type": "Inform", "id": str(uuid.uuid4()), "message": "Hi, I'm the Coral Cloud assistant."}],
+        })
+
+    def _message(self, sid: str, stream: bool, body: bytes):
+        endpoint = "messages_stream" if stream else "messages"
+        if self._inject(endpoint):
+            return
+        with self.state.lock:
+            known = sid in self.state.sessions
+            if known:
+                self.state.sessions[sid] += 1
+        if not known:
+            return self._send_json(endpoint, 404, [{"errorCode": "NOT_FOUND", "message": "Unknown session"}])
+        answer = random.choice(FAQ_ANSWERS)
+        if not stream:
+            return self._send_json(endpoint, 200, _reply_payload(answer, self.state.config.shape))
+
+        cfg = self.state.config
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(payload: dict):
+            data = f"data: {json.dumps(payload)}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        event({"message": {"type": "ProgressIndicator", "message": "Working on it..."}})
+        for i in range(0, len(answer), cfg.chunk_size):
+            time.sleep(cfg.chunk_delay)
+            event({"message": {"type": "TextChunk", "message": answer[i:i + cfg.chunk_size]}})
+        event({"message": {"type": "Inform", "message": answer}})
+        event({"message": {"type": "EndOfTurn"}})
+        self.wfile.write(b"0\r\n\r\n")
+        self.state.count(endpoint, 200)
+
+    def _chat(self, body: bytes):
+        """OpenAI-style completions that walk CrewAI agents through one tool call, then a final answer."""
+        if self._inject("chat", check_auth=False):
+            return
+        req = json.loads(body or b"{}")
+        msgs = req.get("messages") or []
+        text = "\n".join(str(m.get("content", "")) for m in msgs)
+        if "ONLY one word" in text:
+            content = "wedding" if "wedding" in text.lower().split("only one word")[-1] else "vacation"
+        elif "salesforce_agent_tool" in text and "Observation:" not in text:
+            content = ('Thought: I should ask the resort agent.\nAction: salesforce_agent_tool\n'
+                       'Action Input: {"prompt": "List the options that fit this request."}')
+        else:
+            content = "Thought: I now know the final answer\nFinal Answer: " + random.choice(FAQ_ANSWERS)
+        self._send_json("chat", 200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": req.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(text) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(text) + len(content)) // 4},
+        })
+
+
+class MockAgentServer:
+    """Threaded mock server; use as a context manager or start()/stop()."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, config: Optional[MockConfig] = None):
+        self.state = _State(config or MockConfig())
+        handler = type("MockAgentHandler", (_Handler,), {"state": self.state})
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stats(self) -> dict:
+        return self.state.snapshot()
+
+    def start(self) -> "MockAgentServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-agent-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _parse_latency_args(items) -> Dict[str, str]:
+    out = {}
+    for item in items or []:
+        ep, _, spec = item.partition("=")
+        if ep == "all":
+            out.update({e: spec for e in ENDPOINTS})
+        else:
+            out[ep] = spec
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Salesforce Einstein Agent API server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", action="append", metavar="ENDPOINT=DIST",
+                        help=f"endpoint in {ENDPOINTS} or 'all'; e.g. messages=lognormal:-1.6,0.4")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 500 responses")
+    parser.add_argument("--rate-401", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--token-ttl", type=float, default=3600.0)
+    parser.add_argument("--shape", default="inform", choices=SHAPES + ("mixed",))
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    cfg = MockConfig(
+        latency=_parse_latency_args(args.latency), error_rate=args.error_rate, rate_401=args.rate_401,
+        rate_429=args.rate_429, retry_after=args.retry_after, token_ttl=args.token_ttl,
+        shape=args.shape, seed=args.seed,
+    )
+    server = MockAgentServer(args.host, args.port, cfg)
+    print(f"Mock Agent API listening on {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
@@ -1,13 +1,49 @@
 import os
+import time
 import uuid
 import json
 import requests
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterable, Iterator, List
 from dotenv import load_dotenv, find_dotenv
 
+import salesforce_metrics as metrics
+import tracing
+from salesforce_errors import SalesforceAPIError, error_for_response, parse_retry_after
+from salesforce_resilience import DEFAULT_RETRY_POLICIES, OrgGuard, RetryPolicy, get_org_guard
+from salesforce_http import DEFAULT_POOL_MAXSIZE, HttpTransport, get_default_transport
+from salesforce_token_cache import TokenCache, get_token_cache
+
 # Load .env
 load_dotenv(find_dotenv(), override=False)
+metrics.enable_metrics_from_env()
 
+# Used as-is when adaptive timeouts are off (SF_ADAPTIVE_TIMEOUTS=0) or the endpoint has no bounds
 DEFAULT_TIMEOUT = 30
+_NO_SLOT = nullcontext()
+
+
+def iter_sse_events(lines: Iterable[str]) -> Iterator[dict]:
+    """Parse server-sent events into their JSON `data` payloads (non-JSON data is skipped)."""
+    data: List[str] = []
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line:
+            if data:
+                try:
+                    yield json.loads("\n".join(data))
+                except ValueError:
+                    pass
+                data = []
+            continue
+        if line.startswith("data:"):
+            data.append(line[5:].lstrip())
+    if data:
+        try:
+            yield json.loads("\n".join(data))
+        except ValueError:
+            pass
 
 
 class SalesforceAgentAPI:
@@ -18,6 +54,12 @@ class SalesforceAgentAPI:
         client_secret=None,
         agent_id=None,
         sf_api_host=None,
+        token_cache: TokenCache = None,
+        transport: HttpTransport = None,
+        pool_maxsize: int = None,
+        http2: bool = None,
+        retry_policies: Dict[str, RetryPolicy] = None,
+        guard: OrgGuard = None,
     ):
         # Read from .env (use defaults if not provided)
         self.MY_DOMAIN = my_domain or os.getenv("SF_ORG_DOMAIN", "https://your-domain.my.salesforce.com")
@@ -25,9 +67,152 @@ class SalesforceAgentAPI:
         self.CLIENT_SECRET = client_secret or os.getenv("SF_CLIENT_SECRET", "")
         self.AGENT_ID = agent_id or os.getenv("SF_AGENT_ID", "")
         self.SF_API_HOST = sf_api_host or os.getenv("SF_API_HOST", "https://api.salesforce.com")
+        # Shared across every client in the process unless one is passed explicitly
+        self._token_cache = token_cache or get_token_cache()
+        # Pooled keep-alive connections. By default one transport is shared process-wide;
+        # asking for a specific pool size / HTTP/2 gives this client its own.
+        self._owns_transport = transport is None and (pool_maxsize is not None or http2 is not None)
+        if self._owns_transport:
+            self._transport = HttpTransport(pool_maxsize=pool_maxsize or DEFAULT_POOL_MAXSIZE, http2=http2)
+            if os.getenv("SF_CASSETTE"):
+                from salesforce_cassette import maybe_wrap_transport
+                self._transport = maybe_wrap_transport(self._transport)
+        else:
+            self._transport = transport or get_default_transport()
+        # Per-endpoint retry/backoff (overrides merge over the defaults) and the
+        # org-wide rate limiter + circuit breaker shared by every client of this org
+        self._retry_policies = {**DEFAULT_RETRY_POLICIES, **(retry_policies or {})}
+        self._guard = guard or get_org_guard(self.MY_DOMAIN)
 
     # --- Utility ---
-    def _raise_for_status_with_body(self, resp: requests.Response):
+    def _request(self, method: str, url: str, endpoint: str = "other", **kwargs) -> requests.Response:
+        """
+        One logical call: rate-limited, guarded by the circuit breaker and retried per
+        the endpoint's RetryPolicy. Returns the last response; callers raise on its status.
+        """
+        with tracing.span(endpoint, "agent_api", method=method) as sp:
+            return self._request_with_retries(method, url, endpoint, sp, kwargs)
+
+    def _request_with_retries(self, method: str, url: str, endpoint: str, sp, kwargs: dict) -> requests.Response:
+        guard = self._guard
+        adaptive = "timeout" not in kwargs
+        policy = self._retry_policies.get(endpoint) or RetryPolicy(max_attempts=1)
+        limiter, breaker = guard.limiter, guard.breaker
+        start = time.perf_counter() if metrics.HOOKS else 0.0
+        attempt, r = 0, None
+        try:
+            while True:
+                attempt += 1
+                if adaptive:
+                    kwargs["timeout"] = guard.timeout_for(endpoint, DEFAULT_TIMEOUT)
+                try:
+                    # A slot from the priority scheduler is held per attempt, never across backoff sleeps.
+                    # It is taken before the breaker check so a shed call never holds the half-open trial.
+                    with guard.scheduler.slot() if guard.scheduler else _NO_SLOT:
+                        if breaker:
+                            breaker.before_call(endpoint)
+                        failed = None
+                        try:
+                            if limiter:
+                                limiter.acquire()
+                            sent = time.perf_counter()
+                            try:
+                                r = self._transport.request(method, url, **kwargs)
+                            except (requests.ConnectionError, requests.Timeout):
+                                failed = True
+                                raise
+                            failed = r.status_code >= 500
+                        finally:
+                            if breaker:
+                                breaker.settle(failed)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    if isinstance(e, requests.Timeout):
+                        guard.observe(endpoint, kwargs["timeout"], timed_out=True)
+                    if not policy.should_retry_exception(attempt):
+                        raise
+                    time.sleep(policy.delay(attempt))
+                    continue
+                except SalesforceAPIError as e:
+                    # Shed by the scheduler or the breaker: nothing reached Salesforce, so any endpoint may retry
+                    if not policy.should_retry_error(e, attempt):
+                        raise
+                    time.sleep(policy.delay(attempt, e.retry_after))
+                    continue
+
+                status = r.status_code
+                if status < 500:
+                    guard.observe(endpoint, time.perf_counter() - sent)
+                if not policy.should_retry_status(status, attempt):
+                    return r
+                retry_after = parse_retry_after(r.headers.get("Retry-After"))
+                wait = policy.delay(attempt, retry_after)
+                if status == 429 and limiter:
+                    limiter.pause(wait)  # slow every caller down, not just this one
+                time.sleep(wait)
+        finally:
+            if sp is not None:
+                sp.set(status=r.status_code if r is not None else 0, attempts=attempt)
+            if metrics.HOOKS:
+                metrics.emit_request(
+                    endpoint, method, r.status_code if r is not None else 0, time.perf_counter() - start,
+                    metrics.payload_size(kwargs), len(r.content) if r is not None else 0, retries=attempt - 1,
+                )
+
+    @contextmanager
+    def _stream(self, method: str, url: str, endpoint: str = "other", **kwargs):
+        # Rate-limited and breaker-guarded, but never retried: chunks may already be delivered.
+        # The adaptive timeout bounds the wait for headers and each gap between chunks.
+        kwargs.setdefault("timeout", self._guard.timeout_for(endpoint, DEFAULT_TIMEOUT))
+        with tracing.span(endpoint, "agent_api", method=method):
+            with self._guarded_stream(method, url, endpoint, kwargs) as out:
+                yield out
+
+    @contextmanager
+    def _guarded_stream(self, method: str, url: str, endpoint: str, kwargs: dict):
+        # The scheduler slot is held until the stream is fully read
+        with self._guard.scheduler.slot() if self._guard.scheduler else _NO_SLOT:
+            with self._limited_stream(method, url, endpoint, kwargs) as out:
+                yield out
+
+    @contextmanager
+    def _limited_stream(self, method: str, url: str, endpoint: str, kwargs: dict):
+        breaker = self._guard.breaker
+        if breaker:
+            breaker.before_call(endpoint)
+        start = time.perf_counter()
+        status, received = 0, [0]
+
+        def _count(lines):
+            for line in lines:
+                received[0] += len(line) + 1
+                yield line
+
+        failed = None
+        try:
+            if self._guard.limiter:
+                self._guard.limiter.acquire()
+            with self._transport.stream(method, url, **kwargs) as (r, lines):
+                status = r.status_code
+                yield r, (_count(lines) if metrics.HOOKS else lines)
+        except (requests.ConnectionError, requests.Timeout):
+            failed = True
+            raise
+        except BaseException:
+            # The caller's own errors (e.g. raising on a 401) say nothing about the org's health
+            failed = status >= 500 if status else None
+            raise
+        else:
+            failed = status >= 500
+        finally:
+            # Always settle the breaker, or a half-open trial would stay "in flight" forever
+            if breaker:
+                breaker.settle(failed)
+            if metrics.HOOKS:
+                metrics.emit_request(endpoint, method, status, time.perf_counter() - start,
+                                     metrics.payload_size(kwargs), received[0])
+
+    def _raise_for_status_with_body(self, resp: requests.Response, endpoint: str = None):
+        """Raise a typed SalesforceAPIError (AuthError, RateLimitError, ...) carrying status and Retry-After."""
         try:
             resp.raise_for_status()
         except requests.HTTPError as e:
@@ -36,23 +221,36 @@ class SalesforceAgentAPI:
                 msg += json.dumps(resp.json(), indent=2)
             except Exception:
                 msg += resp.text
-            raise requests.HTTPError(msg) from e
+            raise error_for_response(resp, msg, endpoint) from e
+
+    # --- Auth ---
+    def _token_key(self):
+        return (self.MY_DOMAIN, self.CLIENT_ID)
+
+    def _fetch_token_for_cache(self):
+        payload = self.fetch_access_token()
+        ttl = payload.get("expires_in")
+        return payload["access_token"], (float(ttl) if ttl else None)
 
-    # --- Core Methods ---
     def get_access_token(self) -> str:
-        """OAuth2 client-credentials authentication."""
+        """OAuth2 client-credentials token, served from the shared token cache."""
+        return self._token_cache.get(self._token_key(), self._fetch_token_for_cache)
+
+    def invalidate_token(self, token: str = None):
+        """Drop a rejected (e.g. 401) token so the next get_access_token() refreshes it."""
+        self._token_cache.invalidate(self._token_key(), token)
+
+    # --- Request builders (shared with the async client) ---
+    def _token_request(self):
         url = f"{self.MY_DOMAIN}/services/oauth2/token"
         data = {
             "grant_type": "client_credentials",
             "client_id": self.CLIENT_ID,
             "client_secret": self.CLIENT_SECRET,
         }
-        r = requests.post(url, data=data, timeout=DEFAULT_TIMEOUT)
-        self._raise_for_status_with_body(r)
-        return r.json()["access_token"]
+        return "POST", url, {"data": data}
 
-    def start_session(self, token: str) -> str:
-        """Start a new Agent session."""
+    def _start_session_request(self, token: str):
         url = f"{self.SF_API_HOST}/einstein/ai-agent/v1/agents/{self.AGENT_ID}/sessions"
         headers = {
             "Authorization": f"Bearer {token}",
@@ -70,12 +268,9 @@ class SalesforceAgentAPI:
                 {"name": "$Context.EndUserLanguage", "type": "Text", "value": "en_US"}
             ],
         }
-        r = requests.post(url, json=body, headers=headers, timeout=DEFAULT_TIMEOUT)
-        self._raise_for_status_with_body(r)
-        return r.json()["sessionId"]
+        return "POST", url, {"json": body, "headers": headers}
 
-    def send_message_sync(self, token: str, session_id: str, text: str, sequence_id: int = 1) -> dict:
-        """Send a synchronous text message to the session."""
+    def _send_message_request(self, token: str, session_id: str, text: str, sequence_id: int = 1):
         url = f"{self.SF_API_HOST}/einstein/ai-agent/v1/sessions/{session_id}/messages"
         headers = {
             "Authorization": f"Bearer {token}",
@@ -86,25 +281,120 @@ class SalesforceAgentAPI:
             "message": {"sequenceId": sequence_id, "type": "Text", "text": text},
             "variables": [],
         }
-        r = requests.post(url, json=body, headers=headers, timeout=DEFAULT_TIMEOUT)
-        self._raise_for_status_with_body(r)
-        return r.json()
+        return "POST", url, {"json": body, "headers": headers}
 
-    def end_session(self, token: str, session_id: str, reason: str = "UserRequest") -> dict:
-        """End the session gracefully."""
+    def _send_message_stream_request(self, token: str, session_id: str, text: str, sequence_id: int = 1):
+        method, url, kwargs = self._send_message_request(token, session_id, text, sequence_id)
+        kwargs["headers"]["Accept"] = "text/event-stream"
+        return method, f"{url}/stream", kwargs
+
+    def _end_session_request(self, token: str, session_id: str, reason: str = "UserRequest"):
         url = f"{self.SF_API_HOST}/einstein/ai-agent/v1/sessions/{session_id}"
         headers = {
             "Authorization": f"Bearer {token}",
             "Accept": "application/json",
             "x-session-end-reason": reason,
         }
-        r = requests.delete(url, headers=headers, timeout=DEFAULT_TIMEOUT)
-        self._raise_for_status_with_body(r)
+        return "DELETE", url, {"headers": headers}
+
+    @staticmethod
+    def _end_session_result(r: requests.Response) -> dict:
         try:
             return r.json()
         except Exception:
             return {"ok": True, "status": r.status_code}
 
+    def latency_stats(self) -> dict:
+        """Per-endpoint latency percentiles, current adaptive timeouts and hedge counters for this org."""
+        return self._guard.latency_stats()
+
+    def scheduler_stats(self) -> dict:
+        """Per-priority-class running/queued/shed counts and queue wait times (empty when the scheduler is off)."""
+        return self._guard.scheduler.stats() if self._guard.scheduler else {}
+
+    def _hedged(self, endpoint: str, fn, on_surplus=None):
+        hedger = self._guard.hedger
+        if hedger is None:
+            return fn()
+        return hedger.call(endpoint, fn, self._guard.hedge_delay(endpoint), on_surplus)
+
+    # --- Core Methods ---
+    def fetch_access_token(self) -> dict:
+        """OAuth2 client-credentials authentication (always hits the token endpoint; hedged when SF_HEDGE=1)."""
+        return self._hedged("token", self._fetch_access_token_once)
+
+    def _fetch_access_token_once(self) -> dict:
+        method, url, kwargs = self._token_request()
+        r = self._request(method, url, endpoint="token", **kwargs)
+        self._raise_for_status_with_body(r, "token")
+        return r.json()
+
+    def start_session(self, token: str) -> str:
+        """Start a new Agent session (hedged when SF_HEDGE=1; a losing hedge's session is ended)."""
+        return self._hedged("start_session", lambda: self._start_session_once(token),
+                            lambda sid: self._end_surplus_session(token, sid))
+
+    def _start_session_once(self, token: str) -> str:
+        method, url, kwargs = self._start_session_request(token)
+        r = self._request(method, url, endpoint="start_session", **kwargs)
+        self._raise_for_status_with_body(r, "start_session")
+        if metrics.HOOKS:
+            metrics.emit_sessions(+1)
+        return r.json()["sessionId"]
+
+    def _end_surplus_session(self, token: str, session_id: str):
+        try:
+            self.end_session(token, session_id, reason="UserRequest")
+        except Exception:
+            pass
+
+    def send_message_sync(self, token: str, session_id: str, text: str, sequence_id: int = 1) -> dict:
+        """Send a synchronous text message to the session."""
+        method, url, kwargs = self._send_message_request(token, session_id, text, sequence_id)
+        r = self._request(method, url, endpoint="messages", **kwargs)
+        self._raise_for_status_with_body(r, "messages")
+        return r.json()
+
+    def send_message_stream(self, token: str, session_id: str, text: str, sequence_id: int = 1) -> Iterator[str]:
+        """
+        Send a text message over the streaming endpoint and yield text chunks as they
+        arrive. Falls back to the final Inform message if the agent sends no chunks.
+        """
+        method, url, kwargs = self._send_message_stream_request(token, session_id, text, sequence_id)
+        with self._stream(method, url, endpoint="messages_stream", **kwargs) as (r, lines):
+            self._raise_for_status_with_body(r, "messages_stream")
+            chunked = False
+            for event in iter_sse_events(lines):
+                msg = event.get("message") or {}
+                mtype = msg.get("type")
+                if mtype == "TextChunk" and msg.get("message"):
+                    chunked = True
+                    yield msg["message"]
+                elif mtype == "Inform" and not chunked and msg.get("message"):
+                    yield msg["message"]
+                elif mtype == "EndOfTurn":
+                    break
+
+    def end_session(self, token: str, session_id: str, reason: str = "UserRequest") -> dict:
+        """End the session gracefully."""
+        method, url, kwargs = self._end_session_request(token, session_id, reason)
+        r = self._request(method, url, endpoint="end_session", **kwargs)
+        self._raise_for_status_with_body(r, "end_session")
+        if metrics.HOOKS:
+            metrics.emit_sessions(-1)
+        return self._end_session_result(r)
+
+    def close(self):
+        """Release pooled connections owned by this client (shared transports stay open)."""
+        if self._owns_transport:
+            self._transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
 
 if __name__ == "__main__":
     # Reads everything from .env automatically
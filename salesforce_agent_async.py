@@ -0,0 +1,259 @@
+# salesforce_agent_async.py
+import asyncio
+import time
+import weakref
+from contextlib import nullcontext
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import httpx
+import requests
+
+import salesforce_metrics as metrics
+import tracing
+from salesforce_agent_API import DEFAULT_TIMEOUT, SalesforceAgentAPI
+from salesforce_errors import SalesforceAPIError, parse_retry_after
+from salesforce_http import DEFAULT_POOL_MAXSIZE, _to_requests_response
+from salesforce_resilience import RetryPolicy
+
+DEFAULT_CONCURRENCY = 32
+_NO_ASLOT = nullcontext()
+
+
+async def gather_limited(aws: Iterable[Awaitable[Any]], limit: int = DEFAULT_CONCURRENCY,
+                         return_exceptions: bool = False) -> List[Any]:
+    """asyncio.gather with at most `limit` awaitables in flight; results keep input order."""
+    sem = asyncio.Semaphore(max(1, limit))
+
+    async def _run(aw):
+        async with sem:
+            return await aw
+
+    return await asyncio.gather(*(_run(aw) for aw in aws), return_exceptions=return_exceptions)
+
+
+class AsyncSalesforceAgentAPI:
+    """
+    asyncio twin of SalesforceAgentAPI (same four operations, same config and
+    shared token cache) built on httpx.AsyncClient, plus fan-out helpers.
+    """
+
+    def __init__(self, api: Optional[SalesforceAgentAPI] = None, max_connections: int = DEFAULT_POOL_MAXSIZE * 4,
+                 http2: bool = False, **api_kwargs):
+        # The sync client holds config, request builders and the token cache key
+        self.api = api or SalesforceAgentAPI(**api_kwargs)
+        self.max_connections = max_connections
+        self.http2 = http2
+        # httpx async clients (and asyncio locks) are bound to the loop they were created
+        # on, so each loop gets its own; an entry goes away with its loop
+        self._per_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[httpx.AsyncClient, asyncio.Lock]]" = \
+            weakref.WeakKeyDictionary()
+
+    # --- Utility ---
+    def _loop_state(self) -> Tuple[httpx.AsyncClient, asyncio.Lock]:
+        loop = asyncio.get_running_loop()
+        state = self._per_loop.get(loop)
+        if state is None:
+            # A closed loop's client can no longer be awaited; drop it so its sockets are freed
+            for old in [lp for lp in self._per_loop.keys() if lp.is_closed()]:
+                self._per_loop.pop(old, None)
+            client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+            state = self._per_loop[loop] = (client, asyncio.Lock())
+        return state
+
+    def _http(self) -> httpx.AsyncClient:
+        return self._loop_state()[0]
+
+    async def _request(self, method: str, url: str, endpoint: str = "other", **kwargs):
+        """Same retry / rate-limit / circuit-breaker semantics as SalesforceAgentAPI._request."""
+        with tracing.span(endpoint, "agent_api", method=method) as sp:
+            return await self._request_with_retries(method, url, endpoint, sp, kwargs)
+
+    async def _request_with_retries(self, method: str, url: str, endpoint: str, sp, kwargs: dict):
+        guard = self.api._guard
+        adaptive = "timeout" not in kwargs
+        policy = self.api._retry_policies.get(endpoint) or RetryPolicy(max_attempts=1)
+        limiter, breaker = guard.limiter, guard.breaker
+        # A transport that serves async requests itself (the record/replay cassette) bypasses httpx
+        arequest = getattr(self.api._transport, "arequest", None)
+        start = time.perf_counter()
+        attempt, r = 0, None
+        try:
+            while True:
+                attempt += 1
+                if adaptive:
+                    kwargs["timeout"] = guard.timeout_for(endpoint, DEFAULT_TIMEOUT)
+                try:
+                    # Slot first, then the breaker: a shed or cancelled call must never keep the half-open trial
+                    async with guard.scheduler.aslot() if guard.scheduler else _NO_ASLOT:
+                        if breaker:
+                            breaker.before_call(endpoint)
+                        failed = None
+                        try:
+                            if limiter:
+                                wait = limiter.reserve()
+                                if wait > 0:
+                                    await asyncio.sleep(wait)
+                            sent = time.perf_counter()
+                            try:
+                                if arequest is not None:
+                                    r = await arequest(method, url, **kwargs)
+                                else:
+                                    r = await self._http().request(method, url, **kwargs)
+                            except (httpx.TransportError, requests.ConnectionError, requests.Timeout):
+                                failed = True
+                                raise
+                            failed = r.status_code >= 500
+                        finally:
+                            if breaker:
+                                breaker.settle(failed)
+                except (httpx.TransportError, requests.ConnectionError, requests.Timeout) as e:
+                    if isinstance(e, (httpx.TimeoutException, requests.Timeout)):
+                        guard.observe(endpoint, kwargs["timeout"], timed_out=True)
+                    if not policy.should_retry_exception(attempt):
+                        if not isinstance(e, httpx.TransportError):
+                            raise
+                        raise (requests.Timeout if isinstance(e, httpx.TimeoutException)
+                               else requests.ConnectionError)(str(e)) from e
+                    await asyncio.sleep(policy.delay(attempt))
+                    continue
+                except SalesforceAPIError as e:
+                    # Shed by the scheduler or the breaker: nothing reached Salesforce, so any endpoint may retry
+                    if not policy.should_retry_error(e, attempt):
+                        raise
+                    await asyncio.sleep(policy.delay(attempt, e.retry_after))
+                    continue
+
+                if r.status_code < 500:
+                    guard.observe(endpoint, time.perf_counter() - sent)
+                if not policy.should_retry_status(r.status_code, attempt):
+                    break
+                wait = policy.delay(attempt, parse_retry_after(r.headers.get("Retry-After")))
+                if r.status_code == 429 and limiter:
+                    limiter.pause(wait)
+                await asyncio.sleep(wait)
+        finally:
+            if sp is not None:
+                sp.set(status=r.status_code if r is not None else 0, attempts=attempt)
+            if metrics.HOOKS:
+                metrics.emit_request(
+                    endpoint, method, r.status_code if r is not None else 0, time.perf_counter() - start,
+                    metrics.payload_size(kwargs), len(r.content) if r is not None else 0, retries=attempt - 1,
+                )
+        resp = r if isinstance(r, requests.Response) else _to_requests_response(r)
+        self.api._raise_for_status_with_body(resp, endpoint)
+        return resp
+
+    async def _hedged(self, endpoint: str, fn, on_surplus=None):
+        hedger = self.api._guard.hedger
+        if hedger is None:
+            return await fn()
+        return await hedger.acall(endpoint, fn, self.api._guard.hedge_delay(endpoint), on_surplus)
+
+    # --- Core Methods ---
+    async def fetch_access_token(self) -> dict:
+        return await self._hedged("token", self._fetch_access_token_once)
+
+    async def _fetch_access_token_once(self) -> dict:
+        method, url, kwargs = self.api._token_request()
+        return (await self._request(method, url, endpoint="token", **kwargs)).json()
+
+    async def get_access_token(self) -> str:
+        """Token from the process-wide cache; one coroutine per loop fetches on a miss."""
+        cache, key = self.api._token_cache, self.api._token_key()
+        tok = cache.peek(key)
+        if tok:
+            return tok
+        async with self._loop_state()[1]:
+            tok = cache.peek(key)
+            if tok:
+                return tok
+            payload = await self.fetch_access_token()
+            ttl = payload.get("expires_in")
+            cache.put(key, payload["access_token"], float(ttl) if ttl else None)
+            return payload["access_token"]
+
+    def invalidate_token(self, token: str = None):
+        self.api.invalidate_token(token)
+
+    async def start_session(self, token: str) -> str:
+        async def _end_surplus(sid):
+            try:
+                await self.end_session(token, sid)
+            except Exception:
+                pass
+
+        return await self._hedged("start_session", lambda: self._start_session_once(token), _end_surplus)
+
+    async def _start_session_once(self, token: str) -> str:
+        method, url, kwargs = self.api._start_session_request(token)
+        sid = (await self._request(method, url, endpoint="start_session", **kwargs)).json()["sessionId"]
+        if metrics.HOOKS:
+            metrics.emit_sessions(+1)
+        return sid
+
+    async def send_message_sync(self, token: str, session_id: str, text: str, sequence_id: int = 1) -> dict:
+        method, url, kwargs = self.api._send_message_request(token, session_id, text, sequence_id)
+        return (await self._request(method, url, endpoint="messages", **kwargs)).json()
+
+    async def end_session(self, token: str, session_id: str, reason: str = "UserRequest") -> dict:
+        method, url, kwargs = self.api._end_session_request(token, session_id, reason)
+        r = await self._request(method, url, endpoint="end_session", **kwargs)
+        if metrics.HOOKS:
+            metrics.emit_sessions(-1)
+        return self.api._end_session_result(r)
+
+    # --- Fan-out helpers ---
+    async def converse(self, texts: Sequence[str]) -> List[dict]:
+        """One session, messages sent in order, session ended at the end (best-effort)."""
+        token = await self.get_access_token()
+        session_id = await self.start_session(token)
+        try:
+            out = []
+            for seq, text in enumerate(texts, start=1):
+                out.append(await self.send_message_sync(token, session_id, text, sequence_id=seq))
+            return out
+        finally:
+            try:
+                await self.end_session(token, session_id)
+            except Exception:
+                pass
+
+    async def ask_many(self, prompts: Sequence[str], concurrency: int = DEFAULT_CONCURRENCY,
+                       return_exceptions: bool = False) -> List[Any]:
+        """Send each prompt on its own session, up to `concurrency` at once; results in input order."""
+        async def _one(p):
+            return (await self.converse([p]))[0]
+
+        return await gather_limited((_one(p) for p in prompts), concurrency, return_exceptions)
+
+    async def converse_many(self, conversations: Sequence[Sequence[str]], concurrency: int = DEFAULT_CONCURRENCY,
+                            return_exceptions: bool = False) -> List[Any]:
+        """Run many multi-message conversations concurrently (one session each)."""
+        return await gather_limited((self.converse(c) for c in conversations), concurrency, return_exceptions)
+
+    async def send_many(self, token: str, messages: Sequence[Dict[str, Any]], concurrency: int = DEFAULT_CONCURRENCY,
+                        return_exceptions: bool = False) -> List[Any]:
+        """
+        Send pre-addressed messages ({"session_id", "text", "sequence_id"}) across existing sessions.
+        Callers are responsible for not interleaving two messages on the same session.
+        """
+        return await gather_limited(
+            (self.send_message_sync(token, m["session_id"], m["text"], m.get("sequence_id", 1)) for m in messages),
+            concurrency, return_exceptions,
+        )
+
+    async def aclose(self):
+        """Close this loop's pooled connections (call before the loop ends, e.g. at the end of asyncio.run)."""
+        state = self._per_loop.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await state[0].aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
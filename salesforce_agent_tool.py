@@ -1,12 +1,19 @@
 # salesforce_crewai_tool.py
-import time
 import json
+import uuid
 from typing import List, Optional
 from pydantic import Field
 from crewai.tools import BaseTool
 
 
 from salesforce_agent_API import SalesforceAgentAPI  # <-- your core class
+from salesforce_agent_async import AsyncSalesforceAgentAPI
+from salesforce_session_pool import AgentSessionPool
+from salesforce_prefetch import SessionPrefetcher
+from salesforce_answer_cache import AnswerCache, looks_like_raw_payload
+from salesforce_conversations import current_conversation
+import crew_speculation
+import tracing
 
 class SalesforceAgentCrewTool(BaseTool):
     """
@@ -22,14 +29,36 @@ class SalesforceAgentCrewTool(BaseTool):
     # Optional config fields (Pydantic):
     tz: str = Field(default="America/Los_Angeles", description="Timezone for the session.")
     add_lang_var: bool = Field(default=True, description="Whether to add $Context.EndUserLanguage=en_US")
+    pool_size: int = Field(default=2, description="Warm Agent sessions kept open for tool calls.")
+    session_max_messages: int = Field(default=20, description="Recycle a pooled session after this many messages.")
+    session_max_age: float = Field(default=600.0, description="Recycle a pooled session after this many seconds.")
+    cache_answers: bool = Field(default=False, description="Cache answers per (agent, normalized prompt).")
+    cache_ttl: float = Field(default=3600.0, description="Seconds a cached answer stays valid.")
+    cache_max_entries: int = Field(default=1024, description="Max cached answers (LRU eviction).")
+    cache_path: Optional[str] = Field(default=None, description="Optional SQLite file so the cache survives restarts.")
 
     # Internal client (not validated/serialized by Pydantic):
     _client: SalesforceAgentAPI = None
+    _pool: AgentSessionPool = None
+    _async_client: AsyncSalesforceAgentAPI = None
+    _cache: Optional[AnswerCache] = None
+    _prefetcher: SessionPrefetcher = None
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         # You can pass explicit creds to SalesforceAgentTool(...) if you don't want env vars.
         self._client = SalesforceAgentAPI()
+        self._pool = AgentSessionPool(
+            self._client,
+            size=self.pool_size,
+            max_messages=self.session_max_messages,
+            max_age=self.session_max_age,
+            opener=self._start_session,
+        )
+        self._prefetcher = SessionPrefetcher(self._pool)
+        self._async_client = AsyncSalesforceAgentAPI(api=self._client)
+        if self.cache_answers:
+            self._cache = AnswerCache(ttl=self.cache_ttl, max_entries=self.cache_max_entries, path=self.cache_path)
 
     def _start_session(self, token: str, variables: Optional[List[dict]] = None) -> str:
         vars_payload = variables or []
@@ -49,27 +78,90 @@ class SalesforceAgentCrewTool(BaseTool):
         Required CrewAI method. Receives a single string argument (the user/tool instruction).
         Returns a short human-readable response (extracted from Agentforce payload).
         """
-        # 1) Auth
-        token = self._client.get_access_token()
+        # A discarded speculative run stops here, before it can lead a cache flight others join
+        crew_speculation.check_cancelled()
+        with tracing.span(self.name, "tool", prompt=prompt):
+            if self._cache is None:
+                return self._call_agent(prompt)
+            # Identical concurrent prompts share one upstream call
+            return self._cache.get_or_compute(AnswerCache.make_key(self._client.AGENT_ID, prompt),
+                                              lambda: self._call_agent(prompt), cacheable=self._is_answer)
 
-        # 2) Session
-        session_id = self._start_session(token)
+    def _call_agent(self, prompt: str) -> str:
+        # Counted against (and stopped in) a speculative flow run the router discarded
+        crew_speculation.count_sf_call()
 
+        # 1) Session: the one prefetched while routing (see prefetch()), else this
+        #    conversation's pooled session or a fresh warm one (sessions are never
+        #    shared across conversations); recycling and end_session happen in the
+        #    background, off the request path
+        # 2) Message, with the token from the shared cache (refreshed once on a 401)
+        payload = self._pool.send_message(prompt, session=self._prefetcher.adopt())
+        # 3) Extract nice text if present
+        return self._format_payload(payload)
+
+    async def _arun(self, prompt: str) -> str:
+        """Async path: lets one event loop drive many tool calls concurrently (same pool and cache as _run)."""
+        crew_speculation.check_cancelled()
+        with tracing.span(self.name, "tool", prompt=prompt):
+            if self._cache is None:
+                return await self._acall_agent(prompt)
+            # Identical concurrent prompts share one upstream call, across sync and async callers
+            return await self._cache.aget_or_compute(AnswerCache.make_key(self._client.AGENT_ID, prompt),
+                                                     lambda: self._acall_agent(prompt), cacheable=self._is_answer)
+
+    async def _acall_agent(self, prompt: str) -> str:
+        crew_speculation.count_sf_call()
+        # Outside a conversation() block each call is its own conversation (task ids are
+        # reused, so they cannot scope sessions); its session is recycled afterwards
+        key = current_conversation()
+        owned = key is None
+        if owned:
+            key = f"arun-{uuid.uuid4()}"
         try:
-            # 3) Message
-            payload = self._client.send_message_sync(
-                token=token,
-                session_id=session_id,
-                text=prompt,
-                sequence_id=int(time.time())
-            )
-            # 4) Extract nice text if present
-            messages = payload.get("messages", [])
-            texts = [m.get("message") for m in messages if m.get("type") == "Inform" and m.get("message")]
-            return "\n".join(texts).strip() if texts else json.dumps(payload, indent=2)
+            payload = await self._pool.asend_message(self._async_client, prompt, key=key)
         finally:
-            # 5) End session (best-effort)
-            try:
-                self._client.end_session(token, session_id)
-            except Exception:
-                pass
+            if owned:
+                self._pool.end_conversation(key)
+        return self._format_payload(payload)
+
+    @staticmethod
+    def _format_payload(payload: dict) -> str:
+        messages = payload.get("messages", [])
+        texts = [m.get("message") for m in messages if m.get("type") == "Inform" and m.get("message")]
+        return "\n".join(texts).strip() if texts else json.dumps(payload, indent=2)
+
+    @staticmethod
+    def _is_answer(text: str) -> bool:
+        """False for the raw-payload fallback of _format_payload, which is never cached."""
+        return not looks_like_raw_payload(text)
+
+    def prefetch(self):
+        """
+        Context manager: fetch the token and a session in the background right away,
+        for the first tool call made inside the block. Unused sessions go back to the pool.
+        """
+        return self._prefetcher.scope()
+
+    def prefetch_stats(self) -> dict:
+        """Prefetches started / adopted by a tool call / returned unused / skipped."""
+        return self._prefetcher.stats()
+
+    def end_conversation(self, conversation_id) -> int:
+        """Recycle the pooled sessions of a finished conversation so no later caller inherits its context."""
+        return self._pool.end_conversation(conversation_id)
+
+    def pool_stats(self) -> dict:
+        """Session pool size, hit/miss and wait-time counters (for sizing pool_size)."""
+        return self._pool.stats()
+
+    def cache_stats(self) -> dict:
+        """Answer-cache hit/miss/coalesced counters (empty when caching is off)."""
+        return self._cache.stats() if self._cache is not None else {}
+
+    def close(self):
+        """End all idle pooled sessions."""
+        self._prefetcher.close()
+        self._pool.close()
+        if self._cache is not None:
+            self._cache.close()
@@ -0,0 +1,313 @@
+# salesforce_answer_cache.py
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_TTL = 3600.0
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+
+
+def normalize_prompt(text: str) -> str:
+    """Case/whitespace-insensitive form so trivially different phrasings share an entry."""
+    text = re.sub(r"\s+", " ", (text or "").strip().lower())
+    return text.rstrip(" ?.!")
+
+
+def looks_like_raw_payload(text: str) -> bool:
+    """True for a reply that is a JSON object dumped as-is because it had no answer text (never cached)."""
+    try:
+        return isinstance(json.loads(text), dict)
+    except ValueError:
+        return False
+
+
+class _Flight:
+    __slots__ = ("event", "value", "error", "futures")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Optional[str] = None
+        self.error: Optional[BaseException] = None
+        self.futures: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []  # async waiters
+
+
+def _wake(fut: asyncio.Future):
+    if not fut.done():
+        fut.set_result(None)
+
+
+class _DiskStore:
+    """
+    SQLite-backed store so cached answers survive restarts. Trimmed least recently
+    used first: `stored` is the last write or read of a row.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, value TEXT, expires REAL, stored REAL)"
+        )
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._db.execute("SELECT value, expires FROM answers WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._db.execute("UPDATE answers SET stored = ? WHERE key = ?", (time.time(), key))
+                self._db.commit()
+        return (row[0], row[1]) if row else None
+
+    def put(self, key: str, value: str, expires: float):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers (key, value, expires, stored) VALUES (?, ?, ?, ?)",
+                (key, value, expires, time.time()),
+            )
+            self._db.execute("DELETE FROM answers WHERE expires < ?", (time.time(),))
+            self._db.execute(
+                "DELETE FROM answers WHERE key NOT IN (SELECT key FROM answers ORDER BY stored DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._db.execute("DELETE FROM answers WHERE key = ?", (key,))
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM answers")
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class AnswerCache:
+    """
+    Opt-in cache of Agent answers keyed on (agent id, normalized prompt).
+    In-memory LRU bounded by entry count and total bytes, entries expire after
+    `ttl` seconds, and an optional SQLite file (`path`, also LRU-trimmed) persists
+    them. Concurrent identical requests are coalesced into one upstream call.
+    Disk reads and writes never run under the in-memory lock.
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        path: Optional[str] = None,
+    ):
+        self.ttl = float(ttl)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._mem: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, _Flight] = {}
+        self._disk = _DiskStore(path, max_entries) if path else None
+
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+
+    @staticmethod
+    def make_key(agent_id: str, prompt: str) -> str:
+        raw = f"{agent_id}\x00{normalize_prompt(prompt)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # --- Memory LRU ---
+    def _mem_put_locked(self, key: str, value: str, expires: float):
+        old = self._mem.pop(key, None)
+        if old:
+            self._bytes -= len(old[0].encode("utf-8"))
+        self._mem[key] = (value, expires)
+        self._bytes += len(value.encode("utf-8"))
+        while self._mem and (len(self._mem) > self.max_entries or self._bytes > self.max_bytes):
+            _, (v, _) = self._mem.popitem(last=False)
+            self._bytes -= len(v.encode("utf-8"))
+            self._evictions += 1
+
+    def _mem_drop_locked(self, key: str):
+        old = self._mem.pop(key, None)
+        if old:
+            self._bytes -= len(old[0].encode("utf-8"))
+
+    def _lookup_locked(self, key: str) -> Optional[str]:
+        hit = self._mem.get(key)
+        if hit:
+            if hit[1] > time.time():
+                self._mem.move_to_end(key)
+                self._hits += 1
+                return hit[0]
+            self._mem_drop_locked(key)
+        return None
+
+    def _disk_lookup(self, key: str) -> Optional[str]:
+        """Second-level lookup (call without holding _lock); a hit is promoted into memory."""
+        if not self._disk:
+            return None
+        row = self._disk.get(key)
+        if not row or row[1] <= time.time():
+            return None
+        with self._lock:
+            self._mem_put_locked(key, row[0], row[1])
+            self._hits += 1
+            self._disk_hits += 1
+        return row[0]
+
+    # --- Public API ---
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            cached = self._lookup_locked(key)
+        return cached if cached is not None else self._disk_lookup(key)
+
+    def put(self, key: str, value: str, ttl: Optional[float] = None):
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._mem_put_locked(key, value, expires)
+        if self._disk:
+            self._disk.put(key, value, expires)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._mem_drop_locked(key)
+        if self._disk:
+            self._disk.delete(key)
+
+    def get_or_compute(self, key: str, compute: Callable[[], str],
+                       cacheable: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        Return the cached answer, or compute it once even if many threads ask at the same time.
+        A computed answer for which `cacheable` returns False (e.g. a placeholder) is handed to
+        the waiting callers but not stored.
+        """
+        with self._lock:
+            cached = self._lookup_locked(key)
+            if cached is not None:
+                return cached
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self._coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = self._disk_lookup(key)
+            if value is None:
+                self.record_miss()
+                value = compute()
+                if cacheable is None or cacheable(value):
+                    self.put(key, value)
+            flight.value = value
+            return value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+
+    async def aget_or_compute(self, key: str, compute: Callable[[], Awaitable[str]],
+                              cacheable: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        asyncio twin of get_or_compute(): waiters await the leader without blocking the
+        loop, and share flights with sync callers (from any thread or loop).
+        """
+        with self._lock:
+            cached = self._lookup_locked(key)
+            if cached is not None:
+                return cached
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self._coalesced += 1
+                loop = asyncio.get_running_loop()
+                fut = loop.create_future()
+                flight.futures.append((loop, fut))
+
+        if not leader:
+            await fut
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = self._disk_lookup(key)
+            if value is None:
+                self.record_miss()
+                value = await compute()
+                if cacheable is None or cacheable(value):
+                    self.put(key, value)
+            flight.value = value
+            return value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+
+    def _land(self, key: str, flight: _Flight):
+        """Retire a finished flight and wake its sync and async waiters."""
+        with self._lock:
+            self._inflight.pop(key, None)
+            futures, flight.futures = flight.futures, []
+        flight.event.set()
+        for loop, fut in futures:
+            try:
+                loop.call_soon_threadsafe(_wake, fut)
+            except RuntimeError:  # that loop is already closed
+                pass
+
+    def record_miss(self):
+        """For callers that use get()/put() directly (e.g. the streaming path)."""
+        with self._lock:
+            self._misses += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses + self._coalesced
+            return {
+                "entries": len(self._mem),
+                "bytes": self._bytes,
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "evictions": self._evictions,
+                # coalesced waiters were served without their own upstream call
+                "hit_rate": ((self._hits + self._coalesced) / lookups) if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            self._bytes = 0
+        if self._disk:
+            self._disk.clear()
+
+    def close(self):
+        if self._disk:
+            self._disk.close()
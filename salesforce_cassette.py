@@ -0,0 +1,337 @@
+# salesforce_cassette.py
+"""
+Record/replay of Salesforce Agent API and CrewAI LLM traffic.
+
+    SF_CASSETTE=runs/peak.db SF_CASSETTE_MODE=record  python crew_salesforce_cli.py route "..."
+    SF_CASSETTE=runs/peak.db SF_CASSETTE_MODE=replay  python crew_salesforce_cli.py route "..."
+
+Interactions are stored in one SQLite file (zlib-compressed bodies, indexed by a
+request fingerprint). Secrets are never written: credentials, Authorization
+headers and access tokens are dropped or redacted. Replay serves recorded
+responses in their original order per fingerprint, sleeping `latency_scale` x
+the recorded time (0 = as fast as possible, 1 = original timing).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+MODES = ("record", "replay", "auto")
+
+# Request fields that change per run or per org and must not affect matching
+_VOLATILE_JSON_FIELDS = ("externalSessionKey", "instanceConfig")  # instanceConfig carries the org host
+_SECRET_FORM_FIELDS = ("client_secret", "client_id")
+_KEY_HEADERS = ("accept", "x-session-end-reason")
+_SESSION_IN_PATH = re.compile(r"/sessions/[^/]+")
+
+
+class CassetteMiss(LookupError):
+    """Replay mode and nothing was recorded for this request."""
+
+
+def _pack(obj: Any) -> bytes:
+    return zlib.compress(json.dumps(obj, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+def _unpack(blob: Optional[bytes]) -> Any:
+    return json.loads(zlib.decompress(blob).decode("utf-8")) if blob else None
+
+
+def _digest(obj: Any) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def http_fingerprint(method: str, url: str, kwargs: dict) -> Tuple[str, str, dict]:
+    """
+    (exact key, loose key, redacted request). Host is ignored so a recording made
+    against one org or mock port replays against another; the loose key also
+    ignores the session id so concurrent replays can pick up any recorded session.
+    """
+    path = re.sub(r"^[a-z]+://[^/]+", "", url)
+    body: Any = None
+    if kwargs.get("json") is not None:
+        body = {k: v for k, v in kwargs["json"].items() if k not in _VOLATILE_JSON_FIELDS}
+    elif isinstance(kwargs.get("data"), dict):
+        body = {k: v for k, v in kwargs["data"].items() if k not in _SECRET_FORM_FIELDS}
+    headers = {k.lower(): v for k, v in (kwargs.get("headers") or {}).items() if k.lower() in _KEY_HEADERS}
+    request = {"method": method, "path": path, "body": body, "headers": headers}
+    loose = dict(request, path=_SESSION_IN_PATH.sub("/sessions/*", path))
+    return _digest(request), _digest(loose), request
+
+
+def _redact_response_body(body: bytes) -> bytes:
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return body
+    if isinstance(payload, dict) and "access_token" in payload:
+        payload["access_token"] = "cassette-token"
+        return json.dumps(payload).encode("utf-8")
+    return body
+
+
+class Cassette:
+    """One SQLite file of recorded interactions, plus the replay cursors over it."""
+
+    def __init__(self, path: str, mode: str = "replay", latency_scale: float = 0.0):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = max(0.0, float(latency_scale))
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS interactions ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT, key TEXT, loose_key TEXT, request BLOB,"
+            " status INTEGER, headers TEXT, body BLOB, chunks BLOB, elapsed REAL, recorded_at REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS interactions_key ON interactions (key)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS interactions_loose_key ON interactions (loose_key)")
+        self._db.commit()
+
+        # Replay cursors: fingerprint -> ids not served yet (the last one is repeated once exhausted)
+        self._by_key: Dict[str, Deque[int]] = {}
+        self._by_loose: Dict[str, Deque[int]] = {}
+        self._served: set = set()
+        for row_id, key, loose in self._db.execute("SELECT id, key, loose_key FROM interactions ORDER BY id"):
+            self._by_key.setdefault(key, deque()).append(row_id)
+            if loose:
+                self._by_loose.setdefault(loose, deque()).append(row_id)
+
+        # stats
+        self._hits = 0
+        self._loose_hits = 0
+        self._misses = 0
+        self._recorded = 0
+
+    # --- Storage ---
+    def _store(self, kind: str, key: str, loose: Optional[str], request: Any, status: int,
+               headers: Dict[str, str], body: bytes, chunks: Optional[List], elapsed: float):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO interactions (kind, key, loose_key, request, status, headers, body, chunks, elapsed,"
+                " recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, key, loose, _pack(request), status, json.dumps(headers), zlib.compress(body),
+                 _pack(chunks) if chunks is not None else None, elapsed, time.time()),
+            )
+            self._db.commit()
+            self._recorded += 1
+
+    def _take(self, key: str, loose: Optional[str]) -> Optional[tuple]:
+        with self._lock:
+            row_id = self._next(self._by_key.get(key))
+            if row_id is not None:
+                self._hits += 1
+            else:
+                row_id = self._next(self._by_loose.get(loose)) if loose else None
+                if row_id is None:
+                    self._misses += 1
+                    return None
+                self._loose_hits += 1
+            return self._db.execute(
+                "SELECT status, headers, body, chunks, elapsed FROM interactions WHERE id = ?", (row_id,)
+            ).fetchone()
+
+    def _next(self, ids: Optional[Deque[int]]) -> Optional[int]:
+        # Skip rows already served through the other index; the last one repeats once exhausted
+        if not ids:
+            return None
+        while len(ids) > 1 and ids[0] in self._served:
+            ids.popleft()
+        row_id = ids.popleft() if len(ids) > 1 else ids[0]
+        self._served.add(row_id)
+        return row_id
+
+    def _sleep(self, seconds: float):
+        if self.latency_scale and seconds > 0:
+            time.sleep(seconds * self.latency_scale)
+
+    # --- Generic (LLM) interactions ---
+    def call(self, kind: str, request: Any, fn: Callable[[], Any]) -> Any:
+        """Record or replay one call whose request and result are JSON-serializable."""
+        key = _digest({"kind": kind, "request": request})
+        if self.mode != "record":
+            row = self._take(key, None)
+            if row is not None:
+                self._sleep(row[4])
+                return json.loads(zlib.decompress(row[2]))
+            if self.mode == "replay":
+                raise CassetteMiss(f"no recorded {kind} call matches this request ({key[:12]})")
+        start = time.perf_counter()
+        result = fn()
+        self._store(kind, key, None, request, 200, {}, json.dumps(result, default=str).encode("utf-8"), None,
+                    time.perf_counter() - start)
+        return result
+
+    # --- HTTP ---
+    @staticmethod
+    def _response(method: str, url: str, status: int, headers: Dict[str, str], body: bytes) -> requests.Response:
+        resp = requests.Response()
+        resp.status_code = status
+        resp._content = body
+        resp.headers = requests.structures.CaseInsensitiveDict(headers)
+        resp.url = url
+        resp.reason = requests.status_codes._codes.get(status, ("",))[0].upper().replace("_", " ")
+        resp.encoding = "utf-8"
+        resp.request = requests.Request(method, url).prepare()
+        return resp
+
+    def replay_http(self, method: str, url: str, kwargs: dict) -> Optional[Tuple[requests.Response, Optional[List], float]]:
+        """(response, stream lines with offsets or None, recorded seconds), or None to record (auto mode)."""
+        key, loose, _ = http_fingerprint(method, url, kwargs)
+        row = self._take(key, loose)
+        if row is None:
+            if self.mode == "replay":
+                raise CassetteMiss(f"no recorded response for {method} {url}")
+            return None
+        status, headers, body, chunks, elapsed = row
+        resp = self._response(method, url, status, json.loads(headers), zlib.decompress(body))
+        return resp, (_unpack(chunks) if chunks else None), elapsed
+
+    def record_http(self, method: str, url: str, kwargs: dict, resp: requests.Response, elapsed: float,
+                    chunks: Optional[List] = None):
+        key, loose, request = http_fingerprint(method, url, kwargs)
+        headers = {k: v for k, v in resp.headers.items() if k.lower() in ("content-type", "retry-after")}
+        # A streamed body was consumed through `chunks`; resp.content would be empty or already read
+        body = b"" if chunks is not None else _redact_response_body(resp.content or b"")
+        self._store("http", key, loose, request, resp.status_code, headers, body, chunks, elapsed)
+
+    # --- Introspection ---
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._db.execute("SELECT COUNT(*) FROM interactions").fetchone()[0]
+            return {
+                "path": self.path,
+                "mode": self.mode,
+                "latency_scale": self.latency_scale,
+                "interactions": total,
+                "hits": self._hits,
+                "loose_hits": self._loose_hits,
+                "misses": self._misses,
+                "recorded": self._recorded,
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class CassetteTransport:
+    """
+    HttpTransport wrapper: records what the inner transport returns, or replays it
+    without touching the network. Also serves AsyncSalesforceAgentAPI (arequest).
+    """
+
+    def __init__(self, inner, cassette: Cassette):
+        self.inner = inner
+        self.cassette = cassette
+        self._closed = False
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        if self.cassette.mode != "record":
+            hit = self.cassette.replay_http(method, url, kwargs)
+            if hit is not None:
+                resp, _, elapsed = hit
+                self.cassette._sleep(elapsed)
+                return resp
+        start = time.perf_counter()
+        resp = self.inner.request(method, url, **kwargs)
+        self.cassette.record_http(method, url, kwargs, resp, time.perf_counter() - start)
+        return resp
+
+    async def arequest(self, method: str, url: str, **kwargs) -> requests.Response:
+        if self.cassette.mode != "record":
+            hit = self.cassette.replay_http(method, url, kwargs)
+            if hit is not None:
+                resp, _, elapsed = hit
+                if self.cassette.latency_scale and elapsed > 0:
+                    await asyncio.sleep(elapsed * self.cassette.latency_scale)
+                return resp
+        # Recording async traffic goes through the sync transport on a worker thread
+        return await asyncio.get_running_loop().run_in_executor(None, lambda: self.request(method, url, **kwargs))
+
+    @contextmanager
+    def stream(self, method: str, url: str, **kwargs) -> Iterator[Tuple[requests.Response, Iterator]]:
+        if self.cassette.mode != "record":
+            hit = self.cassette.replay_http(method, url, kwargs)
+            if hit is not None:
+                resp, chunks, _ = hit
+                yield resp, self._replay_lines(chunks or [])
+                return
+        start = time.perf_counter()
+        chunks: List = []
+
+        def _tee(lines):
+            for line in lines:
+                text = line.decode("utf-8") if isinstance(line, bytes) else line
+                chunks.append([time.perf_counter() - start, text])
+                yield line
+
+        with self.inner.stream(method, url, **kwargs) as (resp, lines):
+            try:
+                yield resp, _tee(lines)
+            finally:
+                self.cassette.record_http(method, url, kwargs, resp, time.perf_counter() - start, chunks)
+
+    def _replay_lines(self, chunks: List) -> Iterator[bytes]:
+        last = 0.0
+        for offset, text in chunks:
+            self.cassette._sleep(offset - last)
+            last = offset
+            yield text.encode("utf-8")
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.inner.close()
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """Process-wide cassette from SF_CASSETTE (path), SF_CASSETTE_MODE and SF_CASSETTE_LATENCY; None if unset."""
+    global _cassette
+    path = os.getenv("SF_CASSETTE")
+    if not path:
+        return None
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(
+                path,
+                mode=os.getenv("SF_CASSETTE_MODE", "replay"),
+                latency_scale=float(os.getenv("SF_CASSETTE_LATENCY", "0")),
+            )
+        return _cassette
+
+
+def maybe_wrap_transport(transport):
+    cassette = get_cassette()
+    return CassetteTransport(transport, cassette) if cassette is not None else transport
+
+
+def maybe_wrap_llm(llm):
+    """Wrap a CrewAI LLM so its calls are recorded/replayed when SF_CASSETTE is set."""
+    cassette = get_cassette()
+    if cassette is None:
+        return llm
+    from crew_cassette_llm import CassetteLLM
+    return CassetteLLM(llm, cassette)
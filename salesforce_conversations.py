@@ -0,0 +1,226 @@
+# salesforce_conversations.py
+import asyncio
+import atexit
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import Hashable, List, Optional
+
+from salesforce_agent_API import SalesforceAgentAPI
+
+DEFAULT_MAX_SESSIONS = 32
+DEFAULT_IDLE_TIMEOUT = 600.0
+
+_current_key: contextvars.ContextVar = contextvars.ContextVar("sf_conversation", default=None)
+
+
+@contextmanager
+def conversation(key: Hashable):
+    """Route every Salesforce LLM call made inside the block (this thread / task) to conversation `key`."""
+    token = _current_key.set(key)
+    try:
+        yield key
+    finally:
+        _current_key.reset(token)
+
+
+def current_conversation() -> Optional[Hashable]:
+    """Key of the enclosing conversation() block, or None."""
+    return _current_key.get()
+
+
+def resolve_conversation_key(explicit: Optional[Hashable] = None) -> Hashable:
+    """Explicit id, else the enclosing conversation() block, else the current asyncio task or thread."""
+    if explicit is not None:
+        return explicit
+    key = _current_key.get()
+    if key is not None:
+        return key
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:  # no running loop
+        task = None
+    if task is not None:
+        return ("task", id(task))
+    return ("thread", threading.get_ident())
+
+
+class Conversation:
+    """One conversation's Agent session, sequence counter and already-sent message fingerprints."""
+
+    __slots__ = ("key", "token", "session_id", "sequence_id", "seen", "lock", "alock", "last_used", "_users")
+
+    def __init__(self, key: Hashable):
+        self.key = key
+        self.token: Optional[str] = None
+        self.session_id: Optional[str] = None
+        self.sequence_id = 1
+        self.seen: List[int] = []
+        self.lock = threading.Lock()
+        self.alock: Optional[asyncio.Lock] = None
+        self.last_used = time.monotonic()
+        self._users = 0  # callers holding or waiting for the lock; never evicted while > 0
+
+    def reset(self, session_id: Optional[str] = None):
+        self.session_id = session_id
+        self.sequence_id = 1
+        self.seen = []
+
+
+class ConversationManager:
+    """
+    Maps conversation keys to their own Agent session. At most `max_sessions`
+    idle conversations are kept (LRU); evicted or idle-expired ones have their
+    session ended on a background thread. Conversations in use are never
+    evicted, so the bound can be exceeded briefly under heavy fan-out.
+    """
+
+    def __init__(self, api: SalesforceAgentAPI, max_sessions: int = DEFAULT_MAX_SESSIONS,
+                 idle_timeout: Optional[float] = DEFAULT_IDLE_TIMEOUT):
+        self.api = api
+        self.max_sessions = max(1, int(max_sessions))
+        self.idle_timeout = idle_timeout
+        self._convs: "OrderedDict[Hashable, Conversation]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bg = ThreadPoolExecutor(max_workers=2, thread_name_prefix="sf-conversations")
+        self._closed = False
+
+        # stats
+        self._created = 0
+        self._evicted = 0
+        self._expired = 0
+
+        atexit.register(self.close)
+
+    # --- Lifecycle helpers ---
+    def _end_session(self, conv: Conversation, reason: str = "UserRequest"):
+        if not conv.session_id:
+            return
+        try:
+            self.api.end_session(self.api.get_access_token(), conv.session_id, reason)
+        except Exception:
+            pass  # best-effort
+        finally:
+            conv.reset()
+
+    def _retire(self, victims: List[Conversation]):
+        for conv in victims:
+            try:
+                # Copy the caller's context so the end-session call keeps its scheduler priority
+                self._bg.submit(contextvars.copy_context().run, self._end_session, conv)
+            except RuntimeError:  # executor already shut down
+                self._end_session(conv)
+
+    def _checkout(self, key: Optional[Hashable]) -> Conversation:
+        key = resolve_conversation_key(key)
+        victims: List[Conversation] = []
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("ConversationManager is closed")
+            conv = self._convs.get(key)
+            if conv is None:
+                conv = self._convs[key] = Conversation(key)
+                self._created += 1
+            self._convs.move_to_end(key)
+            conv._users += 1
+            victims = self._collect_victims()
+        self._retire(victims)
+        return conv
+
+    def _collect_victims(self) -> List[Conversation]:
+        """Drop idle-expired and over-capacity conversations, oldest first (caller holds _lock)."""
+        victims: List[Conversation] = []
+        now = time.monotonic()
+        for key in list(self._convs):
+            conv = self._convs[key]
+            if conv._users:
+                continue
+            if self.idle_timeout and now - conv.last_used >= self.idle_timeout:
+                self._expired += 1
+            elif len(self._convs) > self.max_sessions:
+                self._evicted += 1
+            else:
+                break  # LRU order: everything after this is newer
+            del self._convs[key]
+            victims.append(conv)
+        return victims
+
+    def _checkin(self, conv: Conversation):
+        with self._lock:
+            conv._users -= 1
+            conv.last_used = time.monotonic()
+            victims = self._collect_victims()
+        self._retire(victims)
+
+    # --- Public API ---
+    @contextmanager
+    def use(self, key: Optional[Hashable] = None):
+        """Hold conversation `key` (see resolve_conversation_key) exclusively for one call."""
+        conv = self._checkout(key)
+        try:
+            with conv.lock:
+                yield conv
+        finally:
+            self._checkin(conv)
+
+    @asynccontextmanager
+    async def ause(self, key: Optional[Hashable] = None):
+        """Async twin of use(); serializes coroutines on one conversation with an asyncio.Lock."""
+        conv = self._checkout(key)
+        try:
+            with self._lock:
+                if conv.alock is None:
+                    conv.alock = asyncio.Lock()
+            async with conv.alock:
+                yield conv
+        finally:
+            self._checkin(conv)
+
+    def end(self, key: Hashable, reason: str = "UserRequest") -> bool:
+        """End one conversation's session now. Returns False if it is unknown or in use."""
+        with self._lock:
+            conv = self._convs.get(key)
+            if conv is None or conv._users:
+                return False
+            del self._convs[key]
+        self._end_session(conv, reason)
+        return True
+
+    def drain(self) -> List[Conversation]:
+        """Remove and return every idle conversation (the caller ends their sessions)."""
+        with self._lock:
+            idle = [c for c in self._convs.values() if not c._users]
+            for c in idle:
+                del self._convs[c.key]
+        return idle
+
+    def end_all(self, reason: str = "UserRequest"):
+        for conv in self.drain():
+            self._end_session(conv, reason)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_sessions": self.max_sessions,
+                "conversations": len(self._convs),
+                "open_sessions": sum(1 for c in self._convs.values() if c.session_id),
+                "in_use": sum(1 for c in self._convs.values() if c._users),
+                "created": self._created,
+                "evicted": self._evicted,
+                "expired": self._expired,
+            }
+
+    def __len__(self) -> int:
+        return len(self._convs)
+
+    def close(self, reason: str = "UserRequest"):
+        """End every idle session and stop background teardown (in-use ones are left to their callers)."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._bg.shutdown(wait=True)
+        self.end_all(reason)
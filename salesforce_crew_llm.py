@@ -1,8 +1,12 @@
 # salesforce_crew_llm.py
-from typing import Optional, List, Dict, Any
+from typing import Callable, Optional, List, Dict, Any
 from crewai import BaseLLM      # <-- use BaseLLM as per docs
 from salesforce_agent_API import SalesforceAgentAPI
 from salesforce_llm_adapter import SalesforceAgentLLM
+from salesforce_answer_cache import AnswerCache
+from salesforce_conversations import DEFAULT_MAX_SESSIONS
+from salesforce_faq_index import FaqIndex
+import tracing
 
 
 from salesforce_agent_API import SalesforceAgentAPI  # your env-only API client from earlier
@@ -12,16 +16,68 @@ class SalesforceCrewLLM(BaseLLM):
     """
     CrewAI-compatible LLM that routes calls directly to Salesforce Einstein Agent
     via SalesforceAgentLLM. This bypasses LiteLLM completely.
+
+    Safe to share between concurrent crews: each conversation (pass
+    conversation_id=..., wrap kickoff in salesforce_conversations.conversation(key),
+    or rely on the per-thread default) keeps its own Agent session.
     """
-    def __init__(self, api: Optional[SalesforceAgentAPI] = None):
+    def __init__(
+        self,
+        api: Optional[SalesforceAgentAPI] = None,
+        stream: bool = False,
+        stream_callback: Optional[Callable[[str], None]] = None,
+        cache: Optional[AnswerCache] = None,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        faq: Optional[FaqIndex] = None,
+    ):
         # pass benign values to parent; they won't be used because we override call()
         super().__init__(model="salesforce-einstein", temperature=None) 
-        self._sf = SalesforceAgentLLM(api=api or SalesforceAgentAPI())
+        self.stream = stream
+        self.stream_callback = stream_callback
+        self._sf = SalesforceAgentLLM(
+            api=api or SalesforceAgentAPI(), cache=cache, max_sessions=max_sessions, faq=faq
+        )
+
+    def _on_chunk(self, chunk: str):
+        if self.stream_callback:
+            self.stream_callback(chunk)
+        # Surface chunks on CrewAI's event bus too, like its own streaming LLM does
+        try:
+            from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+        except ImportError:
+            try:
+                from crewai.utilities.events import crewai_event_bus, LLMStreamChunkEvent
+            except ImportError:
+                return
+        try:
+            crewai_event_bus.emit(self, event=LLMStreamChunkEvent(chunk=chunk))
+        except Exception:
+            pass
 
     # CrewAI will call this; DO NOT call super().call()
     def call(self, prompt: Optional[str] = None, messages: Optional[List[Dict[str, str]]] = None, **kwargs: Any) -> str:
-        # You can optionally trim messages here if needed
-        return self._sf.call(prompt=prompt, messages=messages, **kwargs)
+        # CrewAI passes the chat history positionally; treat it as messages so only the delta is sent
+        if isinstance(prompt, list) and messages is None:
+            prompt, messages = None, prompt
+        with tracing.span("salesforce-einstein", "llm", stream=self.stream):
+            if self.stream:
+                return self._sf.call_stream(prompt=prompt, messages=messages, stream_callback=self._on_chunk, **kwargs)
+            return self._sf.call(prompt=prompt, messages=messages, **kwargs)
+
+    async def acall(self, prompt: Optional[str] = None, messages: Optional[List[Dict[str, str]]] = None, **kwargs: Any) -> str:
+        if isinstance(prompt, list) and messages is None:
+            prompt, messages = None, prompt
+        with tracing.span("salesforce-einstein", "llm"):
+            return await self._sf.acall(prompt=prompt, messages=messages, **kwargs)
+
+    def end_conversation(self, conversation_id: Any, reason: str = "UserRequest") -> bool:
+        return self._sf.end_conversation(conversation_id, reason)
+
+    def session_stats(self) -> dict:
+        return self._sf.session_stats()
+
+    def faq_stats(self) -> dict:
+        return self._sf.faq_stats()
 
     # optional: expose a clean close for session hygiene
     def close(self, reason: str = "UserRequest"):
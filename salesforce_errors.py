@@ -0,0 +1,89 @@
+# salesforce_errors.py
+import email.utils
+import time
+from typing import Optional
+
+import requests
+
+
+class SalesforceAPIError(requests.HTTPError):
+    """
+    Base error for Agent API failures. Subclasses requests.HTTPError so existing
+    `except requests.HTTPError` handlers keep working.
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None,
+                 endpoint: Optional[str] = None, response: Optional[requests.Response] = None):
+        super().__init__(message, response=response)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.endpoint = endpoint
+
+    @property
+    def retryable(self) -> bool:
+        return False
+
+
+class AuthError(SalesforceAPIError):
+    """401: token expired or revoked; refresh the token and reopen the session."""
+
+
+class ClientError(SalesforceAPIError):
+    """Other 4xx: the request itself is wrong; retrying will not help."""
+
+
+class RateLimitError(SalesforceAPIError):
+    """429: over the org's quota; wait `retry_after` seconds."""
+
+    @property
+    def retryable(self) -> bool:
+        return True
+
+
+class ServerError(SalesforceAPIError):
+    """5xx: Salesforce-side failure."""
+
+    @property
+    def retryable(self) -> bool:
+        return True
+
+
+class CircuitOpenError(SalesforceAPIError):
+    """Raised without calling Salesforce while the circuit breaker is open."""
+
+
+class AdmissionRejected(SalesforceAPIError):
+    """Shed by the admission scheduler: the priority class's queue is full or its wait ran out."""
+
+    @property
+    def retryable(self) -> bool:
+        return True
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After is either delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def error_for_response(resp: requests.Response, message: str, endpoint: Optional[str] = None) -> SalesforceAPIError:
+    status = resp.status_code
+    retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+    if status == 401:
+        cls = AuthError
+    elif status == 429:
+        cls = RateLimitError
+    elif status >= 500:
+        cls = ServerError
+    else:
+        cls = ClientError
+    return cls(message, status_code=status, retry_after=retry_after, endpoint=endpoint, response=resp)
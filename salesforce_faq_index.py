@@ -0,0 +1,369 @@
+# salesforce_faq_index.py
+"""
+Precomputed BM25 index of harvested Coral Cloud FAQ answers, consulted before
+calling Einstein. Confident matches are answered in-process; everything else
+falls through to Salesforce.
+
+    python crew_salesforce_cli.py faq-index runs/peak.db faq.jsonl --out runs/faq.idx
+    SF_FAQ_INDEX=runs/faq.idx python crew_salesforce_cli.py ask "What time is check-in?"
+
+Sources are cassette files (first-turn questions and their recorded Agent
+answers; see salesforce_cassette.py) or JSONL files of {"question", "answer"}.
+The index is one binary file, memory-mapped read-only on load, so it is shared
+between processes through the page cache and nothing is parsed per query:
+
+    header | term table (hash, postings start, df) sorted by hash | postings (doc, tf)
+           | doc table (length, self score, question/answer offsets, count) | utf-8 text
+"""
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import sqlite3
+import struct
+import threading
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from salesforce_answer_cache import normalize_prompt
+
+log = logging.getLogger("salesforce_faq_index")
+
+MAGIC = b"SFFAQIX1"
+DEFAULT_THRESHOLD = 0.7
+DEFAULT_K1 = 1.2
+DEFAULT_B = 0.75
+# Longer "questions" are crew prompts or whole transcripts, not FAQ questions
+MAX_QUESTION_CHARS = 500
+
+_HEADER = struct.Struct("<8sIIIfffQQQQ")   # magic, docs, terms, postings, avgdl, k1, b, 4 section offsets
+_TERM = struct.Struct("<QII")              # term hash, first posting, df
+_POSTING = struct.Struct("<II")            # doc id, term frequency
+_DOC = struct.Struct("<ffIIIII")           # length, self score, q offset, q len, a offset, a len, times seen
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can could do does for from have how i i'm in is it me my of on or our "
+    "please should so that the there this to us we what when where which will with would you your".split()
+)
+_USER_TURN = re.compile(r"(?:^|\n\n)USER: ")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words minus stopwords, with plurals folded ("suites" -> "suite")."""
+    out = []
+    for w in _WORD.findall((text or "").lower()):
+        if w in _STOPWORDS:
+            continue
+        if len(w) > 4 and w.endswith("ies"):
+            w = w[:-3] + "y"
+        elif len(w) > 3 and w.endswith("s") and not w.endswith("ss"):
+            w = w[:-1]
+        out.append(w)
+    return out
+
+
+def _term_hash(term: str) -> int:
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _idf(n_docs: int, df: int) -> float:
+    return math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+
+
+class FaqMatch:
+    __slots__ = ("question", "answer", "confidence", "score", "doc_id", "seen")
+
+    def __init__(self, question: str, answer: str, confidence: float, score: float, doc_id: int, seen: int):
+        self.question = question
+        self.answer = answer
+        self.confidence = confidence
+        self.score = score
+        self.doc_id = doc_id
+        self.seen = seen
+
+    def as_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+# --- Build ---
+def build_index(pairs: Iterable[Tuple[str, str]], path: str, min_count: int = 1,
+                k1: float = DEFAULT_K1, b: float = DEFAULT_B) -> int:
+    """
+    Write an index of (question, answer) pairs to `path`; returns the number of
+    entries. Questions that normalize alike are merged and keep their most
+    frequent answer; entries seen fewer than `min_count` times are dropped. The
+    file is replaced atomically, so processes that already mapped it keep theirs.
+    """
+    answers: Dict[str, Counter] = {}
+    shown: Dict[str, str] = {}
+    for question, answer in pairs:
+        question, answer = (question or "").strip(), (answer or "").strip()
+        key = normalize_prompt(question)
+        if not key or not answer or not tokenize(question):
+            continue
+        answers.setdefault(key, Counter())[answer] += 1
+        shown.setdefault(key, question)
+    docs = []
+    for key, counts in answers.items():
+        total = sum(counts.values())
+        if total >= min_count:
+            docs.append((shown[key], counts.most_common(1)[0][0], total))
+
+    tfs = [Counter(tokenize(q)) for q, _, _ in docs]
+    lengths = [sum(tf.values()) for tf in tfs]
+    n = len(docs)
+    avgdl = sum(lengths) / n if n else 0.0
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    for doc_id, tf in enumerate(tfs):
+        for term, count in tf.items():
+            postings.setdefault(term, []).append((doc_id, count))
+    df = {t: len(p) for t, p in postings.items()}
+
+    def _self_score(doc_id: int) -> float:
+        norm = k1 * (1 - b + b * lengths[doc_id] / avgdl) if avgdl else k1
+        return sum(_idf(n, df[t]) * c * (k1 + 1) / (c + norm) for t, c in tfs[doc_id].items())
+
+    terms = sorted(postings, key=_term_hash)
+    term_blob, posting_blob = bytearray(), bytearray()
+    start = 0
+    for t in terms:
+        term_blob += _TERM.pack(_term_hash(t), start, df[t])
+        for doc_id, count in postings[t]:
+            posting_blob += _POSTING.pack(doc_id, count)
+        start += df[t]
+
+    doc_blob, text_blob = bytearray(), bytearray()
+    for doc_id, (question, answer, seen) in enumerate(docs):
+        q, a = question.encode("utf-8"), answer.encode("utf-8")
+        doc_blob += _DOC.pack(lengths[doc_id], _self_score(doc_id), len(text_blob), len(q),
+                              len(text_blob) + len(q), len(a), seen)
+        text_blob += q + a
+
+    terms_off = _HEADER.size
+    postings_off = terms_off + len(term_blob)
+    docs_off = postings_off + len(posting_blob)
+    text_off = docs_off + len(doc_blob)
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, n, len(terms), start, avgdl, k1, b, terms_off, postings_off, docs_off, text_off))
+        f.write(term_blob)
+        f.write(posting_blob)
+        f.write(doc_blob)
+        f.write(text_blob)
+    os.replace(tmp, path)
+    return n
+
+
+# --- Harvest ---
+def _question_of(text: str) -> str:
+    """The guest question in a rendered request: the last USER turn, or the whole text."""
+    parts = _USER_TURN.split(text or "")
+    return parts[-1].strip() if len(parts) > 1 else (text or "").strip()
+
+
+def _answer_of(body: bytes, chunks: Optional[List]) -> str:
+    from salesforce_agent_API import iter_sse_events
+    from salesforce_llm_adapter import _clean_text, _extract_sf_text
+
+    if chunks:
+        pieces, inform = [], ""
+        for event in iter_sse_events(text for _, text in chunks):
+            msg = event.get("message") or {}
+            if msg.get("type") == "TextChunk" and msg.get("message"):
+                pieces.append(msg["message"])
+            elif msg.get("type") == "Inform" and msg.get("message"):
+                inform = msg["message"]
+        return _clean_text("".join(pieces) or inform)
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return ""
+    return _clean_text(_extract_sf_text(payload)) if isinstance(payload, dict) else ""
+
+
+def harvest_cassette(path: str, first_turn_only: bool = True) -> Iterator[Tuple[str, str]]:
+    """
+    (question, answer) pairs from the successful Agent message calls recorded in a
+    cassette. Only a session's first message is used by default, since follow-ups
+    depend on earlier turns.
+    """
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = db.execute("SELECT request, status, body, chunks FROM interactions WHERE kind = 'http' ORDER BY id")
+        for request, status, body, chunks in rows:
+            if status != 200:
+                continue
+            req = json.loads(zlib.decompress(request))
+            if not re.search(r"/messages(/stream)?$", req.get("path") or ""):
+                continue
+            message = (req.get("body") or {}).get("message") or {}
+            if first_turn_only and message.get("sequenceId", 1) != 1:
+                continue
+            question = _question_of(message.get("text") or "")
+            if not question or len(question) > MAX_QUESTION_CHARS:
+                continue
+            answer = _answer_of(zlib.decompress(body) if body else b"",
+                                json.loads(zlib.decompress(chunks)) if chunks else None)
+            if answer and not answer.startswith("[Salesforce Agent"):
+                yield question, answer
+    finally:
+        db.close()
+
+
+def harvest_jsonl(path: str) -> Iterator[Tuple[str, str]]:
+    """(question, answer) pairs from a JSONL file of {"question": ..., "answer": ...} objects."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            if row.get("question") and row.get("answer"):
+                yield row["question"], row["answer"]
+
+
+def rebuild(out: str, sources: Iterable[str], min_count: int = 1, first_turn_only: bool = True) -> dict:
+    """Rebuild the index at `out` from cassettes (*.db / *.sqlite) and JSONL files."""
+    pairs: List[Tuple[str, str]] = []
+    for src in sources:
+        if src.endswith((".jsonl", ".json")):
+            pairs.extend(harvest_jsonl(src))
+        else:
+            pairs.extend(harvest_cassette(src, first_turn_only=first_turn_only))
+    entries = build_index(pairs, out, min_count=min_count)
+    return {"path": out, "pairs": len(pairs), "entries": entries, "bytes": os.path.getsize(out)}
+
+
+# --- Lookup ---
+class FaqIndex:
+    """
+    Read-only view of an index file. lookup() returns the best match when its
+    confidence reaches `threshold` (SF_FAQ_THRESHOLD, default 0.7) and counts
+    local answers vs. fall-throughs.
+
+    Confidence is the geometric mean of two coverages. One is the share of the
+    query's IDF weight found in the matched question. The other is the BM25 score
+    over the question's score against itself. A long crew prompt that happens to
+    mention a FAQ topic therefore stays below the bar.
+    """
+
+    def __init__(self, path: str, threshold: Optional[float] = None):
+        if threshold is None:
+            threshold = float(os.getenv("SF_FAQ_THRESHOLD", DEFAULT_THRESHOLD))
+        self.path = path
+        self.threshold = threshold
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.docs, self._terms, _, self._avgdl, self._k1, self._b,
+         self._terms_off, self._postings_off, self._docs_off, self._text_off) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not a FAQ index")
+        self._lock = threading.Lock()
+        self._lookups = 0
+        self._local = 0
+        self._fall_through = 0
+
+    def _term(self, term: str) -> Optional[Tuple[int, int]]:
+        """(first posting, df) by binary search over the mapped term table."""
+        h = _term_hash(term)
+        lo, hi = 0, self._terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mh, start, df = _TERM.unpack_from(self._mm, self._terms_off + mid * _TERM.size)
+            if mh == h:
+                return start, df
+            if mh < h:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def _doc(self, doc_id: int) -> tuple:
+        return _DOC.unpack_from(self._mm, self._docs_off + doc_id * _DOC.size)
+
+    def _text(self, offset: int, length: int) -> str:
+        start = self._text_off + offset
+        return self._mm[start:start + length].decode("utf-8")
+
+    def search(self, question: str, k: int = 3) -> List[FaqMatch]:
+        """Top `k` entries by confidence (no counters touched)."""
+        terms = set(tokenize(question))
+        if not terms or not self.docs:
+            return []
+        scores: Dict[int, float] = {}
+        matched: Dict[int, float] = {}
+        query_weight = 0.0
+        k1, b, avgdl = self._k1, self._b, self._avgdl
+        for term in terms:
+            hit = self._term(term)
+            idf = _idf(self.docs, hit[1] if hit else 0)
+            query_weight += idf
+            if hit is None:
+                continue
+            start, df = hit
+            base = self._postings_off + start * _POSTING.size
+            for i in range(df):
+                doc_id, tf = _POSTING.unpack_from(self._mm, base + i * _POSTING.size)
+                length = self._doc(doc_id)[0]
+                norm = k1 * (1 - b + b * length / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+                matched[doc_id] = matched.get(doc_id, 0.0) + idf
+        ranked = []
+        for doc_id, score in scores.items():
+            _, self_score, q_off, q_len, a_off, a_len, seen = self._doc(doc_id)
+            doc_cover = min(1.0, score / self_score) if self_score > 0 else 0.0
+            confidence = math.sqrt(doc_cover * matched[doc_id] / query_weight)
+            ranked.append((confidence, score, doc_id, q_off, q_len, a_off, a_len, seen))
+        ranked.sort(reverse=True)
+        return [FaqMatch(self._text(q_off, q_len), self._text(a_off, a_len), confidence, score, doc_id, seen)
+                for confidence, score, doc_id, q_off, q_len, a_off, a_len, seen in ranked[:k]]
+
+    def lookup(self, question: str) -> Optional[FaqMatch]:
+        """Best match if it is confident enough to answer locally, else None (a fall-through)."""
+        best = self.search(question, k=1) if question and len(question) <= MAX_QUESTION_CHARS else []
+        hit = best[0] if best and best[0].confidence >= self.threshold else None
+        with self._lock:
+            self._lookups += 1
+            if hit is not None:
+                self._local += 1
+            else:
+                self._fall_through += 1
+        return hit
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups, local, fall = self._lookups, self._local, self._fall_through
+        return {
+            "path": self.path,
+            "entries": self.docs,
+            "threshold": self.threshold,
+            "lookups": lookups,
+            "local": local,
+            "fall_through": fall,
+            "local_rate": local / lookups if lookups else 0.0,
+            "fall_through_rate": fall / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        self._mm.close()
+
+
+def faq_index_from_env() -> Optional[FaqIndex]:
+    """FaqIndex at SF_FAQ_INDEX, or None when unset or unreadable (every question then goes to Salesforce)."""
+    path = os.getenv("SF_FAQ_INDEX")
+    if not path:
+        return None
+    try:
+        return FaqIndex(path)
+    except (OSError, ValueError) as e:
+        log.warning("FAQ index %s not loaded: %s", path, e)
+        return None
@@ -0,0 +1,147 @@
+# salesforce_http.py
+import importlib.util
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_POOL_CONNECTIONS = 4   # distinct hosts kept in the pool (org domain + api host + spare)
+DEFAULT_POOL_MAXSIZE = 16      # keep-alive connections per host
+
+
+def _http2_available() -> bool:
+    # find_spec avoids paying the httpx import just to learn h2 is missing
+    return all(importlib.util.find_spec(m) is not None for m in ("httpx", "h2"))
+
+
+def _to_requests_response(r, read: bool = True) -> requests.Response:
+    """Adapt an httpx.Response so callers only ever see requests.Response."""
+    resp = requests.Response()
+    resp.status_code = r.status_code
+    resp._content = r.content if read else b""
+    resp.headers = requests.structures.CaseInsensitiveDict(r.headers)
+    resp.url = str(r.url)
+    resp.reason = r.reason_phrase
+    resp.encoding = r.encoding
+    resp.request = requests.Request(r.request.method, str(r.request.url)).prepare()
+    return resp
+
+
+class HttpTransport:
+    """
+    Connection-pooled, keep-alive HTTP transport shared by SalesforceAgentAPI clients.
+    Uses a requests.Session by default; with http2=True (and httpx[http2] installed)
+    it uses an HTTP/2 httpx.Client instead. Safe to share across threads.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        http2: Optional[bool] = None,
+    ):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        # None means "use HTTP/2 when available"
+        self.http2 = _http2_available() if http2 is None else (http2 and _http2_available())
+        self._closed = False
+
+        if self.http2:
+            import httpx
+            self._client = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=pool_connections * pool_maxsize,
+                    max_keepalive_connections=pool_connections * pool_maxsize,
+                ),
+            )
+        else:
+            self._client = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+            self._client.mount("https://", adapter)
+            self._client.mount("http://", adapter)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        if self._closed:
+            raise RuntimeError("HttpTransport is closed")
+        if self.http2:
+            import httpx
+            try:
+                return _to_requests_response(self._client.request(method, url, **kwargs))
+            # Surface the same exception types as the requests backend
+            except httpx.TimeoutException as e:
+                raise requests.Timeout(str(e)) from e
+            except httpx.TransportError as e:
+                raise requests.ConnectionError(str(e)) from e
+        return self._client.request(method, url, **kwargs)
+
+    @contextmanager
+    def stream(self, method: str, url: str, **kwargs) -> Iterator[Tuple[requests.Response, Iterator]]:
+        """
+        Open a streamed response and yield (response, line iterator of str or bytes).
+        Error responses are read fully so the caller can report their body.
+        """
+        if self._closed:
+            raise RuntimeError("HttpTransport is closed")
+        if self.http2:
+            with self._client.stream(method, url, **kwargs) as r:
+                if r.status_code >= 400:
+                    r.read()
+                    yield _to_requests_response(r), iter(())
+                else:
+                    yield _to_requests_response(r, read=False), r.iter_lines()
+            return
+        r = self._client.request(method, url, stream=True, **kwargs)
+        try:
+            if r.status_code >= 400:
+                yield r, iter(())
+            else:
+                # raw bytes: requests would guess ISO-8859-1 for text/event-stream.
+                # chunk_size=None hands over data as it arrives instead of filling 512-byte reads
+                yield r, r.iter_lines(chunk_size=None)
+        finally:
+            r.close()
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_default_transport: Optional[HttpTransport] = None
+_default_lock = threading.Lock()
+
+
+def get_default_transport() -> HttpTransport:
+    """
+    Process-wide transport (configured from SF_HTTP_POOL_SIZE / SF_HTTP2). With
+    SF_CASSETTE set it is wrapped for record/replay (see salesforce_cassette).
+    """
+    global _default_transport
+    with _default_lock:
+        if _default_transport is None or _default_transport._closed:
+            http2_env = os.getenv("SF_HTTP2")
+            transport = HttpTransport(
+                pool_maxsize=int(os.getenv("SF_HTTP_POOL_SIZE", DEFAULT_POOL_MAXSIZE)),
+                http2=None if http2_env is None else http2_env.lower() in ("1", "true", "yes"),
+            )
+            if os.getenv("SF_CASSETTE"):
+                from salesforce_cassette import maybe_wrap_transport
+                transport = maybe_wrap_transport(transport)
+            _default_transport = transport
+        return _default_transport
@@ -1,9 +1,12 @@
 # salesforce_llm_adapter.py
 import json, re
-import requests
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from salesforce_agent_API import SalesforceAgentAPI
+from salesforce_answer_cache import AnswerCache, looks_like_raw_payload
+from salesforce_conversations import DEFAULT_MAX_SESSIONS, Conversation, ConversationManager
+from salesforce_errors import AuthError
+from salesforce_faq_index import FaqIndex
 
 def _safe_str(x: Any) -> str:
     try:
@@ -50,6 +53,50 @@ def _clean_text(s: str) -> str:
     s = re.sub(r"\n{3,}", "\n\n", s)
     return s.strip()
 
+class _StreamCleaner:
+    """
+    Incremental _clean_text: feed() raw chunks, get back text that is safe to show.
+    Concatenating every feed() result plus flush() equals _clean_text(whole reply).
+    """
+
+    _ESCAPES = (("\\n", "\n"), ("\\t", "\t"), ("\\r", "\r"))
+
+    def __init__(self):
+        self._carry = ""        # trailing backslash that may start an escape
+        self._pending_ws = ""   # trailing whitespace, only emitted once more text follows
+        self._started = False   # leading whitespace is dropped (strip)
+
+    def feed(self, chunk: str) -> str:
+        s = self._carry + (chunk or "")
+        self._carry = ""
+        if s.endswith("\\"):
+            s, self._carry = s[:-1], "\\"
+        for raw, real in self._ESCAPES:
+            s = s.replace(raw, real)
+
+        body = s.rstrip()
+        tail = s[len(body):]
+        if not body:
+            if self._started:
+                self._pending_ws += tail
+            return ""
+        if not self._started:
+            body = body.lstrip()
+            self._started = True
+        out = re.sub(r"\n{3,}", "\n\n", self._pending_ws + body)
+        self._pending_ws = tail
+        return out
+
+    def flush(self) -> str:
+        # A dangling backslash is literal text; trailing whitespace is stripped
+        out = ""
+        if self._carry:
+            carry, self._carry = self._carry, ""
+            out = self.feed(carry + " ")
+        self._pending_ws = ""
+        return out
+
+
 def _extract_sf_text(reply: Dict[str, Any]) -> str:
     """
     Try multiple known Salesforce Agent response shapes; return a non-empty string.
@@ -61,10 +108,12 @@ def _extract_sf_text(reply: Dict[str, Any]) -> str:
         if isinstance(t, str) and t.strip():
             return t.strip()
 
-    # 2) messages[-1].content[*].text or .content string
+    # 2) messages[-1].message (Agent API "Inform"), .content[*].text or .content string
     msgs = reply.get("messages")
     if isinstance(msgs, list) and msgs:
         last = msgs[-1]
+        if isinstance(last.get("message"), str) and last["message"].strip():
+            return last["message"].strip()
         content = last.get("content")
         if isinstance(content, list):
             text = _coerce_text(content)
@@ -90,24 +139,77 @@ def _extract_sf_text(reply: Dict[str, Any]) -> str:
     # 5) Fallback to pretty JSON (never return None)
     return _safe_str(reply)
 
+StreamCallback = Callable[[str], None]
+
+
+MAX_MESSAGE_CHARS = 12000
+# Returned when the Agent's reply has no text; never cached (the next call may well get an answer)
+NO_CONTENT = "[Salesforce Agent returned no content]"
+
+
+def _cacheable(answer: str) -> bool:
+    """Placeholders and raw-payload fallbacks are returned to the caller but never cached."""
+    return answer != NO_CONTENT and not looks_like_raw_payload(answer)
+
+
+def _clamp(text: str) -> str:
+    # Defensive clamp to avoid accidental huge payloads
+    if len(text) > MAX_MESSAGE_CHARS:
+        text = text[:MAX_MESSAGE_CHARS - 200] + "\n\n[truncated]"
+    return text
+
+
+def _fingerprint(role: str, text: str) -> int:
+    return hash((role, text))
+
+
 class SalesforceAgentLLM:
-    def __init__(self, api: Optional[SalesforceAgentAPI] = None):
+    """
+    Chat-style facade over the Einstein Agent API. Each conversation (an explicit
+    `conversation_id`, a salesforce_conversations.conversation() block, or else the
+    calling thread / asyncio task) gets its own session and sequence counter, so one
+    instance can serve many parallel crews.
+    """
+
+    def __init__(
+        self,
+        api: Optional[SalesforceAgentAPI] = None,
+        stream: bool = False,
+        stream_callback: Optional[StreamCallback] = None,
+        cache: Optional[AnswerCache] = None,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        faq: Optional[FaqIndex] = None,
+    ):
         self.api = api or SalesforceAgentAPI()
-        self._token: Optional[str] = None
-        self._session_id: Optional[str] = None
-        self._sequence_id: int = 1
-
-    def _ensure_session(self):
-        if not self._token:
-            self._token = self.api.get_access_token()
-        if not self._session_id:
-            self._session_id = self.api.start_session(self._token)
-            self._sequence_id = 1
-
-    def _refresh_and_reopen(self):
-        self._token = self.api.get_access_token()
-        self._session_id = self.api.start_session(self._token)
-        self._sequence_id = 1
+        # Opt-in answer cache; hits skip the Einstein round-trip entirely
+        self.cache = cache
+        # Opt-in FAQ index; confident matches on the guest's question are answered locally
+        self.faq = faq
+        # When streaming, cleaned text is pushed to stream_callback as it arrives
+        self.stream = stream
+        self.stream_callback = stream_callback
+        self.sessions = ConversationManager(self.api, max_sessions=max_sessions)
+        self._async_api = None
+
+    def _aapi(self):
+        if self._async_api is None:
+            # httpx is only imported once the async path is actually used
+            from salesforce_agent_async import AsyncSalesforceAgentAPI
+            self._async_api = AsyncSalesforceAgentAPI(api=self.api)
+        return self._async_api
+
+    def _ensure_session(self, conv: Conversation):
+        # Served from the shared token cache, so this also picks up background refreshes
+        conv.token = self.api.get_access_token()
+        if not conv.session_id:
+            conv.reset(self.api.start_session(conv.token))
+
+    def _refresh_and_reopen(self, conv: Conversation):
+        # Only drops the token if nobody else has refreshed it already
+        self.api.invalidate_token(conv.token)
+        conv.token = self.api.get_access_token()
+        # New server-side history: the next send replays the full conversation
+        conv.reset(self.api.start_session(conv.token))
 
     @staticmethod
     def _render_messages(messages: List[Dict[str, Any]]) -> str:
@@ -120,27 +222,211 @@ class SalesforceAgentLLM:
                 lines.append(f"{role}: {text}")
         return "\n\n".join(lines).strip()
 
-    def call(self, prompt: Optional[str] = None, messages: Optional[List[Dict[str, Any]]] = None, **_: Any) -> str:
-        self._ensure_session()
+    def _prepare_text(self, prompt: Optional[str], messages: Optional[List[Dict[str, Any]]]) -> str:
+        """Full rendering of the request (used as the answer-cache key)."""
+        return _clamp(self._render_messages(messages) if messages else _coerce_text(prompt or ""))
 
-        text = self._render_messages(messages) if messages else _coerce_text(prompt or "")
-        # Defensive clamp to avoid accidental huge payloads
-        if len(text) > 12000:
-            text = text[:11800] + "\n\n[truncated]"
+    def _outgoing(self, conv: Conversation, prompt: Optional[str],
+                  messages: Optional[List[Dict[str, Any]]]) -> Tuple[str, Optional[List[int]]]:
+        """
+        Text to send on the conversation's session and the fingerprints to record once it succeeds.
+        Only messages after the longest prefix the session already holds are sent.
+        """
+        if not messages:
+            return _clamp(_coerce_text(prompt or "")), None
+        fps = [_fingerprint((m.get("role") or "user"), _coerce_text(m.get("content"))) for m in messages]
+        common = 0
+        for a, b in zip(fps, conv.seen):
+            if a != b:
+                break
+            common += 1
+        delta = messages[common:] or messages[-1:]  # identical re-ask: resend the last turn
+        return _clamp(self._render_messages(delta)), fps
 
-        try:
-            resp = self.api.send_message_sync(self._token, self._session_id, text, sequence_id=self._sequence_id)
-        except requests.HTTPError as e:
-            if "401" in str(e):
-                self._refresh_and_reopen()
-                resp = self.api.send_message_sync(self._token, self._session_id, text, sequence_id=self._sequence_id)
-            else:
-                raise
+    @staticmethod
+    def _commit(conv: Conversation, fps: Optional[List[int]], reply: str):
+        conv.sequence_id += 1
+        if fps is not None:
+            conv.seen = fps + [_fingerprint("assistant", reply)]
+
+    def _faq_answer(self, prompt: Optional[str], messages: Optional[List[Dict[str, Any]]]) -> Optional[str]:
+        """
+        Local answer for the latest user turn, if the FAQ index is confident. The
+        session never sees that turn, so the next call sends it along as context.
+        """
+        if self.faq is None:
+            return None
+        if messages:
+            last = messages[-1]
+            if (last.get("role") or "user") != "user":
+                return None
+            question = _coerce_text(last.get("content"))
+        else:
+            question = _coerce_text(prompt or "")
+        match = self.faq.lookup(question)
+        return match.answer if match is not None else None
 
-        self._sequence_id += 1
+    def _cache_key(self, text: str) -> str:
+        return AnswerCache.make_key(self.api.AGENT_ID, text)
 
+    @staticmethod
+    def _finish(resp: Dict[str, Any]) -> str:
         extracted = _extract_sf_text(resp).strip()
         if not extracted:
             # absolutely never hand back None/empty
-            extracted = "[Salesforce Agent returned no content]"
-        return _clean_text(extracted)
\ No newline at end of file
+            extracted = NO_CONTENT
+        return _clean_text(extracted)
+
+    def _stream_reply(self, conv: Conversation, text: str, callback: Optional[StreamCallback]) -> str:
+        cleaner = _StreamCleaner()
+        parts: List[str] = []
+        for chunk in self.api.send_message_stream(conv.token, conv.session_id, text, sequence_id=conv.sequence_id):
+            piece = cleaner.feed(chunk)
+            if piece:
+                parts.append(piece)
+                if callback:
+                    callback(piece)
+        tail = cleaner.flush()
+        if tail:
+            parts.append(tail)
+            if callback:
+                callback(tail)
+        return "".join(parts)
+
+    def call_stream(self, prompt: Optional[str] = None, messages: Optional[List[Dict[str, Any]]] = None,
+                    stream_callback: Optional[StreamCallback] = None, conversation_id: Any = None, **_: Any) -> str:
+        """Like call(), but uses the streaming endpoint and hands cleaned chunks to the callback."""
+        callback = stream_callback or self.stream_callback
+        local = self._faq_answer(prompt, messages)
+        if local is not None:
+            if callback:
+                callback(local)
+            return local
+        key = None
+        if self.cache is not None:
+            key = self._cache_key(self._prepare_text(prompt, messages))
+            cached = self.cache.get(key)
+            if cached is not None:
+                if callback:
+                    callback(cached)
+                return cached
+            self.cache.record_miss()
+
+        with self.sessions.use(conversation_id) as conv:
+            self._ensure_session(conv)
+            text, fps = self._outgoing(conv, prompt, messages)
+            try:
+                out = self._stream_reply(conv, text, callback)
+            except AuthError:
+                # Errors surface before the first chunk, so nothing has been emitted yet
+                self._refresh_and_reopen(conv)
+                text, fps = self._outgoing(conv, prompt, messages)
+                out = self._stream_reply(conv, text, callback)
+
+            if not out:
+                out = NO_CONTENT
+                if callback:
+                    callback(out)
+            elif key is not None:
+                self.cache.put(key, out)
+            self._commit(conv, fps, out)
+            return out
+
+    def call(self, prompt: Optional[str] = None, messages: Optional[List[Dict[str, Any]]] = None,
+             stream: Optional[bool] = None, stream_callback: Optional[StreamCallback] = None,
+             conversation_id: Any = None, **kwargs: Any) -> str:
+        if stream or (stream is None and self.stream) or stream_callback:
+            return self.call_stream(prompt=prompt, messages=messages, stream_callback=stream_callback,
+                                    conversation_id=conversation_id, **kwargs)
+        local = self._faq_answer(prompt, messages)
+        if local is not None:
+            return local
+
+        with self.sessions.use(conversation_id) as conv:
+            if self.cache is None:
+                return self._send(conv, prompt, messages)
+            # Identical concurrent prompts share one upstream call
+            key = self._cache_key(self._prepare_text(prompt, messages))
+            # A transient empty reply is returned but never cached
+            return self.cache.get_or_compute(key, lambda: self._send(conv, prompt, messages), cacheable=_cacheable)
+
+    def _send(self, conv: Conversation, prompt: Optional[str], messages: Optional[List[Dict[str, Any]]]) -> str:
+        self._ensure_session(conv)
+        text, fps = self._outgoing(conv, prompt, messages)
+        try:
+            resp = self.api.send_message_sync(conv.token, conv.session_id, text, sequence_id=conv.sequence_id)
+        except AuthError:
+            self._refresh_and_reopen(conv)
+            text, fps = self._outgoing(conv, prompt, messages)
+            resp = self.api.send_message_sync(conv.token, conv.session_id, text, sequence_id=conv.sequence_id)
+
+        out = self._finish(resp)
+        self._commit(conv, fps, out)
+        return out
+
+    def end_conversation(self, conversation_id: Any, reason: str = "UserRequest") -> bool:
+        """End one conversation's Agent session (no-op if unknown or mid-call)."""
+        return self.sessions.end(conversation_id, reason)
+
+    def session_stats(self) -> dict:
+        return self.sessions.stats()
+
+    def faq_stats(self) -> dict:
+        return self.faq.stats() if self.faq is not None else {}
+
+    def close(self, reason: str = "UserRequest"):
+        """End every idle conversation's Agent session; the instance stays usable."""
+        self.sessions.end_all(reason)
+
+    # --- Async ---
+    async def _aensure_session(self, conv: Conversation):
+        aapi = self._aapi()
+        conv.token = await aapi.get_access_token()
+        if not conv.session_id:
+            conv.reset(await aapi.start_session(conv.token))
+
+    async def _arefresh_and_reopen(self, conv: Conversation):
+        aapi = self._aapi()
+        aapi.invalidate_token(conv.token)
+        conv.token = await aapi.get_access_token()
+        conv.reset(await aapi.start_session(conv.token))
+
+    async def acall(self, prompt: Optional[str] = None, messages: Optional[List[Dict[str, Any]]] = None,
+                    conversation_id: Any = None, **_: Any) -> str:
+        """Async variant of call(); concurrent awaits on one conversation are serialized."""
+        local = self._faq_answer(prompt, messages)
+        if local is not None:
+            return local
+
+        async with self.sessions.ause(conversation_id) as conv:
+            if self.cache is None:
+                return await self._asend(conv, prompt, messages)
+            # Identical concurrent prompts share one upstream call, as in call()
+            key = self._cache_key(self._prepare_text(prompt, messages))
+            return await self.cache.aget_or_compute(key, lambda: self._asend(conv, prompt, messages),
+                                                    cacheable=_cacheable)
+
+    async def _asend(self, conv: Conversation, prompt: Optional[str], messages: Optional[List[Dict[str, Any]]]) -> str:
+        aapi = self._aapi()
+        await self._aensure_session(conv)
+        text, fps = self._outgoing(conv, prompt, messages)
+        try:
+            resp = await aapi.send_message_sync(conv.token, conv.session_id, text, sequence_id=conv.sequence_id)
+        except AuthError:
+            await self._arefresh_and_reopen(conv)
+            text, fps = self._outgoing(conv, prompt, messages)
+            resp = await aapi.send_message_sync(conv.token, conv.session_id, text, sequence_id=conv.sequence_id)
+
+        out = self._finish(resp)
+        self._commit(conv, fps, out)
+        return out
+
+    async def aclose(self, reason: str = "UserRequest"):
+        aapi = self._aapi()
+        for conv in self.sessions.drain():
+            if conv.session_id:
+                try:
+                    await aapi.end_session(await aapi.get_access_token(), conv.session_id, reason)
+                except Exception:
+                    pass
+        await aapi.aclose()
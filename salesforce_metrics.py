@@ -0,0 +1,224 @@
+# salesforce_metrics.py
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class MetricsHook:
+    """
+    Collector interface for SalesforceAgentAPI instrumentation. Subclass and
+    register with add_hook(); every method is a no-op by default.
+    """
+
+    def on_request(self, endpoint: str, method: str, status: int, duration: float,
+                   bytes_out: int, bytes_in: int, retries: int = 0):
+        """One finished HTTP call. status is 0 when no response was received."""
+
+    def on_sessions(self, delta: int):
+        """Agent sessions opened (+1) or ended (-1)."""
+
+
+# Registered hooks. Instrumented code checks `if HOOKS:` first, so with no hooks
+# the only cost is one truthiness test per call.
+HOOKS: List[MetricsHook] = []
+_hooks_lock = threading.Lock()
+
+
+def add_hook(hook: MetricsHook) -> MetricsHook:
+    with _hooks_lock:
+        if hook not in HOOKS:
+            HOOKS.append(hook)
+    return hook
+
+
+def remove_hook(hook: MetricsHook):
+    with _hooks_lock:
+        if hook in HOOKS:
+            HOOKS.remove(hook)
+
+
+def emit_request(endpoint: str, method: str, status: int, duration: float,
+                 bytes_out: int, bytes_in: int, retries: int = 0):
+    for h in list(HOOKS):
+        try:
+            h.on_request(endpoint, method, status, duration, bytes_out, bytes_in, retries)
+        except Exception:
+            pass  # a broken collector must never fail an Agent call
+
+
+def emit_sessions(delta: int):
+    for h in list(HOOKS):
+        try:
+            h.on_sessions(delta)
+        except Exception:
+            pass
+
+
+def payload_size(kwargs: dict) -> int:
+    """Approximate request body size for data=/json= kwargs (only computed when hooks are set)."""
+    if kwargs.get("json") is not None:
+        return len(json.dumps(kwargs["json"]).encode("utf-8"))
+    data = kwargs.get("data")
+    if isinstance(data, dict):
+        return sum(len(str(k)) + len(str(v)) + 2 for k, v in data.items())
+    if isinstance(data, (str, bytes)):
+        return len(data)
+    return 0
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float):
+        self.sum += v
+        self.count += 1
+        for i, b in enumerate(self.buckets):
+            if v <= b:
+                self.counts[i] += 1
+
+
+def _labels(**kv) -> str:
+    return "{" + ",".join(f'{k}="{v}"' for k, v in kv.items()) + "}"
+
+
+class MetricsRegistry(MetricsHook):
+    """In-process collector: per-endpoint latency histograms, status/retry/byte counters, active sessions."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._latency: Dict[str, _Histogram] = {}
+        self._requests: Dict[Tuple[str, str, str], int] = {}
+        self._retries: Dict[str, int] = {}
+        self._bytes: Dict[Tuple[str, str], int] = {}
+        self._active_sessions = 0
+
+    # --- MetricsHook ---
+    def on_request(self, endpoint, method, status, duration, bytes_out, bytes_in, retries=0):
+        with self._lock:
+            h = self._latency.get(endpoint)
+            if h is None:
+                h = self._latency[endpoint] = _Histogram(self.buckets)
+            h.observe(duration)
+            key = (endpoint, method, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            if retries:
+                self._retries[endpoint] = self._retries.get(endpoint, 0) + retries
+            for direction, n in (("out", bytes_out), ("in", bytes_in)):
+                self._bytes[(endpoint, direction)] = self._bytes.get((endpoint, direction), 0) + n
+
+    def on_sessions(self, delta):
+        with self._lock:
+            self._active_sessions = max(0, self._active_sessions + delta)
+
+    # --- Export ---
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "latency": {
+                    ep: {"count": h.count, "sum": h.sum, "buckets": dict(zip(h.buckets, h.counts))}
+                    for ep, h in self._latency.items()
+                },
+                "requests": {"|".join(k): v for k, v in self._requests.items()},
+                "retries": dict(self._retries),
+                "bytes": {"|".join(k): v for k, v in self._bytes.items()},
+                "active_sessions": self._active_sessions,
+            }
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            lines += [
+                "# HELP sf_agent_request_duration_seconds Salesforce Agent API call latency.",
+                "# TYPE sf_agent_request_duration_seconds histogram",
+            ]
+            for ep, h in sorted(self._latency.items()):
+                for b, c in zip(h.buckets, h.counts):
+                    lines.append(f"sf_agent_request_duration_seconds_bucket{_labels(endpoint=ep, le=b)} {c}")
+                lines.append(f"sf_agent_request_duration_seconds_bucket{_labels(endpoint=ep, le='+Inf')} {h.count}")
+                lines.append(f"sf_agent_request_duration_seconds_sum{_labels(endpoint=ep)} {h.sum}")
+                lines.append(f"sf_agent_request_duration_seconds_count{_labels(endpoint=ep)} {h.count}")
+
+            lines += ["# HELP sf_agent_requests_total Salesforce Agent API calls by status code.",
+                      "# TYPE sf_agent_requests_total counter"]
+            for (ep, method, status), n in sorted(self._requests.items()):
+                lines.append(f"sf_agent_requests_total{_labels(endpoint=ep, method=method, status=status)} {n}")
+
+            lines += ["# HELP sf_agent_request_retries_total Retried Salesforce Agent API calls.",
+                      "# TYPE sf_agent_request_retries_total counter"]
+            for ep, n in sorted(self._retries.items()):
+                lines.append(f"sf_agent_request_retries_total{_labels(endpoint=ep)} {n}")
+
+            lines += ["# HELP sf_agent_payload_bytes_total Request/response payload bytes.",
+                      "# TYPE sf_agent_payload_bytes_total counter"]
+            for (ep, direction), n in sorted(self._bytes.items()):
+                lines.append(f"sf_agent_payload_bytes_total{_labels(endpoint=ep, direction=direction)} {n}")
+
+            lines += ["# HELP sf_agent_active_sessions Agent sessions currently open in this process.",
+                      "# TYPE sf_agent_active_sessions gauge",
+                      f"sf_agent_active_sessions {self._active_sessions}"]
+        return "\n".join(lines) + "\n"
+
+
+# --- Optional local /metrics endpoint ---
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = self.registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(registry: MetricsRegistry, port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, name="sf-metrics", daemon=True).start()
+    return httpd
+
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def enable_metrics(port: Optional[int] = None, host: str = "127.0.0.1") -> MetricsRegistry:
+    """Register the process-wide MetricsRegistry (idempotent) and optionally serve it on /metrics."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = add_hook(MetricsRegistry())
+            if port:
+                start_metrics_server(_registry, port, host)
+        return _registry
+
+
+def enable_metrics_from_env() -> Optional[MetricsRegistry]:
+    """SF_METRICS=1 collects in-process; SF_METRICS_PORT also serves Prometheus text on /metrics."""
+    port = os.getenv("SF_METRICS_PORT")
+    if port:
+        return enable_metrics(port=int(port), host=os.getenv("SF_METRICS_HOST", "127.0.0.1"))
+    if os.getenv("SF_METRICS", "").lower() in ("1", "true", "yes"):
+        return enable_metrics()
+    return None
+
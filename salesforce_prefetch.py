@@ -0,0 +1,127 @@
+# salesforce_prefetch.py
+import contextvars
+import os
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Hashable, Optional
+
+import tracing
+from salesforce_conversations import resolve_conversation_key
+from salesforce_session_pool import AgentSessionPool, PooledSession
+
+_current: contextvars.ContextVar = contextvars.ContextVar("sf_session_prefetch", default=None)
+
+
+def is_enabled() -> bool:
+    return os.getenv("SF_PREFETCH", "1").lower() not in ("0", "false", "no")
+
+
+class SessionPrefetch:
+    """One in-flight token fetch + session checkout, adopted by at most one tool call."""
+
+    __slots__ = ("future", "_lock", "_taken")
+
+    def __init__(self, future: Future):
+        self.future = future
+        self._lock = threading.Lock()
+        self._taken = False
+
+    def take(self) -> bool:
+        """Claim the prefetched session; only the first caller wins."""
+        with self._lock:
+            if self._taken:
+                return False
+            self._taken = True
+            return True
+
+
+class SessionPrefetcher:
+    """
+    Fetches the access token and checks out (opening if needed) an Agent session
+    in the background while the router and planner LLMs are still thinking. The
+    tool's first call adopts it; if the flow never calls the tool the session goes
+    back to the pool untouched. The prefetch never waits for a pool slot.
+    """
+
+    def __init__(self, pool: AgentSessionPool, max_workers: int = 4):
+        self.pool = pool
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sf-prefetch")
+        self._lock = threading.Lock()
+        self._started = 0
+        self._adopted = 0
+        self._returned = 0
+        self._skipped = 0
+        self._failed = 0
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _prepare(self, key: Hashable) -> Optional[PooledSession]:
+        with tracing.span("prefetch", "prefetch"):
+            self.pool.api.get_access_token()  # lands in the shared token cache
+            try:
+                return self.pool.checkout(timeout=0, key=key)
+            except TimeoutError:
+                self._count("_skipped")  # pool fully in use; the tool will wait its turn as before
+                return None
+
+    @contextmanager
+    def scope(self):
+        """Prefetch for the duration of one kickoff; clean up whatever was not adopted."""
+        if not is_enabled():
+            yield None
+            return
+        try:
+            # The session belongs to the caller's conversation, not the prefetch thread
+            key = resolve_conversation_key()
+            pf = SessionPrefetch(self._executor.submit(contextvars.copy_context().run, self._prepare, key))
+        except RuntimeError:  # executor shut down
+            yield None
+            return
+        self._count("_started")
+        token = _current.set(pf)
+        try:
+            yield pf
+        finally:
+            _current.reset(token)
+            if pf.take():
+                pf.future.cancel()  # not started yet: nothing to clean up
+                pf.future.add_done_callback(self._give_back)
+
+    def _give_back(self, fut: Future):
+        try:
+            s = fut.result()
+        except (CancelledError, Exception):
+            return
+        if s is not None:
+            self.pool.checkin(s)
+            self._count("_returned")
+
+    def adopt(self) -> Optional[PooledSession]:
+        """The prefetched session for the current kickoff, or None (no prefetch, already used, or failed)."""
+        pf: Optional[SessionPrefetch] = _current.get()
+        if pf is None or not pf.take():
+            return None
+        try:
+            s = pf.future.result()
+        except Exception:
+            self._count("_failed")
+            return None
+        if s is not None:
+            self._count("_adopted")
+        return s
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "started": self._started,
+                "adopted": self._adopted,
+                "returned_unused": self._returned,
+                "skipped_pool_full": self._skipped,
+                "failed": self._failed,
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=True)
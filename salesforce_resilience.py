@@ -0,0 +1,408 @@
+# salesforce_resilience.py
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Deque, Dict, Iterable, Optional, Tuple
+
+from salesforce_errors import CircuitOpenError
+from salesforce_scheduler import scheduler_from_env
+
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+
+class RetryPolicy:
+    """
+    Jittered exponential backoff. A Retry-After from the server always wins over
+    the computed delay (capped at max_retry_after).
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        max_retry_after: float = 60.0,
+        retry_on: Iterable[int] = RETRYABLE_STATUSES,
+        retry_connection_errors: bool = True,
+    ):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.retry_on = frozenset(retry_on)
+        self.retry_connection_errors = retry_connection_errors
+
+    def should_retry_status(self, status: int, attempt: int) -> bool:
+        return status in self.retry_on and attempt < self.max_attempts
+
+    def should_retry_exception(self, attempt: int) -> bool:
+        return self.retry_connection_errors and attempt < self.max_attempts
+
+    def should_retry_error(self, error, attempt: int) -> bool:
+        """A typed SalesforceAPIError raised before anything was sent (e.g. AdmissionRejected)."""
+        return getattr(error, "retryable", False) and attempt < self.max_attempts
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before attempt `attempt + 1` (attempts are 1-based)."""
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        # "full jitter": uniform over [0, capped exponential]
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+# Sending a message is not idempotent: only retry statuses where the Agent did not process it.
+DEFAULT_RETRY_POLICIES: Dict[str, RetryPolicy] = {
+    "token": RetryPolicy(max_attempts=4),
+    "start_session": RetryPolicy(max_attempts=3),
+    "messages": RetryPolicy(max_attempts=3, retry_on=(429, 503), retry_connection_errors=False),
+    "messages_stream": RetryPolicy(max_attempts=1),
+    "end_session": RetryPolicy(max_attempts=2),
+}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests/second sustained, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token (possibly going into debt) and return how long the caller must wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1.0
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            return max(wait, self._paused_until - now)
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold everyone back, e.g. after a 429 with Retry-After."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures; open calls fail
+    fast with CircuitOpenError for `recovery_timeout` seconds, then one trial call
+    (half-open) decides whether to close again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def before_call(self, endpoint: Optional[str] = None):
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.OPEN:
+                remaining = self._opened_at + self.recovery_timeout - time.monotonic()
+                if remaining > 0:
+                    raise CircuitOpenError(
+                        f"Salesforce Agent API circuit open; retry in {remaining:.1f}s",
+                        retry_after=remaining, endpoint=endpoint,
+                    )
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._trial_in_flight:
+                raise CircuitOpenError("Salesforce Agent API circuit half-open; trial call in flight",
+                                       retry_after=1.0, endpoint=endpoint)
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def settle(self, failed: Optional[bool]):
+        """
+        Record how a call that passed before_call() ended. None means no verdict
+        (cancelled, shed or the caller's own error before a response): the
+        half-open trial is released so the next call can take it.
+        """
+        if failed is None:
+            with self._lock:
+                self._trial_in_flight = False
+        elif failed:
+            self.record_failure()
+        else:
+            self.record_success()
+
+
+class AdaptiveTimeout:
+    """
+    Per-endpoint timeout that follows observed latency: `multiplier` x the running
+    `percentile` of the last `window` attempts, clamped to [floor, ceiling]. Until
+    `min_samples` are seen it is the ceiling. A timed-out attempt counts as a
+    sample at the timeout, so a too-tight value widens on its own.
+    """
+
+    def __init__(self, floor: float, ceiling: float, percentile: float = 0.99, multiplier: float = 3.0,
+                 min_samples: int = 20, window: int = 200):
+        self.floor = float(floor)
+        self.ceiling = max(float(ceiling), self.floor)
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._timeouts = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def observe_timeout(self, timeout: float):
+        with self._lock:
+            self._samples.append(timeout)
+            self._timeouts += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Running q-quantile of recent attempts, or None with too few samples."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def current(self) -> float:
+        p = self.quantile(self.percentile)
+        if p is None:
+            return self.ceiling
+        return min(self.ceiling, max(self.floor, p * self.multiplier))
+
+    def stats(self) -> dict:
+        with self._lock:
+            n, timeouts = len(self._samples), self._timeouts
+        return {"samples": n, "p50": self.quantile(0.5), "p95": self.quantile(0.95),
+                "p99": self.quantile(0.99), "timeout": self.current(), "timeouts": timeouts}
+
+
+# (floor, ceiling) in seconds. Messages wait on the Agent's reasoning, so their floor stays high.
+DEFAULT_TIMEOUT_BOUNDS: Dict[str, Tuple[float, float]] = {
+    "token": (2.0, 30.0),
+    "start_session": (3.0, 30.0),
+    "messages": (15.0, 30.0),
+    "messages_stream": (15.0, 30.0),
+    "end_session": (2.0, 30.0),
+}
+
+
+class Hedger:
+    """
+    Hedged requests for side-effect-free calls (token fetch, session start): if the
+    first attempt is still running after the endpoint's running p95, a second one
+    starts and whichever succeeds first wins. The loser's result goes to
+    `on_surplus` (e.g. end the extra session). Hedges are capped at `max_ratio` of
+    calls so a slow org is not hit with double load.
+    """
+
+    def __init__(self, max_ratio: float = 0.1, min_delay: float = 0.05, max_workers: int = 8):
+        self.max_ratio = max_ratio
+        self.min_delay = min_delay
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sf-hedge")
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, endpoint: str, key: str, n: int = 1):
+        with self._lock:
+            st = self._stats.setdefault(endpoint, {"calls": 0, "hedged": 0, "hedge_wins": 0, "surplus": 0})
+            st[key] += n
+
+    def _may_hedge(self, endpoint: str) -> bool:
+        with self._lock:
+            st = self._stats.get(endpoint)
+            return st is not None and st["hedged"] < max(1.0, st["calls"] * self.max_ratio)
+
+    def _discard(self, endpoint: str, fut: Future, on_surplus: Optional[Callable]):
+        def _done(f):
+            if f.cancelled() or f.exception() is not None:
+                return
+            self._count(endpoint, "surplus")
+            if on_surplus is not None:
+                try:
+                    on_surplus(f.result())
+                except Exception:
+                    pass
+        fut.add_done_callback(_done)
+
+    def call(self, endpoint: str, fn: Callable[[], object], delay: Optional[float],
+             on_surplus: Optional[Callable[[object], None]] = None):
+        """Run fn(), hedging after `delay` seconds (None = not enough data yet, no hedge)."""
+        self._count(endpoint, "calls")
+        if delay is None:
+            return fn()
+        first = self._pool.submit(contextvars.copy_context().run, fn)
+        done, _ = wait([first], timeout=max(delay, self.min_delay))
+        if done or not self._may_hedge(endpoint):
+            return first.result()
+        self._count(endpoint, "hedged")
+        second = self._pool.submit(contextvars.copy_context().run, fn)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    if f is second:
+                        self._count(endpoint, "hedge_wins")
+                    for other in pending:
+                        self._discard(endpoint, other, on_surplus)
+                    return f.result()
+                error = error or f.exception()
+        raise error
+
+    async def acall(self, endpoint: str, fn: Callable[[], Awaitable], delay: Optional[float],
+                    on_surplus: Optional[Callable[[object], Awaitable]] = None):
+        """asyncio twin of call(); fn is a coroutine function."""
+        self._count(endpoint, "calls")
+        if delay is None:
+            return await fn()
+        first = asyncio.ensure_future(fn())
+        done, _ = await asyncio.wait({first}, timeout=max(delay, self.min_delay))
+        if done or not self._may_hedge(endpoint):
+            return await first
+        self._count(endpoint, "hedged")
+        second = asyncio.ensure_future(fn())
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is None:
+                    if t is second:
+                        self._count(endpoint, "hedge_wins")
+                    for other in pending:
+                        other.add_done_callback(lambda o: self._adiscard(endpoint, o, on_surplus))
+                    return t.result()
+                error = error or t.exception()
+        raise error
+
+    def _adiscard(self, endpoint: str, task: "asyncio.Future", on_surplus):
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._count(endpoint, "surplus")
+        if on_surplus is not None:
+            cleanup = asyncio.ensure_future(on_surplus(task.result()))
+            cleanup.add_done_callback(lambda c: c.cancelled() or c.exception())
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {k: dict(v) for k, v in self._stats.items()}
+
+
+class OrgGuard:
+    """The admission scheduler, limiter, breaker, adaptive timeouts and hedger shared by every client of one org."""
+
+    def __init__(self, limiter: Optional[TokenBucket], breaker: Optional[CircuitBreaker],
+                 timeouts: Optional[Dict[str, AdaptiveTimeout]] = None, hedger: Optional[Hedger] = None,
+                 scheduler=None):
+        self.limiter = limiter
+        self.breaker = breaker
+        self.timeouts = timeouts  # None = fixed timeouts
+        self.hedger = hedger
+        self.scheduler = scheduler  # salesforce_scheduler.AdmissionScheduler or None
+
+    def timeout_for(self, endpoint: str, default: float) -> float:
+        t = self.timeouts.get(endpoint) if self.timeouts else None
+        return t.current() if t is not None else default
+
+    def observe(self, endpoint: str, seconds: float, timed_out: bool = False):
+        t = self.timeouts.get(endpoint) if self.timeouts else None
+        if t is not None:
+            if timed_out:
+                t.observe_timeout(seconds)
+            else:
+                t.observe(seconds)
+
+    def hedge_delay(self, endpoint: str) -> Optional[float]:
+        """Running p95 for `endpoint`, or None when hedging is off or there is not enough data."""
+        t = self.timeouts.get(endpoint) if self.timeouts else None
+        if self.hedger is None or t is None:
+            return None
+        return t.quantile(0.95)
+
+    def latency_stats(self) -> dict:
+        out = {"timeouts": {k: t.stats() for k, t in (self.timeouts or {}).items()}}
+        if self.hedger is not None:
+            out["hedges"] = self.hedger.stats()
+        return out
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+def build_timeouts(bounds: Optional[Dict[str, Tuple[float, float]]] = None) -> Dict[str, AdaptiveTimeout]:
+    """Adaptive timeouts per endpoint; SF_TIMEOUT_FLOOR / SF_TIMEOUT_CEILING override every endpoint's bounds."""
+    floor, ceiling = os.getenv("SF_TIMEOUT_FLOOR"), os.getenv("SF_TIMEOUT_CEILING")
+    out = {}
+    for endpoint, (lo, hi) in {**DEFAULT_TIMEOUT_BOUNDS, **(bounds or {})}.items():
+        out[endpoint] = AdaptiveTimeout(float(floor) if floor else lo, float(ceiling) if ceiling else hi)
+    return out
+
+
+_guards: Dict[str, OrgGuard] = {}
+_guards_lock = threading.Lock()
+
+
+def get_org_guard(domain: str) -> OrgGuard:
+    """
+    Process-wide guard per org domain. SF_RATE_LIMIT (req/s) and SF_RATE_BURST enable
+    the limiter; SF_BREAKER_THRESHOLD=0 disables the breaker; SF_ADAPTIVE_TIMEOUTS=0
+    pins every timeout at its ceiling; SF_HEDGE=1 hedges token and session-start calls;
+    SF_AGENT_CONCURRENCY=<slots> turns on the priority admission scheduler.
+    """
+
+    with _guards_lock:
+        guard = _guards.get(domain)
+        if guard is None:
+            rate = float(os.getenv("SF_RATE_LIMIT", "0"))
+            burst = os.getenv("SF_RATE_BURST")
+            threshold = int(os.getenv("SF_BREAKER_THRESHOLD", "5"))
+            guard = _guards[domain] = OrgGuard(
+                TokenBucket(rate, float(burst) if burst else None) if rate > 0 else None,
+                CircuitBreaker(threshold, float(os.getenv("SF_BREAKER_RECOVERY", "30"))) if threshold > 0 else None,
+                build_timeouts() if _env_flag("SF_ADAPTIVE_TIMEOUTS", "1") else None,
+                Hedger(float(os.getenv("SF_HEDGE_MAX_RATIO", "0.1"))) if _env_flag("SF_HEDGE", "0") else None,
+                scheduler_from_env(),
+            )
+        return guard
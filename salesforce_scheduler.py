@@ -0,0 +1,251 @@
+# salesforce_scheduler.py
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Deque, Dict, Iterable, List, Optional
+
+from salesforce_errors import AdmissionRejected
+
+INTERACTIVE, PLANNER, BATCH = "interactive", "planner", "batch"
+DEFAULT_CAPACITY = 32
+
+_priority: contextvars.ContextVar = contextvars.ContextVar("sf_priority", default=None)
+
+
+@contextmanager
+def priority(name: str):
+    """Agent calls made inside this block (and in work copied from its context) use class `name`."""
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> Optional[str]:
+    return _priority.get()
+
+
+class PriorityClass:
+    """
+    One traffic class. `weight` is its share of contended capacity, `max_concurrency`
+    caps its in-flight calls (so it can never take every slot), and callers are shed
+    with AdmissionRejected beyond `max_queue` waiters or after `max_wait` seconds.
+    """
+
+    def __init__(self, name: str, weight: float, max_concurrency: Optional[int] = None,
+                 max_queue: int = 256, max_wait: float = 60.0):
+        self.name = name
+        self.weight = float(weight)
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+
+def default_classes(capacity: int) -> List[PriorityClass]:
+    """Live guests first; planners next; batch/simulation traffic soaks up what is left (at most half)."""
+    return [
+        PriorityClass(INTERACTIVE, weight=8, max_queue=128, max_wait=30.0),
+        PriorityClass(PLANNER, weight=4, max_concurrency=max(1, capacity * 3 // 4), max_queue=256, max_wait=120.0),
+        PriorityClass(BATCH, weight=1, max_concurrency=max(1, capacity // 2), max_queue=4096, max_wait=600.0),
+    ]
+
+
+class _Waiter:
+    __slots__ = ("cls", "tag", "enqueued", "granted", "event", "loop", "future")
+
+    def __init__(self, cls: "_ClassState", tag: float):
+        self.cls = cls
+        self.tag = tag
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.event: Optional[threading.Event] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.future: Optional[asyncio.Future] = None
+
+    def wake(self):
+        if self.event is not None:
+            self.event.set()
+        elif self.loop is not None:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(fut: asyncio.Future):
+    if not fut.done():
+        fut.set_result(None)
+
+
+class _ClassState:
+    def __init__(self, spec: PriorityClass, capacity: int):
+        self.spec = spec
+        self.cap = min(capacity, spec.max_concurrency or capacity)
+        self.queue: Deque[_Waiter] = deque()
+        self.running = 0
+        self.last_tag = 0.0
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+        self.waits: Deque[float] = deque(maxlen=1000)
+
+
+class AdmissionScheduler:
+    """
+    Admission control in front of the Agent API: at most `capacity` calls in flight
+    org-wide. When calls queue, slots go out by weighted fair queuing (start-time
+    tags, 1/weight apart per class) among classes under their concurrency cap, so
+    each busy class gets its weighted share and an idle class's share flows to the
+    others. Waits are FIFO within a class.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, classes: Optional[Iterable[PriorityClass]] = None,
+                 default_class: str = INTERACTIVE):
+        self.capacity = max(1, int(capacity))
+        specs = list(classes) if classes is not None else default_classes(self.capacity)
+        self._classes: Dict[str, _ClassState] = {c.name: _ClassState(c, self.capacity) for c in specs}
+        self.default_class = default_class if default_class in self._classes else specs[0].name
+        self._lock = threading.Lock()
+        self._running = 0
+        self._vtime = 0.0
+
+    def _state(self, name: Optional[str]) -> _ClassState:
+        return self._classes.get(name or _priority.get() or self.default_class) or self._classes[self.default_class]
+
+    # --- Core ---
+    def _enqueue(self, cls: _ClassState) -> Optional[_Waiter]:
+        """Admit immediately (returns None) or queue a waiter; raises AdmissionRejected when full."""
+        with self._lock:
+            if not cls.queue and self._running < self.capacity and cls.running < cls.cap:
+                self._admit(cls, 0.0)
+                return None
+            if len(cls.queue) >= cls.spec.max_queue:
+                cls.shed += 1
+                raise AdmissionRejected(
+                    f"Agent API admission queue for {cls.spec.name!r} is full ({cls.spec.max_queue} waiting)",
+                    retry_after=1.0,
+                )
+            tag = max(self._vtime, cls.last_tag) + 1.0 / cls.spec.weight
+            cls.last_tag = tag
+            w = _Waiter(cls, tag)
+            cls.queue.append(w)
+            return w
+
+    def _admit(self, cls: _ClassState, waited: float):
+        self._running += 1
+        cls.running += 1
+        cls.admitted += 1
+        cls.waits.append(waited)
+
+    def _dispatch(self) -> List[_Waiter]:
+        """Hand free slots to queued waiters, smallest tag first (call with the lock held)."""
+        woken = []
+        while self._running < self.capacity:
+            heads = [(c.queue[0].tag, i, c) for i, c in enumerate(self._classes.values())
+                     if c.queue and c.running < c.cap]
+            if not heads:
+                break
+            tag, _, cls = min(heads)
+            w = cls.queue.popleft()
+            self._vtime = tag
+            w.granted = True
+            self._admit(cls, time.monotonic() - w.enqueued)
+            woken.append(w)
+        return woken
+
+    def _release(self, cls: _ClassState):
+        with self._lock:
+            self._running -= 1
+            cls.running -= 1
+            woken = self._dispatch()
+        for w in woken:
+            w.wake()
+
+    def _abandon(self, w: _Waiter) -> bool:
+        """Give up on a waiter; returns True if it was granted meanwhile (caller then owns the slot)."""
+        with self._lock:
+            if w.granted:
+                return True
+            try:
+                w.cls.queue.remove(w)
+            except ValueError:
+                pass
+            w.cls.timed_out += 1
+        return False
+
+    def _reject_timeout(self, cls: _ClassState, waited: float):
+        raise AdmissionRejected(
+            f"waited {waited:.1f}s for an Agent API slot in class {cls.spec.name!r}; shedding", retry_after=1.0)
+
+    # --- Sync / async entry points ---
+    @contextmanager
+    def slot(self, name: Optional[str] = None):
+        """Hold one Agent API slot for the block (blocks the thread while queued)."""
+        cls = self._state(name)
+        w = self._enqueue(cls)
+        if w is not None:
+            w.event = threading.Event()
+            if not w.granted and not w.event.wait(cls.spec.max_wait):
+                if not self._abandon(w):
+                    self._reject_timeout(cls, time.monotonic() - w.enqueued)
+        try:
+            yield
+        finally:
+            self._release(cls)
+
+    @asynccontextmanager
+    async def aslot(self, name: Optional[str] = None):
+        """asyncio twin of slot(): waits without blocking the event loop."""
+        cls = self._state(name)
+        w = self._enqueue(cls)
+        if w is not None:
+            loop = asyncio.get_running_loop()
+            w.future = loop.create_future()
+            w.loop = loop  # wake() may fire from another thread as soon as this is set
+            if w.granted:
+                _resolve(w.future)
+            try:
+                await asyncio.wait_for(asyncio.shield(w.future), cls.spec.max_wait)
+            except asyncio.TimeoutError:
+                if not self._abandon(w):
+                    self._reject_timeout(cls, time.monotonic() - w.enqueued)
+            except asyncio.CancelledError:
+                if self._abandon(w):
+                    self._release(cls)
+                raise
+        try:
+            yield
+        finally:
+            self._release(cls)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {"capacity": self.capacity, "running": self._running, "classes": {}}
+            for name, c in self._classes.items():
+                waits = sorted(c.waits)
+                out["classes"][name] = {
+                    "weight": c.spec.weight,
+                    "max_concurrency": c.cap,
+                    "running": c.running,
+                    "queued": len(c.queue),
+                    "admitted": c.admitted,
+                    "shed": c.shed,
+                    "timed_out": c.timed_out,
+                    "wait_avg_s": sum(waits) / len(waits) if waits else 0.0,
+                    "wait_p95_s": waits[min(len(waits) - 1, int(0.95 * len(waits)))] if waits else 0.0,
+                    "wait_max_s": waits[-1] if waits else 0.0,
+                }
+        return out
+
+
+def scheduler_from_env() -> Optional[AdmissionScheduler]:
+    """
+    Opt-in: SF_AGENT_CONCURRENCY=<slots> (e.g. 32) turns admission control on;
+    unset or 0 leaves it off. SF_DEFAULT_PRIORITY classes unlabeled calls.
+    """
+    capacity = int(os.getenv("SF_AGENT_CONCURRENCY") or 0)
+    if capacity <= 0:
+        return None
+    return AdmissionScheduler(capacity, default_class=os.getenv("SF_DEFAULT_PRIORITY", INTERACTIVE))
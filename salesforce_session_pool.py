@@ -0,0 +1,355 @@
+# salesforce_session_pool.py
+import asyncio
+import atexit
+import contextvars
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Deque, Hashable, Optional
+
+from salesforce_agent_API import SalesforceAgentAPI
+from salesforce_conversations import resolve_conversation_key
+from salesforce_errors import AuthError
+
+
+class PooledSession:
+    """An open Einstein Agent session, its own sequence counter and the conversation it serves (None = fresh)."""
+
+    __slots__ = ("session_id", "created_at", "messages_sent", "owner", "_sequence_id")
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.created_at = time.monotonic()
+        self.messages_sent = 0
+        self.owner: Optional[Hashable] = None
+        self._sequence_id = 0
+
+    def next_sequence_id(self) -> int:
+        self._sequence_id += 1
+        self.messages_sent += 1
+        return self._sequence_id
+
+    def age(self) -> float:
+        return time.monotonic() - self.created_at
+
+
+# Every live pool is closed at exit; weak references so an abandoned pool can still be collected
+_live_pools: "weakref.WeakSet[AgentSessionPool]" = weakref.WeakSet()
+
+
+def _close_live_pools():
+    for pool in list(_live_pools):
+        pool.close()
+
+
+atexit.register(_close_live_pools)
+
+
+class AgentSessionPool:
+    """
+    Bounded pool of warm Agent sessions. Callers check a session out per message;
+    sessions are recycled after `max_messages` messages or `max_age` seconds and
+    ended on a background thread, off the request path.
+
+    The Agent keeps conversation state per session, so a session only ever serves
+    one conversation (resolve_conversation_key: a conversation() block, else the
+    thread or task). A conversation gets its own idle session back, else a fresh
+    one; other conversations' idle sessions are recycled to make room, never
+    handed out. The trade-off: each new conversation consumes a session (opened
+    ahead of time by the pool rather than on the request path), and nothing is
+    reused across conversations. end_conversation() recycles one as soon as its
+    caller is done.
+    """
+
+    def __init__(
+        self,
+        api: SalesforceAgentAPI,
+        size: int = 2,
+        max_messages: int = 20,
+        max_age: float = 600.0,
+        checkout_timeout: float = 60.0,
+        opener: Optional[Callable[[str], str]] = None,
+        prewarm: bool = True,
+    ):
+        self.api = api
+        self.size = max(1, int(size))
+        self.max_messages = max_messages
+        self.max_age = max_age
+        self.checkout_timeout = checkout_timeout
+        self._open = opener or (lambda token: self.api.start_session(token))
+
+        self._idle: Deque[PooledSession] = deque()
+        self._live = 0  # idle + checked out + being opened
+        self._cond = threading.Condition()
+        self._bg = ThreadPoolExecutor(max_workers=2, thread_name_prefix="sf-session-pool")
+        self._closed = False
+        # Sessions are opened on first checkout, never by the constructor
+        self._prewarm_pending = prewarm
+
+        # stats
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._opened = 0
+        self._recycled = 0
+
+        _live_pools.add(self)
+
+    # --- Lifecycle helpers ---
+    def _expired(self, s: PooledSession) -> bool:
+        return (self.max_messages and s.messages_sent >= self.max_messages) or (
+            self.max_age and s.age() >= self.max_age
+        )
+
+    def _with_token(self, fn):
+        """fn(token) with the cached token; a 401 (revoked/expired) drops it and retries once with a fresh one."""
+        token = self.api.get_access_token()
+        try:
+            return fn(token)
+        except AuthError:
+            self.api.invalidate_token(token)
+            return fn(self.api.get_access_token())
+
+    def _open_session(self) -> PooledSession:
+        sid = self._with_token(self._open)
+        with self._cond:
+            self._opened += 1
+        return PooledSession(sid)
+
+    def _end_session(self, s: PooledSession):
+        try:
+            self._with_token(lambda token: self.api.end_session(token, s.session_id))
+        except Exception:
+            pass  # best-effort, same as the tool always did
+
+    def _teardown(self, s: PooledSession, rewarm: bool = True):
+        """Release a slot and end the session in the background (then warm a replacement unless rewarm=False)."""
+        with self._cond:
+            self._live -= 1
+            self._recycled += 1
+            self._cond.notify()
+        try:
+            # Copy the caller's context so background calls keep its scheduler priority
+            self._bg.submit(contextvars.copy_context().run, self._end_session, s)
+        except RuntimeError:  # executor already shut down
+            self._end_session(s)
+            return
+        if rewarm:
+            self.warm()
+
+    def _warm_one(self):
+        try:
+            s = self._open_session()
+        except Exception:
+            with self._cond:
+                self._live -= 1
+                self._cond.notify()
+            return
+        with self._cond:
+            if self._closed:
+                self._live -= 1
+                closing = True
+            else:
+                self._idle.append(s)
+                self._cond.notify()
+                closing = False
+        if closing:
+            self._end_session(s)
+
+    def warm(self, n: Optional[int] = None):
+        """Open sessions in the background until `n` (default: pool size) are live."""
+        target = self.size if n is None else min(n, self.size)
+        with self._cond:
+            if self._closed:
+                return
+            missing = max(0, target - self._live)
+            self._live += missing
+        for i in range(missing):
+            try:
+                self._bg.submit(contextvars.copy_context().run, self._warm_one)
+            except RuntimeError:  # closed concurrently
+                with self._cond:
+                    self._live -= missing - i
+                return
+
+    # --- Checkout / checkin ---
+    def _take_idle(self, key: Hashable) -> Optional[PooledSession]:
+        """Conversation `key`'s idle session, else a fresh one (caller holds _cond)."""
+        fresh = None
+        for s in list(self._idle):
+            if self._expired(s):
+                self._idle.remove(s)
+                self._teardown(s)  # Condition wraps an RLock, re-entry is fine
+            elif s.owner == key:
+                self._idle.remove(s)
+                return s
+            elif s.owner is None and fresh is None:
+                fresh = s
+        if fresh is not None:
+            self._idle.remove(fresh)
+        return fresh
+
+    def checkout(self, timeout: Optional[float] = None, key: Optional[Hashable] = None) -> PooledSession:
+        """
+        Take conversation `key`'s idle session (default: resolve_conversation_key()), a fresh
+        idle one, or open one; waits up to `timeout` (default checkout_timeout) for a free slot.
+        """
+        key = resolve_conversation_key(key)
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.monotonic()
+        waited = False
+        with self._cond:
+            prewarm, self._prewarm_pending = self._prewarm_pending, False
+            while True:
+                if self._closed:
+                    raise RuntimeError("AgentSessionPool is closed")
+                s = self._take_idle(key)
+                if s is not None:
+                    s.owner = key
+                    self._hits += 1
+                    self._record_wait(waited, start)
+                    return s
+                if self._live >= self.size and self._idle:
+                    # Full, and every idle session belongs to another conversation: recycle the
+                    # least recently used one and open a fresh session in its slot
+                    self._teardown(self._idle.popleft(), rewarm=False)
+                if self._live < self.size:
+                    self._live += 1
+                    self._misses += 1
+                    self._record_wait(waited, start)
+                    break
+                remaining = timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    raise TimeoutError("Timed out waiting for a Salesforce Agent session")
+                waited = True
+                self._cond.wait(remaining)
+        if prewarm:
+            self.warm()  # first use: fill the other slots in the background
+        # Open outside the lock (miss path)
+        try:
+            s = self._open_session()
+        except Exception:
+            with self._cond:
+                self._live -= 1
+                self._cond.notify()
+            raise
+        s.owner = key
+        return s
+
+    def _record_wait(self, waited: bool, start: float):
+        if waited:
+            self._waits += 1
+            self._wait_time += time.monotonic() - start
+
+    def checkin(self, s: PooledSession, discard: bool = False):
+        if discard or self._closed or self._expired(s):
+            self._teardown(s)
+            return
+        if not s.messages_sent:
+            s.owner = None  # never used (e.g. an unadopted prefetch): no context to keep apart
+        with self._cond:
+            self._idle.append(s)
+            self._cond.notify()
+
+    def send_message(self, text: str, session: Optional[PooledSession] = None) -> dict:
+        """
+        Send one message on `session` (default: a checked-out one) and check it back
+        in. On a 401 the cached token is dropped and the message is retried once with a
+        fresh token on a fresh session, like SalesforceAgentLLM._refresh_and_reopen.
+        """
+        for attempt in (1, 2):
+            s = session if session is not None else self.checkout()
+            session = None
+            token = self.api.get_access_token()
+            ok = False
+            try:
+                payload = self.api.send_message_sync(token, s.session_id, text, sequence_id=s.next_sequence_id())
+                ok = True
+                return payload
+            except AuthError:
+                self.api.invalidate_token(token)
+                if attempt == 2:
+                    raise
+            finally:
+                self.checkin(s, discard=not ok)
+
+    def end_conversation(self, key: Hashable) -> int:
+        """
+        Recycle conversation `key`'s idle sessions now (fresh ones are warmed in their place);
+        returns how many. Sessions still checked out are recycled once another conversation needs the slot.
+        """
+        with self._cond:
+            mine = [s for s in self._idle if s.owner == key]
+            for s in mine:
+                self._idle.remove(s)
+                self._teardown(s)
+        return len(mine)
+
+    async def asend_message(self, aapi, text: str, key: Optional[Hashable] = None) -> dict:
+        """
+        asyncio twin of send_message() over an AsyncSalesforceAgentAPI: same pooled sessions,
+        same single 401 retry. Checkout (which may open a session) runs on a worker thread.
+        """
+        key = resolve_conversation_key(key)
+        for attempt in (1, 2):
+            s = await asyncio.to_thread(self.checkout, None, key)
+            token = await aapi.get_access_token()
+            ok = False
+            try:
+                payload = await aapi.send_message_sync(token, s.session_id, text, sequence_id=s.next_sequence_id())
+                ok = True
+                return payload
+            except AuthError:
+                aapi.invalidate_token(token)
+                if attempt == 2:
+                    raise
+            finally:
+                self.checkin(s, discard=not ok)
+
+    @contextmanager
+    def session(self):
+        """Check out a session; a failed call discards it instead of returning it to the pool."""
+        s = self.checkout()
+        ok = False
+        try:
+            yield s
+            ok = True
+        finally:
+            self.checkin(s, discard=not ok)
+
+    # --- Introspection / shutdown ---
+    def stats(self) -> dict:
+        with self._cond:
+            checkouts = self._hits + self._misses
+            return {
+                "size": self.size,
+                "live": self._live,
+                "idle": len(self._idle),
+                "in_use": self._live - len(self._idle),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits / checkouts) if checkouts else 0.0,
+                "waits": self._waits,
+                "wait_time_total": self._wait_time,
+                "wait_time_avg": (self._wait_time / self._waits) if self._waits else 0.0,
+                "opened": self._opened,
+                "recycled": self._recycled,
+            }
+
+    def close(self):
+        """Stop warming and end every idle session (checked-out ones end on checkin)."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._live -= len(idle)
+            self._cond.notify_all()
+        self._bg.shutdown(wait=True)
+        for s in idle:
+            self._end_session(s)
@@ -0,0 +1,161 @@
+# salesforce_token_cache.py
+import os
+import time
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+# Salesforce client-credentials responses carry no "expires_in", so the lifetime
+# is whatever the org's session timeout is. Stay well under the 2h default.
+DEFAULT_TOKEN_TTL = 1800.0
+DEFAULT_REFRESH_MARGIN = 120.0
+
+TokenKey = Tuple[str, str]
+# A fetcher returns (access_token, ttl_seconds or None)
+TokenFetcher = Callable[[], Tuple[str, Optional[float]]]
+
+
+class _Entry:
+    __slots__ = ("token", "expires_at", "fetch", "lock", "timer")
+
+    def __init__(self):
+        self.token: Optional[str] = None
+        self.expires_at: float = 0.0
+        self.fetch: Optional[TokenFetcher] = None
+        self.lock = threading.Lock()  # serializes refreshes (single-flight)
+        self.timer: Optional[threading.Timer] = None
+
+
+class TokenCache:
+    """
+    Process-wide OAuth token cache keyed by (domain, client_id).
+    Tokens are refreshed in the background shortly before they expire, and only
+    one refresh per key runs at a time; concurrent callers wait for its result.
+    """
+
+    def __init__(
+        self,
+        default_ttl: float = DEFAULT_TOKEN_TTL,
+        refresh_margin: float = DEFAULT_REFRESH_MARGIN,
+        background_refresh: bool = True,
+    ):
+        self.default_ttl = float(default_ttl)
+        self.refresh_margin = float(refresh_margin)
+        self.background_refresh = background_refresh
+        self._entries: Dict[TokenKey, _Entry] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _entry(self, key: TokenKey) -> _Entry:
+        with self._lock:
+            e = self._entries.get(key)
+            if e is None:
+                e = self._entries[key] = _Entry()
+            return e
+
+    @staticmethod
+    def _valid(e: _Entry) -> Optional[str]:
+        if e.token and time.monotonic() < e.expires_at:
+            return e.token
+        return None
+
+    # --- Public API ---
+    def get(self, key: TokenKey, fetch: TokenFetcher) -> str:
+        """Return a valid token for key, fetching it (once) if missing or expired."""
+        e = self._entry(key)
+        e.fetch = fetch
+        tok = self._valid(e)
+        if tok:
+            return tok
+        with e.lock:
+            # Another thread may have refreshed while we waited
+            tok = self._valid(e)
+            if tok:
+                return tok
+            return self._refresh_locked(key, e)
+
+    def invalidate(self, key: TokenKey, token: Optional[str] = None):
+        """
+        Drop the cached token. If `token` is given, only drop it when it is still
+        the current one, so N callers reporting the same stale token cause one refresh.
+        """
+        e = self._entry(key)
+        with e.lock:
+            if token is None or e.token == token:
+                e.token = None
+                e.expires_at = 0.0
+
+    def peek(self, key: TokenKey) -> Optional[str]:
+        """Return the cached token if still valid, without fetching."""
+        with self._lock:
+            e = self._entries.get(key)
+        return self._valid(e) if e else None
+
+    def put(self, key: TokenKey, token: str, ttl: Optional[float] = None):
+        """Store a token fetched elsewhere (e.g. by the async client)."""
+        e = self._entry(key)
+        with e.lock:
+            self._store_locked(key, e, token, ttl)
+
+    def clear(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for e in entries:
+            if e.timer:
+                e.timer.cancel()
+
+    def close(self):
+        self._closed = True
+        self.clear()
+
+    # --- Internals ---
+    def _refresh_locked(self, key: TokenKey, e: _Entry) -> str:
+        token, ttl = e.fetch()
+        self._store_locked(key, e, token, ttl)
+        return token
+
+    def _store_locked(self, key: TokenKey, e: _Entry, token: str, ttl: Optional[float]):
+        ttl = float(ttl) if ttl else self.default_ttl
+        e.token = token
+        e.expires_at = time.monotonic() + ttl
+        self._schedule(key, e, ttl)
+
+    def _schedule(self, key: TokenKey, e: _Entry, ttl: float):
+        if e.timer:
+            e.timer.cancel()
+            e.timer = None
+        if not self.background_refresh or self._closed or e.fetch is None:
+            return
+        delay = max(ttl - self.refresh_margin, ttl / 2)
+        e.timer = threading.Timer(delay, self._background_refresh, args=(key, e))
+        e.timer.daemon = True
+        e.timer.start()
+
+    def _background_refresh(self, key: TokenKey, e: _Entry):
+        # If someone else is already refreshing, let them finish it.
+        if self._closed or not e.lock.acquire(blocking=False):
+            return
+        try:
+            self._refresh_locked(key, e)
+        except Exception:
+            # Keep serving the current token until it actually expires; the next
+            # get() after expiry retries synchronously.
+            pass
+        finally:
+            e.lock.release()
+
+
+_shared_cache: Optional[TokenCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_token_cache() -> TokenCache:
+    """Return the process-wide TokenCache (configured from SF_TOKEN_TTL / SF_TOKEN_REFRESH_MARGIN)."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = TokenCache(
+                default_ttl=float(os.getenv("SF_TOKEN_TTL", DEFAULT_TOKEN_TTL)),
+                refresh_margin=float(os.getenv("SF_TOKEN_REFRESH_MARGIN", DEFAULT_REFRESH_MARGIN)),
+            )
+        return _shared_cache
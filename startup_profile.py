@@ -0,0 +1,45 @@
+# startup_profile.py
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+# Reference point: as close to interpreter start as a stdlib-only import gets
+T0 = time.perf_counter()
+
+_phases: List[Tuple[int, str, float, float]] = []  # (depth, name, start offset, seconds)
+_lock = threading.Lock()
+_local = threading.local()
+
+
+@contextmanager
+def phase(name: str):
+    """Time one startup step (imports, building LLMs/agents/crews, ...). Nested phases are indented."""
+    depth = getattr(_local, "depth", 0)
+    _local.depth = depth + 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        _local.depth = depth
+        with _lock:
+            _phases.append((depth, name, start - T0, end - start))
+
+
+def phases() -> List[dict]:
+    with _lock:
+        ordered = sorted(_phases, key=lambda p: (p[2], p[0]))
+    return [{"phase": n, "depth": d, "start_ms": s * 1000, "ms": dur * 1000} for d, n, s, dur in ordered]
+
+
+def report(title: str = "startup") -> str:
+    rows = phases()
+    total = (time.perf_counter() - T0) * 1000
+    width = max([len(r["phase"]) + 2 * r["depth"] for r in rows] + [len(title)])
+    lines = [f"{title:<{width}}  {'ms':>9}  {'at':>9}"]
+    for r in rows:
+        label = "  " * r["depth"] + r["phase"]
+        lines.append(f"{label:<{width}}  {r['ms']:>9.1f}  {r['start_ms']:>9.1f}")
+    lines.append(f"{'total':<{width}}  {total:>9.1f}")
+    return "\n".join(lines)
@@ -0,0 +1,83 @@
+# tests/mock_org.py
+"""
+Shared fixtures: an in-process mock_agent_server and SalesforceAgentAPI clients
+pointed at it, each with its own token cache and org guard so tests never share
+process-wide state.
+
+    python -m unittest discover -s tests
+"""
+import os
+import sys
+import unittest
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_agent_server import MockAgentServer, MockConfig  # noqa: E402
+from salesforce_agent_API import SalesforceAgentAPI  # noqa: E402
+from salesforce_http import HttpTransport  # noqa: E402
+from salesforce_resilience import DEFAULT_RETRY_POLICIES, CircuitBreaker, OrgGuard, RetryPolicy  # noqa: E402
+from salesforce_token_cache import TokenCache  # noqa: E402
+
+
+def fast_policies(**overrides: RetryPolicy) -> Dict[str, RetryPolicy]:
+    """DEFAULT_RETRY_POLICIES with millisecond backoff, so retry tests run quickly."""
+    out = {
+        name: RetryPolicy(max_attempts=p.max_attempts, base_delay=0.001, max_delay=0.01, max_retry_after=0.05,
+                          retry_on=p.retry_on, retry_connection_errors=p.retry_connection_errors)
+        for name, p in DEFAULT_RETRY_POLICIES.items()
+    }
+    out.update(overrides)
+    return out
+
+
+class RecordingTransport:
+    """Wraps the real transport and keeps the JSON body of every request sent."""
+
+    def __init__(self, inner: Optional[HttpTransport] = None):
+        self.inner = inner or HttpTransport()
+        self.sent: List[tuple] = []
+
+    def request(self, method: str, url: str, **kwargs):
+        self.sent.append((method, url, kwargs.get("json")))
+        return self.inner.request(method, url, **kwargs)
+
+    def stream(self, method: str, url: str, **kwargs):
+        self.sent.append((method, url, kwargs.get("json")))
+        return self.inner.stream(method, url, **kwargs)
+
+    def message_texts(self) -> List[str]:
+        """Text of every message sent, sync or streaming, in order."""
+        return [body["message"]["text"] for _, url, body in self.sent if "/messages" in url and body]
+
+    def close(self):
+        self.inner.close()
+
+
+class MockOrgTestCase(unittest.TestCase):
+    """Starts a fresh mock org per test; self.api() builds isolated clients against it."""
+
+    mock_config: Dict[str, float] = {}  # MockConfig kwargs; each test gets its own (tests mutate it)
+
+    def setUp(self):
+        self.server = MockAgentServer(config=MockConfig(**self.mock_config)).start()
+        self.addCleanup(self.server.stop)
+
+    def api(self, guard: Optional[OrgGuard] = None, breaker: Optional[CircuitBreaker] = None,
+            transport=None, retry_policies: Optional[Dict[str, RetryPolicy]] = None) -> SalesforceAgentAPI:
+        cache = TokenCache(background_refresh=False)
+        self.addCleanup(cache.close)
+        return SalesforceAgentAPI(
+            my_domain=self.server.url, sf_api_host=self.server.url, client_id="test-client",
+            client_secret="test-secret", agent_id="test-agent", token_cache=cache, transport=transport,
+            retry_policies=retry_policies or fast_policies(),
+            guard=guard or OrgGuard(None, breaker),
+        )
+
+    def requests_to(self, endpoint: str) -> int:
+        return self.server.stats()["requests"][endpoint]
+
+    def revoke_tokens(self):
+        """Simulate the org revoking every issued token (e.g. an admin reset)."""
+        with self.server.state.lock:
+            self.server.state.tokens.clear()
@@ -0,0 +1,143 @@
+# tests/test_answer_cache.py
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from mock_org import MockOrgTestCase
+
+from salesforce_answer_cache import AnswerCache
+from salesforce_llm_adapter import NO_CONTENT, SalesforceAgentLLM
+
+
+class AnswerCacheTest(unittest.TestCase):
+    def cache(self, **kwargs) -> AnswerCache:
+        cache = AnswerCache(**kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_key_ignores_case_whitespace_and_trailing_punctuation(self):
+        self.assertEqual(AnswerCache.make_key("a", "What time is  check-in?"),
+                         AnswerCache.make_key("a", "what time is check-in"))
+        self.assertNotEqual(AnswerCache.make_key("a", "check-in"), AnswerCache.make_key("b", "check-in"))
+
+    def test_entries_expire_after_ttl(self):
+        cache = self.cache(ttl=0.05)
+        cache.put("k", "v")
+        self.assertEqual(cache.get("k"), "v")
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("k"))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = self.cache(max_entries=2)
+        cache.put("a", "1")
+        cache.put("b", "2")
+        cache.get("a")
+        cache.put("c", "3")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "1")
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_byte_budget_evicts(self):
+        cache = self.cache(max_bytes=10)
+        cache.put("a", "12345")
+        cache.put("b", "123456")
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["bytes"], 6)
+
+    def test_concurrent_identical_requests_are_coalesced(self):
+        cache = self.cache()
+        calls, gate = [], threading.Event()
+
+        def compute():
+            calls.append(1)
+            gate.wait(1.0)
+            return "answer"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+                   for _ in range(6)]
+        for t in threads:
+            t.start()
+        time.sleep(0.05)
+        gate.set()
+        for t in threads:
+            t.join(2.0)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["answer"] * 6)
+        stats = cache.stats()
+        self.assertEqual((stats["misses"], stats["coalesced"]), (1, 5))
+
+    def test_failure_is_not_cached(self):
+        cache = self.cache()
+
+        def boom():
+            raise RuntimeError("upstream down")
+
+        with self.assertRaises(RuntimeError):
+            cache.get_or_compute("k", boom)
+        self.assertEqual(cache.get_or_compute("k", lambda: "ok"), "ok")
+
+    def test_uncacheable_answer_is_returned_but_not_stored(self):
+        cache = self.cache()
+        self.assertEqual(cache.get_or_compute("k", lambda: NO_CONTENT, cacheable=lambda v: v != NO_CONTENT),
+                         NO_CONTENT)
+        self.assertIsNone(cache.get("k"))
+
+
+class DiskStoreTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+
+    def reopen(self, **kwargs) -> AnswerCache:
+        cache = AnswerCache(path=self.path, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_answers_survive_a_restart(self):
+        self.reopen().put("k", "v")
+        cache = self.reopen()
+        self.assertEqual(cache.get("k"), "v")
+        self.assertEqual(cache.stats()["disk_hits"], 1)
+
+    def test_disk_is_trimmed_least_recently_used(self):
+        cache = self.reopen(max_entries=2)
+        cache.put("a", "1")
+        time.sleep(0.01)
+        cache.put("b", "2")
+        time.sleep(0.01)
+        self.assertEqual(self.reopen(max_entries=2).get("a"), "1")  # a disk read refreshes "a"
+        time.sleep(0.01)
+        cache.put("c", "3")
+        fresh = self.reopen(max_entries=2)
+        self.assertEqual(fresh.get("a"), "1")
+        self.assertIsNone(fresh.get("b"))
+
+
+class PlaceholderNotCachedTest(MockOrgTestCase):
+    def test_reply_without_answer_text_is_not_cached(self):
+        llm = SalesforceAgentLLM(api=self.api(), cache=AnswerCache())
+        self.addCleanup(llm.close)
+        empty = {"messages": []}
+        with mock.patch.object(llm.api, "send_message_sync", return_value=empty):
+            self.assertEqual(llm.call(prompt="Pool hours?"), json.dumps(empty))
+        answer = llm.call(prompt="Pool hours?")
+        self.assertNotIn("messages", answer)
+        self.assertEqual(llm.call(prompt="Pool hours?"), answer)
+        self.assertEqual(llm.cache.stats()["misses"], 2)
+
+    def test_empty_stream_placeholder_is_not_cached(self):
+        llm = SalesforceAgentLLM(api=self.api(), cache=AnswerCache())
+        self.addCleanup(llm.close)
+        with mock.patch.object(llm.api, "send_message_stream", return_value=iter(())):
+            self.assertEqual(llm.call(prompt="Pool hours?", stream=True), NO_CONTENT)
+        self.assertNotEqual(llm.call(prompt="Pool hours?", stream=True), NO_CONTENT)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+# tests/test_async_paths.py
+import asyncio
+import gc
+import threading
+import unittest
+
+from mock_org import MockOrgTestCase
+
+from salesforce_agent_async import AsyncSalesforceAgentAPI
+from salesforce_answer_cache import AnswerCache
+from salesforce_llm_adapter import SalesforceAgentLLM
+from salesforce_session_pool import AgentSessionPool
+
+
+class AsyncClientPerLoopTest(MockOrgTestCase):
+    def test_each_asyncio_run_gets_its_own_client_and_old_ones_are_dropped(self):
+        aapi = AsyncSalesforceAgentAPI(api=self.api())
+        clients = []
+
+        async def once():
+            await aapi.get_access_token()
+            clients.append(aapi._http())
+
+        for _ in range(3):
+            asyncio.run(once())
+        gc.collect()
+        self.assertEqual(len(set(map(id, clients))), 3)
+        self.assertLessEqual(len(aapi._per_loop), 1)
+
+    def test_aclose_closes_this_loops_client(self):
+        aapi = AsyncSalesforceAgentAPI(api=self.api())
+
+        async def run():
+            await aapi.get_access_token()
+            client = aapi._http()
+            await aapi.aclose()
+            return client
+
+        self.assertTrue(asyncio.run(run()).is_closed)
+        self.assertEqual(len(aapi._per_loop), 0)
+
+
+class AsyncCoalescingTest(unittest.TestCase):
+    def cache(self) -> AnswerCache:
+        cache = AnswerCache()
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_concurrent_tasks_share_one_compute(self):
+        cache = self.cache()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        async def run():
+            return await asyncio.gather(*(cache.aget_or_compute("k", compute) for _ in range(6)))
+
+        self.assertEqual(asyncio.run(run()), ["answer"] * 6)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()["coalesced"], 5)
+
+    def test_async_waiter_joins_a_sync_leader(self):
+        cache = self.cache()
+        started, gate = threading.Event(), threading.Event()
+
+        def compute():
+            started.set()
+            gate.wait(1.0)
+            return "answer"
+
+        leader = threading.Thread(target=cache.get_or_compute, args=("k", compute))
+        leader.start()
+        started.wait(1.0)
+
+        async def run():
+            waiter = asyncio.ensure_future(cache.aget_or_compute("k", self.fail))
+            await asyncio.sleep(0.02)
+            gate.set()
+            return await waiter
+
+        self.assertEqual(asyncio.run(run()), "answer")
+        leader.join(1.0)
+        self.assertEqual(cache.stats()["coalesced"], 1)
+
+
+class AsyncPooledSendTest(MockOrgTestCase):
+    mock_config = {"latency": {"messages": "fixed:0.05"}}
+
+    def test_async_sends_reuse_the_conversations_pooled_session(self):
+        api = self.api()
+        pool = AgentSessionPool(api, size=1, prewarm=False)
+        self.addCleanup(pool.close)
+        aapi = AsyncSalesforceAgentAPI(api=api)
+
+        async def run():
+            try:
+                for text in ("hi", "late checkout?", "thanks"):
+                    await pool.asend_message(aapi, text, key="guest-a")
+            finally:
+                await aapi.aclose()
+
+        asyncio.run(run())
+        stats = self.server.stats()
+        self.assertEqual(stats["sessions_opened"], 1)
+        self.assertEqual(stats["requests"]["messages"], 3)
+
+    def test_concurrent_identical_acalls_make_one_upstream_call(self):
+        llm = SalesforceAgentLLM(api=self.api(), cache=AnswerCache())
+        self.addCleanup(llm.close)
+
+        async def run():
+            try:
+                return await asyncio.gather(*(llm.acall(prompt="Pool hours?", conversation_id=f"guest-{i}")
+                                              for i in range(4)))
+            finally:
+                await llm.aclose()
+
+        answers = asyncio.run(run())
+        self.assertEqual(len(set(answers)), 1)
+        self.assertEqual(self.requests_to("messages"), 1)
+        self.assertEqual(llm.cache.stats()["coalesced"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
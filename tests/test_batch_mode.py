@@ -0,0 +1,97 @@
+# tests/test_batch_mode.py
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import mock_org  # noqa: F401  (puts the repo root on sys.path)
+
+import crew_salesforce_tool_app as app
+from salesforce_scheduler import BATCH, current_priority
+
+
+class IterKickoffManyTest(unittest.TestCase):
+    def setUp(self):
+        self.in_flight = self.peak = 0
+        self.lock = threading.Lock()
+        self.priorities = []
+
+    def fake_kickoff(self, message: str):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            self.priorities.append(current_priority())
+        try:
+            if message == "boom":
+                raise ValueError("planner failed")
+            time.sleep(float(message))
+            return f"done {message}"
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def run_batch(self, messages, max_workers=3):
+        with mock.patch.object(app, "kickoff", self.fake_kickoff):
+            return list(app.iter_kickoff_many(messages, max_workers=max_workers))
+
+    def test_results_come_back_in_input_order(self):
+        delays = ["0.08", "0.01", "0.05", "0.0", "0.03", "0.02"]
+        results = self.run_batch(delays)
+        self.assertEqual([r["index"] for r in results], list(range(len(delays))))
+        self.assertEqual([r["result"] for r in results], [f"done {d}" for d in delays])
+
+    def test_workers_are_bounded_and_run_at_batch_priority(self):
+        self.run_batch(["0.02"] * 9, max_workers=3)
+        self.assertEqual(self.peak, 3)
+        self.assertEqual(set(self.priorities), {BATCH})
+
+    def test_a_failing_message_does_not_stop_the_batch(self):
+        results = self.run_batch(["0.0", "boom", "0.0"])
+        self.assertEqual([r["ok"] for r in results], [True, False, True])
+        self.assertEqual(results[1]["error"], "ValueError: planner failed")
+
+    def test_input_is_read_ahead_lazily(self):
+        read = []
+
+        def messages():
+            for i in range(50):
+                read.append(i)
+                yield "0.0"
+
+        with mock.patch.object(app, "kickoff", self.fake_kickoff):
+            first = next(app.iter_kickoff_many(messages(), max_workers=2))
+        self.assertEqual(first["index"], 0)
+        self.assertLessEqual(len(read), 4)
+
+
+class ReadJsonlMessagesTest(unittest.TestCase):
+    def write(self, lines):
+        fd, path = tempfile.mkstemp(suffix=".jsonl")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_malformed_lines_are_reported_in_place(self):
+        path = self.write([
+            json.dumps({"message": "0.0"}),
+            "{not json",
+            "",
+            json.dumps("0.0"),
+            json.dumps({"message": 42}),
+            json.dumps({"text": "no message key"}),
+        ])
+        with mock.patch.object(app, "kickoff", lambda m: "ok"):
+            results = list(app.iter_kickoff_many(app.read_jsonl_messages(path), max_workers=2))
+
+        self.assertEqual([r["ok"] for r in results], [True, False, True, False, False])
+        self.assertEqual([r.get("line") for r in results], [None, 2, None, 5, 6])
+        self.assertTrue(results[1]["error"].startswith("line 2: JSONDecodeError"))
+        self.assertIn("must be a string", results[3]["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
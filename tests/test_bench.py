@@ -0,0 +1,89 @@
+# tests/test_bench.py
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from mock_org import MockOrgTestCase
+
+import bench_salesforce as bench
+from mock_agent_server import ENDPOINTS, FAQ_ANSWERS, SHAPES, _parse_latency_args, parse_latency
+from salesforce_errors import AuthError
+from salesforce_llm_adapter import SalesforceAgentLLM
+
+
+class StatsTest(unittest.TestCase):
+    def test_nearest_rank_percentiles(self):
+        values = [i / 100 for i in range(1, 101)]
+        self.assertEqual(bench.percentile(values, 50), 0.50)
+        self.assertEqual(bench.percentile(values, 99), 0.99)
+        self.assertEqual(bench.percentile([0.3], 95), 0.3)
+        self.assertEqual(bench.percentile([], 50), 0.0)
+
+    def test_summary_of_no_samples_is_zero(self):
+        self.assertEqual(set(bench.latency_summary([]).values()), {0.0})
+
+    def test_run_load_counts_errors_separately(self):
+        def fn(i):
+            if i % 3 == 0:
+                raise ValueError("nope")
+
+        latencies, errors, wall = bench.run_load(fn, 9, 3)
+        self.assertEqual((len(latencies), len(errors)), (6, 3))
+        self.assertEqual(errors[0], "ValueError: nope")
+
+
+class LatencyModelTest(unittest.TestCase):
+    def test_distributions(self):
+        self.assertEqual(parse_latency("fixed:0.25")(), 0.25)
+        self.assertTrue(0.1 <= parse_latency("uniform:0.1,0.2")() <= 0.2)
+        self.assertGreaterEqual(parse_latency("normal:0,1")(), 0.0)
+        with self.assertRaises(ValueError):
+            parse_latency("pareto:1")
+
+    def test_all_then_per_endpoint_override(self):
+        spec = _parse_latency_args(["all=fixed:0.1", "messages=fixed:0.5"])
+        self.assertEqual(set(spec), set(ENDPOINTS))
+        self.assertEqual(spec["messages"], "fixed:0.5")
+        self.assertEqual(spec["token"], "fixed:0.1")
+
+
+class MockServerTest(MockOrgTestCase):
+    def test_every_reply_shape_is_understood_by_the_llm_bridge(self):
+        for shape in SHAPES:
+            with self.subTest(shape=shape):
+                self.server.state.config.shape = shape
+                llm = SalesforceAgentLLM(api=self.api())
+                self.addCleanup(llm.close)
+                self.assertIn(llm.call(prompt="Pool hours?"), FAQ_ANSWERS)
+
+    def test_expired_tokens_are_rejected(self):
+        self.server.state.config.token_ttl = -1
+        api = self.api()
+        with self.assertRaises(AuthError):
+            api.start_session(api.get_access_token())
+
+
+class BenchMainTest(unittest.TestCase):
+    def test_llm_bench_runs_offline_and_writes_json(self):
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        with mock.patch.dict(os.environ), contextlib.redirect_stdout(io.StringIO()) as out:
+            rc = bench.main(["--bench", "llm", "--iterations", "10", "--concurrency", "2", "--warmup", "0",
+                             "--latency", "all=fixed:0", "--json", path])
+        self.assertEqual(rc, 0)
+        self.assertIn("llm.call", out.getvalue())
+        with open(path, encoding="utf-8") as f:
+            result = json.load(f)["results"][0]
+        self.assertEqual(result["errors"], 0)
+        self.assertEqual(result["requests_by_endpoint"]["messages"], 10)
+        # Two adapters, one Agent session each, reused across their turns
+        self.assertEqual(result["sessions_opened"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
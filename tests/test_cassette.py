@@ -0,0 +1,117 @@
+# tests/test_cassette.py
+import os
+import sqlite3
+import tempfile
+import unittest
+import zlib
+
+from mock_org import MockOrgTestCase
+
+from salesforce_cassette import Cassette, CassetteMiss, CassetteTransport, http_fingerprint
+from salesforce_http import HttpTransport
+
+
+class CassetteTest(MockOrgTestCase):
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "run.db")
+
+    def cassette(self, mode: str) -> Cassette:
+        cassette = Cassette(self.path, mode=mode)
+        self.addCleanup(cassette.close)
+        return cassette
+
+    def client(self, cassette: Cassette):
+        transport = CassetteTransport(HttpTransport(http2=False), cassette)
+        self.addCleanup(transport.close)
+        return self.api(transport=transport)
+
+    def conversation(self, api):
+        token = api.get_access_token()
+        sid = api.start_session(token)
+        answers = [api.send_message_sync(token, sid, "What time is check-in?", sequence_id=1),
+                   "".join(api.send_message_stream(token, sid, "And parking?", sequence_id=2))]
+        api.end_session(token, sid)
+        return token, answers
+
+    def test_replay_serves_the_recording_without_the_network(self):
+        token, recorded = self.conversation(self.client(self.cassette("record")))
+        sent = sum(self.server.stats()["requests"].values())
+
+        replay = self.cassette("replay")
+        _, replayed = self.conversation(self.client(replay))
+        self.assertEqual(replayed, recorded)
+        self.assertEqual(sum(self.server.stats()["requests"].values()), sent)
+        stats = replay.stats()
+        self.assertEqual((stats["hits"], stats["loose_hits"], stats["misses"]), (5, 0, 0))
+
+    def test_loose_match_ignores_host_and_session_id(self):
+        self.conversation(self.client(self.cassette("record")))
+        replay = self.cassette("replay")
+        body = {"message": {"sequenceId": 1, "type": "Text", "text": "What time is check-in?"}, "variables": []}
+        hit = replay.replay_http("POST", "https://elsewhere.example/einstein/ai-agent/v1/sessions/other-id/messages",
+                                 {"json": body, "headers": {"Accept": "application/json"}})
+        self.assertIsNotNone(hit)
+        self.assertEqual(replay.stats()["loose_hits"], 1)
+
+    def test_replay_miss_raises(self):
+        self.conversation(self.client(self.cassette("record")))
+        api = self.client(self.cassette("replay"))
+        token = api.get_access_token()
+        with self.assertRaises(CassetteMiss):
+            api.send_message_sync(token, "sid", "never recorded", sequence_id=7)
+
+    def test_auto_records_misses_and_replays_hits(self):
+        first = self.cassette("auto")
+        self.conversation(self.client(first))
+        self.assertEqual((first.stats()["recorded"], first.stats()["hits"]), (5, 0))
+        second = self.cassette("auto")
+        self.conversation(self.client(second))
+        self.assertEqual((second.stats()["recorded"], second.stats()["hits"]), (0, 5))
+        self.assertEqual(self.requests_to("messages"), 1)
+
+    def test_secrets_are_never_written(self):
+        token, _ = self.conversation(self.client(self.cassette("record")))
+        db = sqlite3.connect(self.path)
+        self.addCleanup(db.close)
+        stored = b""
+        for request, headers, body, chunks in db.execute("SELECT request, headers, body, chunks FROM interactions"):
+            stored += zlib.decompress(request) + headers.encode() + zlib.decompress(body)
+            stored += zlib.decompress(chunks) if chunks else b""
+        for secret in (b"test-secret", b"test-client", token.encode(), b"uthorization"):
+            self.assertNotIn(secret, stored)
+        self.assertIn(b"cassette-token", stored)
+
+    def test_fingerprint_ignores_volatile_fields(self):
+        a = http_fingerprint("POST", "http://a:1/x/agents/1/sessions",
+                             {"json": {"externalSessionKey": "k1", "instanceConfig": {"endpoint": "http://a"}}})
+        b = http_fingerprint("POST", "https://b/x/agents/1/sessions",
+                             {"json": {"externalSessionKey": "k2", "instanceConfig": {"endpoint": "https://b"}}})
+        self.assertEqual(a[:2], b[:2])
+
+
+class GenericCallTest(unittest.TestCase):
+    def test_llm_calls_replay_in_order(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "llm.db")
+            rec = Cassette(path, mode="record")
+            replies = iter(["first", "second"])
+            request = {"model": "llama", "messages": [{"role": "user", "content": "hi"}]}
+            self.assertEqual([rec.call("llm", request, lambda: next(replies)) for _ in range(2)],
+                             ["first", "second"])
+            rec.close()
+
+            replay = Cassette(path, mode="replay")
+            got = [replay.call("llm", request, self.fail) for _ in range(3)]
+            replay.close()
+            self.assertEqual(got, ["first", "second", "second"])  # the last one repeats once exhausted
+
+    def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            Cassette(":memory:", mode="rewind")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+# tests/test_cli.py
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+from mock_org import MockOrgTestCase
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("crewai", "requests", "salesforce_agent_API", "salesforce_llm_adapter")
+
+# Runs the CLI in a fresh interpreter and reports which heavy modules it ended up importing
+_PROBE = """
+import json, sys
+import crew_salesforce_cli as cli
+rc = cli.main(sys.argv[1:])
+print(json.dumps({"rc": rc, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY,)
+
+
+def run_cli(*argv, env=None):
+    proc = subprocess.run([sys.executable, "-c", _PROBE, *argv], cwd=ROOT, capture_output=True, text=True,
+                          timeout=60, env=dict(os.environ, **(env or {})))
+    lines = proc.stdout.strip().splitlines()
+    return json.loads(lines[-1]), lines[:-1], proc.stderr
+
+
+class LazyCliTest(unittest.TestCase):
+    def test_confident_label_only_route_imports_nothing_heavy(self):
+        probe, out, err = run_cli("--timings", "route", "--label-only",
+                                  "We're planning a beach wedding ceremony for 80 guests")
+        self.assertEqual(probe, {"rc": 0, "loaded": []})
+        self.assertEqual(out, ["wedding"])
+        self.assertIn("crew_salesforce_cli route", err)
+        self.assertIn("import app", err)
+
+    def test_route_needs_a_message_or_batch(self):
+        probe, _, err = run_cli("route")
+        self.assertEqual(probe["rc"], 2)
+        self.assertIn("a message or --batch is required", err)
+
+
+class AskCommandTest(MockOrgTestCase):
+    def test_ask_uses_one_session_and_ends_it(self):
+        env = {"SF_ORG_DOMAIN": self.server.url, "SF_API_HOST": self.server.url, "SF_CLIENT_ID": "cli",
+               "SF_CLIENT_SECRET": "cli", "SF_AGENT_ID": "cli", "SF_FAQ_INDEX": ""}
+        probe, out, _ = run_cli("ask", "What time is check-in?", env=env)
+        self.assertEqual(probe["rc"], 0)
+        self.assertNotIn("crewai", probe["loaded"])
+        self.assertTrue(out and out[0])
+        stats = self.server.stats()
+        self.assertEqual((stats["sessions_opened"], stats["requests"]["end_session"]), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+# tests/test_conversations.py
+import threading
+import time
+
+from mock_org import MockOrgTestCase
+
+from salesforce_conversations import conversation, resolve_conversation_key
+from salesforce_llm_adapter import SalesforceAgentLLM
+
+
+class ConversationManagerTest(MockOrgTestCase):
+    mock_config = {"latency": {"messages": "fixed:0.02"}}
+
+    def llm(self, **kwargs) -> SalesforceAgentLLM:
+        llm = SalesforceAgentLLM(api=self.api(), **kwargs)
+        self.addCleanup(llm.close)
+        return llm
+
+    def wait_for(self, predicate, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not predicate() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(predicate())
+
+    def test_each_conversation_keeps_its_own_session(self):
+        llm = self.llm()
+        for key in ("guest-a", "guest-b", "guest-a", "guest-b"):
+            llm.call(prompt="hi", conversation_id=key)
+        self.assertEqual(self.server.stats()["sessions_opened"], 2)
+        self.assertEqual(llm.session_stats()["open_sessions"], 2)
+
+    def test_conversation_block_and_thread_default_pick_the_key(self):
+        self.assertEqual(resolve_conversation_key("explicit"), "explicit")
+        with conversation("guest-a"):
+            self.assertEqual(resolve_conversation_key(), "guest-a")
+        self.assertEqual(resolve_conversation_key(), ("thread", threading.get_ident()))
+
+    def test_parallel_calls_on_one_conversation_are_serialized(self):
+        llm = self.llm()
+        errors = []
+
+        def turn():
+            try:
+                llm.call(prompt="hi", conversation_id="guest-a")
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=turn) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5.0)
+        self.assertEqual(errors, [])
+        stats = self.server.stats()
+        self.assertEqual((stats["sessions_opened"], stats["requests"]["messages"]), (1, 5))
+
+    def test_least_recently_used_conversation_is_ended_over_the_bound(self):
+        llm = self.llm(max_sessions=1)
+        llm.call(prompt="hi", conversation_id="guest-a")
+        llm.call(prompt="hi", conversation_id="guest-b")
+        self.wait_for(lambda: self.requests_to("end_session") == 1)
+        self.assertEqual(llm.session_stats()["evicted"], 1)
+
+    def test_idle_conversations_expire(self):
+        llm = self.llm()
+        llm.sessions.idle_timeout = 0.05
+        llm.call(prompt="hi", conversation_id="guest-a")
+        time.sleep(0.1)
+        llm.call(prompt="hi", conversation_id="guest-b")
+        self.wait_for(lambda: self.requests_to("end_session") == 1)
+        self.assertEqual(llm.session_stats()["expired"], 1)
+
+    def test_end_conversation(self):
+        llm = self.llm()
+        self.assertFalse(llm.end_conversation("nobody"))
+        llm.call(prompt="hi", conversation_id="guest-a")
+        self.assertTrue(llm.end_conversation("guest-a"))
+        self.assertEqual(self.requests_to("end_session"), 1)
+        self.assertEqual(llm.session_stats()["conversations"], 0)
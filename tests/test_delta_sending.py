@@ -0,0 +1,96 @@
+# tests/test_delta_sending.py
+import importlib.util
+import unittest
+
+from mock_org import MockOrgTestCase, RecordingTransport
+
+from salesforce_llm_adapter import SalesforceAgentLLM
+
+SYSTEM = {"role": "system", "content": "You are the Coral Cloud concierge."}
+
+
+def user(text):
+    return {"role": "user", "content": text}
+
+
+def assistant(text):
+    return {"role": "assistant", "content": text}
+
+
+class DeltaSendingTest(MockOrgTestCase):
+    def setUp(self):
+        super().setUp()
+        self.transport = RecordingTransport()
+        self.addCleanup(self.transport.close)
+        self.llm = SalesforceAgentLLM(api=self.api(transport=self.transport))
+        self.addCleanup(self.llm.close)
+
+    def test_follow_up_sends_only_new_messages(self):
+        history = [SYSTEM, user("When is the pool open?")]
+        reply = self.llm.call(messages=history, conversation_id="guest-1")
+        history += [assistant(reply), user("Is there a spa?")]
+        self.llm.call(messages=history, conversation_id="guest-1")
+
+        first, second = self.transport.message_texts()
+        self.assertIn("SYSTEM: You are the Coral Cloud concierge.", first)
+        self.assertIn("USER: When is the pool open?", first)
+        self.assertEqual(second, "USER: Is there a spa?")
+        self.assertEqual(self.server.stats()["sessions_opened"], 1)
+
+    def test_streamed_follow_up_sends_only_new_messages(self):
+        history = [SYSTEM, user("When is the pool open?")]
+        reply = self.llm.call(messages=history, conversation_id="guest-1", stream=True)
+        history += [assistant(reply), user("Is there a spa?")]
+        self.llm.call(messages=history, conversation_id="guest-1", stream=True)
+        self.assertEqual(self.transport.message_texts()[-1], "USER: Is there a spa?")
+
+    def test_edited_history_resends_from_the_divergence(self):
+        reply = self.llm.call(messages=[SYSTEM, user("Pool hours?")], conversation_id="guest-1")
+        self.llm.call(messages=[SYSTEM, user("Spa hours?"), assistant(reply), user("Thanks")],
+                      conversation_id="guest-1")
+        self.assertEqual(self.transport.message_texts()[-1], "USER: Spa hours?\n\nASSISTANT: " + reply + "\n\nUSER: Thanks")
+
+    def test_identical_re_ask_resends_the_last_turn(self):
+        history = [SYSTEM, user("Pool hours?")]
+        self.llm.call(messages=history, conversation_id="guest-1")
+        self.llm.call(messages=history, conversation_id="guest-1")
+        self.assertEqual(self.transport.message_texts()[-1], "USER: Pool hours?")
+
+    def test_conversations_do_not_share_history(self):
+        self.llm.call(messages=[SYSTEM, user("Pool hours?")], conversation_id="guest-1")
+        self.llm.call(messages=[SYSTEM, user("Pool hours?")], conversation_id="guest-2")
+        first, second = self.transport.message_texts()
+        self.assertEqual(first, second)
+        self.assertEqual(self.server.stats()["sessions_opened"], 2)
+
+    def test_reopened_session_replays_the_full_history(self):
+        history = [SYSTEM, user("Pool hours?")]
+        reply = self.llm.call(messages=history, conversation_id="guest-1")
+        self.revoke_tokens()
+        history += [assistant(reply), user("Is there a spa?")]
+        self.llm.call(messages=history, conversation_id="guest-1")
+
+        rejected, replayed = self.transport.message_texts()[-2:]
+        self.assertEqual(rejected, "USER: Is there a spa?")
+        self.assertIn("USER: Pool hours?", replayed)
+        self.assertTrue(replayed.endswith("USER: Is there a spa?"))
+        self.assertEqual(self.server.stats()["sessions_opened"], 2)
+
+
+@unittest.skipUnless(importlib.util.find_spec("crewai"), "crewai is not installed")
+class CrewLLMDeltaTest(MockOrgTestCase):
+    def test_positional_message_list_is_sent_as_a_delta(self):
+        from salesforce_crew_llm import SalesforceCrewLLM
+
+        transport = RecordingTransport()
+        self.addCleanup(transport.close)
+        llm = SalesforceCrewLLM(api=self.api(transport=transport))
+        self.addCleanup(llm.close)
+        history = [SYSTEM, user("Pool hours?")]
+        reply = llm.call(history, conversation_id="crew-1")
+        llm.call(history + [assistant(reply), user("Is there a spa?")], conversation_id="crew-1")
+        self.assertEqual(transport.message_texts()[-1], "USER: Is there a spa?")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+# tests/test_faq_index.py
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from mock_org import MockOrgTestCase
+
+import salesforce_faq_index as faq_index
+from salesforce_faq_index import FaqIndex, build_index
+from salesforce_llm_adapter import SalesforceAgentLLM
+
+FAQ = [
+    ("What time is check-in?", "Check-in is at 3 PM."),
+    ("What time is check-out?", "Check-out is at 11 AM."),
+    ("Is there a kids club?", "The Kids Club is open daily from 9 AM to 5 PM for ages 4-12."),
+    ("How much is parking?", "Self-parking is complimentary; valet is $25 per night."),
+    ("When is the spa open?", "The spa is open 8 AM to 8 PM."),
+]
+
+
+class FaqIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "faq.idx")
+
+    def open(self, **kwargs) -> FaqIndex:
+        index = FaqIndex(self.path, **kwargs)
+        self.addCleanup(index.close)
+        return index
+
+    def test_known_questions_are_answered_locally(self):
+        self.assertEqual(build_index(FAQ, self.path), len(FAQ))
+        index = self.open(threshold=0.7)
+        hit = index.lookup("what time is check-in")
+        self.assertEqual(hit.answer, "Check-in is at 3 PM.")
+        self.assertAlmostEqual(hit.confidence, 1.0, places=3)
+        self.assertEqual(index.lookup("How much does parking cost?").answer, FAQ[3][1])
+
+    def test_unrelated_or_long_prompts_fall_through(self):
+        build_index(FAQ, self.path)
+        index = self.open(threshold=0.7)
+        self.assertIsNone(index.lookup("Can you plan a beach wedding for 80 guests?"))
+        crew_prompt = ("You are the Coral Cloud vacation planner. Build a 3-night itinerary for a family of "
+                       "four with a historical tour, a seaside dinner and the kids club; mention check-in.")
+        self.assertIsNone(index.lookup(crew_prompt))
+        stats = index.stats()
+        self.assertEqual((stats["lookups"], stats["local"], stats["fall_through"]), (2, 0, 2))
+
+    def test_duplicates_merge_and_min_count_filters(self):
+        pairs = FAQ + [("what time is CHECK-IN", "Check-in is at 3 PM."),
+                       ("What time is check-in?", "Check-in starts at 4 PM."),
+                       ("What time is check-in!", "Check-in is at 3 PM.")]
+        self.assertEqual(build_index(pairs, self.path, min_count=2), 1)
+        match = self.open().search("What time is check-in?", k=1)[0]
+        self.assertEqual((match.answer, match.seen), ("Check-in is at 3 PM.", 4))
+
+    def test_rebuild_is_atomic_for_open_readers(self):
+        build_index(FAQ[:2], self.path)
+        old = self.open()
+        build_index([("Is there a kids club?", FAQ[2][1])], self.path)
+        self.assertEqual(old.lookup("What time is check-in?").answer, FAQ[0][1])
+        new = self.open()
+        self.assertEqual(new.docs, 1)
+        self.assertIsNone(new.lookup("What time is check-in?"))
+        self.assertEqual(os.listdir(self.dir.name), ["faq.idx"])
+
+    def test_rebuild_from_jsonl_and_bad_files(self):
+        src = os.path.join(self.dir.name, "faq.jsonl")
+        with open(src, "w", encoding="utf-8") as f:
+            for q, a in FAQ:
+                f.write(json.dumps({"question": q, "answer": a}) + "\n")
+        summary = faq_index.rebuild(self.path, [src])
+        self.assertEqual((summary["pairs"], summary["entries"]), (5, 5))
+
+        with self.assertRaises(ValueError):
+            FaqIndex(src)
+        with mock.patch.dict(os.environ, {"SF_FAQ_INDEX": os.path.join(self.dir.name, "missing.idx")}), \
+                self.assertLogs("salesforce_faq_index", "WARNING"):
+            self.assertIsNone(faq_index.faq_index_from_env())
+
+
+class FaqBeforeSalesforceTest(MockOrgTestCase):
+    def test_confident_match_never_calls_salesforce(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "faq.idx")
+        build_index(FAQ, path)
+        index = FaqIndex(path)
+        self.addCleanup(index.close)
+        llm = SalesforceAgentLLM(api=self.api(), faq=index)
+        self.addCleanup(llm.close)
+
+        self.assertEqual(llm.call(prompt="What time is check-in?"), FAQ[0][1])
+        self.assertEqual(sum(self.server.stats()["requests"].values()), 0)
+        llm.call(prompt="Can we bring our dog?")
+        self.assertEqual(self.requests_to("messages"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+# tests/test_http_transport.py
+import importlib.util
+import time
+import unittest
+
+import requests
+
+from mock_org import MockOrgTestCase
+
+from salesforce_agent_API import SalesforceAgentAPI
+from salesforce_http import HttpTransport
+
+HAS_H2 = importlib.util.find_spec("h2") is not None
+
+
+class KeepAliveTransportTest(MockOrgTestCase):
+    def transport(self, **kwargs) -> HttpTransport:
+        transport = HttpTransport(**kwargs)
+        self.addCleanup(transport.close)
+        return transport
+
+    def test_a_whole_conversation_reuses_one_connection(self):
+        transport = self.transport(http2=False)
+        api = self.api(transport=transport)
+        token = api.get_access_token()
+        sid = api.start_session(token)
+        for seq in (1, 2, 3):
+            api.send_message_sync(token, sid, "hi", sequence_id=seq)
+        api.end_session(token, sid)
+
+        pools = transport._client.get_adapter(self.server.url).poolmanager.pools
+        with pools.lock:
+            opened = sum(p.num_connections for p in pools._container.values())
+            sent = sum(p.num_requests for p in pools._container.values())
+        self.assertEqual((opened, sent), (1, 6))
+
+    def test_closed_transport_refuses_requests(self):
+        transport = self.transport(http2=False)
+        transport.close()
+        with self.assertRaises(RuntimeError):
+            transport.post(self.server.url + "/services/oauth2/token")
+
+    def test_client_closes_only_a_transport_it_owns(self):
+        shared = self.transport(http2=False)
+        SalesforceAgentAPI(my_domain=self.server.url, transport=shared).close()
+        self.assertFalse(shared._closed)
+        own = SalesforceAgentAPI(my_domain=self.server.url, pool_maxsize=2, http2=False)
+        own.close()
+        self.assertTrue(own._transport._closed)
+
+    @unittest.skipIf(HAS_H2, "h2 is installed")
+    def test_http2_request_falls_back_to_requests_without_h2(self):
+        transport = self.transport(http2=True)
+        self.assertFalse(transport.http2)
+        self.assertIsInstance(transport._client, requests.Session)
+
+    @unittest.skipUnless(HAS_H2, "needs httpx[http2]")
+    def test_http2_transport_hands_back_requests_responses(self):
+        api = self.api(transport=self.transport(http2=True))
+        token = api.get_access_token()
+        sid = api.start_session(token)
+        self.assertIn("messages", api.send_message_sync(token, sid, "hi"))
+        self.assertTrue("".join(api.send_message_stream(token, sid, "hi", sequence_id=2)))
+
+
+class StreamingLatencyTest(MockOrgTestCase):
+    mock_config = {"chunk_size": 8, "chunk_delay": 0.05}
+
+    def test_first_chunk_arrives_before_the_stream_completes(self):
+        transport = HttpTransport(http2=False)
+        self.addCleanup(transport.close)
+        api = self.api(transport=transport)
+        token = api.get_access_token()
+        sid = api.start_session(token)
+
+        start = time.perf_counter()
+        arrivals = [time.perf_counter() - start for _ in api.send_message_stream(token, sid, "hi")]
+        self.assertGreater(len(arrivals), 4)
+        # Buffered reads would hand over the first chunks only when several had piled up
+        self.assertLess(arrivals[0], arrivals[-1] / 2)
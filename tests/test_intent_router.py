@@ -0,0 +1,72 @@
+# tests/test_intent_router.py
+import os
+import unittest
+from unittest import mock
+
+import mock_org  # noqa: F401  (puts the repo root on sys.path)
+
+import crew_salesforce_tool_app as app
+from intent_router import DEFAULT_CONFIDENCE_THRESHOLD, IntentRouter
+
+WEDDING = "We're planning a beach wedding ceremony and reception for 80 guests."
+VACATION = "Family of 4, 3-night stay with the kids club and a historical tour."
+VAGUE = "Can you help me with some plans?"
+
+
+class IntentRouterTest(unittest.TestCase):
+    def test_clear_messages_are_classified_confidently(self):
+        router = IntentRouter()
+        for text, expected in ((WEDDING, "wedding"), (VACATION, "vacation")):
+            label, confidence = router.classify(text)
+            self.assertEqual(label, expected)
+            self.assertTrue(router.is_confident(confidence), confidence)
+
+    def test_no_cues_means_zero_confidence(self):
+        self.assertEqual(IntentRouter().classify(VAGUE), ("vacation", 0.0))
+
+    def test_threshold_comes_from_argument_then_env(self):
+        self.assertEqual(IntentRouter().threshold, DEFAULT_CONFIDENCE_THRESHOLD)
+        with mock.patch.dict(os.environ, {"ROUTER_CONFIDENCE_THRESHOLD": "0.9"}):
+            self.assertEqual(IntentRouter().threshold, 0.9)
+            self.assertEqual(IntentRouter(threshold=0.3).threshold, 0.3)
+
+    def test_threshold_is_inclusive(self):
+        router = IntentRouter(threshold=0.5)
+        self.assertTrue(router.is_confident(0.5))
+        self.assertFalse(router.is_confident(0.499))
+
+
+class RouteMessageTest(unittest.TestCase):
+    """route_message only kicks off the LLM route crew below the confidence threshold."""
+
+    def route(self, text, threshold, llm_answer="wedding"):
+        router = IntentRouter(threshold=threshold)
+        route_crew = mock.Mock()
+        route_crew.kickoff.return_value = llm_answer
+        with mock.patch.object(app, "_intent_router", router), \
+                mock.patch.object(app, "_get_crews", lambda: (route_crew, {})):
+            flow = app.route_message(text)
+        return flow, route_crew.kickoff.call_count, router.stats()
+
+    def test_confident_message_never_calls_the_llm_router(self):
+        flow, llm_calls, stats = self.route(WEDDING, threshold=0.6)
+        self.assertEqual((flow, llm_calls), ("wedding", 0))
+        self.assertEqual(stats, {"local:wedding": 1})
+
+    def test_unconfident_message_asks_the_llm_router(self):
+        flow, llm_calls, stats = self.route(VAGUE, threshold=0.6, llm_answer="Wedding.")
+        self.assertEqual((flow, llm_calls), ("wedding", 1))
+        self.assertEqual(stats, {"llm:wedding": 1})
+
+    def test_raising_the_threshold_sends_more_to_the_llm(self):
+        _, llm_calls, _ = self.route(VACATION, threshold=1.0, llm_answer="vacation")
+        self.assertEqual(llm_calls, 1)
+
+    def test_unusable_llm_answer_falls_back_to_the_local_guess(self):
+        flow, _, stats = self.route(VAGUE, threshold=0.6, llm_answer="I am not sure")
+        self.assertEqual(flow, "vacation")
+        self.assertEqual(stats, {"local-fallback:vacation": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+# tests/test_load_simulator.py
+import random
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from mock_org import MockOrgTestCase
+
+import crew_salesforce_agent_interaction as interaction
+from load_simulator import CrewAgent, LLMAgent, LoadRecorder, ScriptedGuest, run_conversation
+from salesforce_llm_adapter import SalesforceAgentLLM
+
+TURNS = 4
+
+
+class _FaqCrew:
+    """Stands in for the FAQ crew: one LLM call per kickoff with the agent brief and the task text, like CrewAI."""
+
+    def __init__(self, llm):
+        self.llm = llm
+
+    def kickoff(self, inputs=None):
+        return self.llm.call(messages=[
+            {"role": "system", "content": "You are the Coral Cloud FAQ Specialist."},
+            {"role": "user", "content": f"Reply to the guest message below.\n\nGuest message:\n{inputs['customer_message']}"},
+        ])
+
+
+class ConversationSessionTest(MockOrgTestCase):
+    def _run(self, agent):
+        rec = LoadRecorder()
+        rec.in_flight = 1
+        rng = random.Random(7)
+        run_conversation(agent, ScriptedGuest(rng), TURNS, 0.0, rng, rec, time.perf_counter())
+        self.assertEqual(rec.conversations_completed, 1)
+        self.assertEqual(len(rec.turn_latencies), TURNS)
+        return self.server.stats()
+
+    def test_llm_agent_conversation_uses_one_session(self):
+        agent = LLMAgent(SalesforceAgentLLM(api=self.api()))
+        self.addCleanup(agent.close)
+        stats = self._run(agent)
+        self.assertEqual(stats["sessions_opened"], 1)
+        self.assertEqual(stats["requests"]["messages"], TURNS)
+        self.assertEqual(stats["requests"]["end_session"], 1)
+
+    def test_crew_agent_conversation_uses_one_session(self):
+        sf_llm = SalesforceAgentLLM(api=self.api())
+        sim = SimpleNamespace(sf_llm=sf_llm, faq=None)
+        with mock.patch.object(interaction, "_sim", sim), \
+                mock.patch.object(interaction, "_get_crews", lambda: (None, _FaqCrew(sf_llm))):
+            agent = CrewAgent()
+            stats = self._run(agent)
+            agent.close()
+        self.assertEqual(stats["sessions_opened"], 1)
+        self.assertEqual(stats["requests"]["messages"], TURNS)
+        self.assertEqual(stats["requests"]["end_session"], 1)
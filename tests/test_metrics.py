@@ -0,0 +1,86 @@
+# tests/test_metrics.py
+import unittest
+import urllib.request
+
+from mock_org import MockOrgTestCase
+
+import salesforce_metrics as metrics
+from salesforce_errors import RateLimitError
+
+
+class MetricsRegistryTest(unittest.TestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        reg = metrics.MetricsRegistry(buckets=(0.1, 1.0))
+        for d in (0.05, 0.5, 5.0):
+            reg.on_request("messages", "POST", 200, d, 10, 20)
+        lat = reg.snapshot()["latency"]["messages"]
+        self.assertEqual(lat["buckets"], {0.1: 1, 1.0: 2})
+        self.assertEqual(lat["count"], 3)
+        text = reg.render_prometheus()
+        self.assertIn('sf_agent_request_duration_seconds_bucket{endpoint="messages",le="+Inf"} 3', text)
+        self.assertIn('sf_agent_payload_bytes_total{endpoint="messages",direction="in"} 60', text)
+
+    def test_active_sessions_never_go_negative(self):
+        reg = metrics.MetricsRegistry()
+        reg.on_sessions(-1)
+        reg.on_sessions(+1)
+        self.assertEqual(reg.snapshot()["active_sessions"], 1)
+
+    def test_metrics_endpoint_serves_prometheus_text(self):
+        reg = metrics.MetricsRegistry()
+        reg.on_request("token", "POST", 200, 0.01, 1, 1)
+        httpd = metrics.start_metrics_server(reg, port=0)
+        self.addCleanup(httpd.server_close)
+        self.addCleanup(httpd.shutdown)
+        url = "http://%s:%d/metrics" % httpd.server_address[:2]
+        with urllib.request.urlopen(url, timeout=5) as r:
+            body = r.read().decode("utf-8")
+        self.assertIn('sf_agent_requests_total{endpoint="token",method="POST",status="200"} 1', body)
+
+
+class InstrumentedCallsTest(MockOrgTestCase):
+    def setUp(self):
+        super().setUp()
+        self.reg = metrics.add_hook(metrics.MetricsRegistry())
+        self.addCleanup(metrics.remove_hook, self.reg)
+
+    def test_every_endpoint_is_recorded(self):
+        api = self.api()
+        token = api.get_access_token()
+        sid = api.start_session(token)
+        self.assertEqual(self.reg.snapshot()["active_sessions"], 1)
+        api.send_message_sync(token, sid, "hi", sequence_id=1)
+        "".join(api.send_message_stream(token, sid, "hi", sequence_id=2))
+        api.end_session(token, sid)
+
+        snap = self.reg.snapshot()
+        self.assertEqual(snap["active_sessions"], 0)
+        for ep in ("token", "start_session", "messages", "messages_stream", "end_session"):
+            self.assertEqual(snap["latency"][ep]["count"], 1, ep)
+        self.assertGreater(snap["bytes"]["messages_stream|in"], 0)
+        self.assertGreater(snap["bytes"]["messages|out"], 0)
+
+    def test_retries_are_counted(self):
+        api = self.api()
+        token = api.get_access_token()
+        self.server.state.config.rate_429 = 1.0
+        self.server.state.config.retry_after = 0.001
+        with self.assertRaises(RateLimitError):
+            api.start_session(token)
+        snap = self.reg.snapshot()
+        self.assertGreater(snap["retries"]["start_session"], 0)
+        self.assertEqual(snap["requests"]["start_session|POST|429"], 1)
+
+    def test_a_broken_hook_never_fails_a_call(self):
+        class Broken(metrics.MetricsHook):
+            def on_request(self, *args, **kwargs):
+                raise RuntimeError("collector down")
+
+        broken = metrics.add_hook(Broken())
+        self.addCleanup(metrics.remove_hook, broken)
+        api = self.api()
+        self.assertTrue(api.start_session(api.get_access_token()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+# tests/test_pipeline.py
+import threading
+import time
+import unittest
+
+import mock_org  # noqa: F401  (puts the repo root on sys.path)
+
+from crew_conversation_pipeline import ConversationPipeline
+
+
+class ConversationPipelineTest(unittest.TestCase):
+    def test_turns_alternate_in_order_per_conversation(self):
+        def guest(cid, history):
+            return f"{cid} guest {len(history) // 2}"
+
+        def answer(cid, history):
+            return f"{cid} reply to {history[-1]['content']}"
+
+        with ConversationPipeline(guest, answer, max_in_flight=3) as pipe:
+            futures = {cid: pipe.submit(turns=3, conversation_id=cid) for cid in ("a", "b", "c", "d")}
+            transcripts = {cid: f.result(5.0) for cid, f in futures.items()}
+
+        for cid, history in transcripts.items():
+            self.assertEqual([m["role"] for m in history], ["user", "assistant"] * 3)
+            for turn in range(3):
+                self.assertEqual(history[2 * turn]["content"], f"{cid} guest {turn}")
+                self.assertEqual(history[2 * turn + 1]["content"], f"{cid} reply to {cid} guest {turn}")
+
+    def test_stages_overlap_across_conversations(self):
+        def slow(cid, history):
+            time.sleep(0.05)
+            return "text"
+
+        pipe = ConversationPipeline(slow, slow, guest_workers=4, answer_workers=4, max_in_flight=8)
+        start = time.perf_counter()
+        with pipe:
+            pipe.run(8, turns=2)
+        elapsed = time.perf_counter() - start
+        # 8 conversations x 2 turns x 2 stages x 50ms = 1.6s if run one step at a time
+        self.assertLess(elapsed, 0.8)
+        stats = pipe.stats()
+        self.assertEqual((stats["completed"], stats["turns"]), (8, 16))
+        self.assertGreater(stats["overlap"], 2.0)
+
+    def test_admission_is_capped(self):
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def guest(cid, history):
+            if not history:
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+            time.sleep(0.01)
+            return "hi"
+
+        def on_end(cid):
+            with lock:
+                active[0] -= 1
+
+        with ConversationPipeline(guest, lambda c, h: "ok", guest_workers=4, max_in_flight=2,
+                                  on_end=on_end) as pipe:
+            pipe.run(6, turns=2)
+        self.assertEqual(peak[0], 2)
+
+    def test_failed_conversation_is_reported_and_ended(self):
+        ended = []
+
+        def answer(cid, history):
+            if cid == "bad":
+                raise RuntimeError("agent down")
+            return "ok"
+
+        with ConversationPipeline(lambda c, h: "hi", answer, on_end=ended.append) as pipe:
+            good, bad = pipe.submit(2, "good"), pipe.submit(2, "bad")
+            self.assertEqual(len(good.result(5.0)), 4)
+            self.assertIsInstance(bad.exception(5.0), RuntimeError)
+        self.assertEqual(sorted(ended), ["bad", "good"])
+        stats = pipe.stats()
+        self.assertEqual((stats["completed"], stats["failed"], stats["in_flight"]), (1, 1, 0))
+
+    def test_submit_after_shutdown_is_refused(self):
+        pipe = ConversationPipeline(lambda c, h: "hi", lambda c, h: "ok")
+        pipe.start()
+        pipe.shutdown()
+        with self.assertRaises(RuntimeError):
+            pipe.submit()
+
+
+if __name__ == "__main__":
+    unittest.main()
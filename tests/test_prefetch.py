@@ -0,0 +1,59 @@
+# tests/test_prefetch.py
+import os
+import time
+from unittest import mock
+
+from mock_org import MockOrgTestCase
+
+from salesforce_conversations import conversation
+from salesforce_prefetch import SessionPrefetcher
+from salesforce_session_pool import AgentSessionPool
+
+
+class SessionPrefetcherTest(MockOrgTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pool = AgentSessionPool(self.api(), size=1, prewarm=False)
+        self.addCleanup(self.pool.close)
+        self.prefetcher = SessionPrefetcher(self.pool)
+        self.addCleanup(self.prefetcher.close)
+
+    def wait_for(self, predicate, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not predicate() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(predicate())
+
+    def test_first_tool_call_adopts_the_prefetched_session(self):
+        with conversation("guest-a"), self.prefetcher.scope():
+            s = self.prefetcher.adopt()
+            self.assertIsNotNone(s)
+            self.assertIsNone(self.prefetcher.adopt())
+            self.pool.send_message("hi", session=s)
+            # The session belongs to the caller's conversation, so its next turn reuses it
+            self.pool.send_message("and parking?", session=self.pool.checkout())
+        self.assertEqual(self.server.stats()["sessions_opened"], 1)
+        self.assertEqual(self.prefetcher.stats()["adopted"], 1)
+
+    def test_unadopted_session_goes_back_to_the_pool(self):
+        with conversation("guest-a"), self.prefetcher.scope() as pf:
+            pf.future.result(5.0)
+        self.wait_for(lambda: self.prefetcher.stats()["returned_unused"] == 1)
+        self.assertEqual(self.pool.stats()["idle"], 1)
+        with conversation("guest-b"):
+            self.pool.send_message("hi")  # untouched, so another conversation may take it
+        self.assertEqual(self.server.stats()["sessions_opened"], 1)
+
+    def test_prefetch_never_waits_for_a_full_pool(self):
+        busy = self.pool.checkout(key="someone-else")
+        self.addCleanup(self.pool.checkin, busy)
+        with self.prefetcher.scope():
+            self.assertIsNone(self.prefetcher.adopt())
+        self.assertEqual(self.prefetcher.stats()["skipped_pool_full"], 1)
+
+    def test_disabled_by_env(self):
+        with mock.patch.dict(os.environ, {"SF_PREFETCH": "0"}), self.prefetcher.scope() as pf:
+            self.assertIsNone(pf)
+            self.assertIsNone(self.prefetcher.adopt())
+        self.assertEqual(self.prefetcher.stats()["started"], 0)
+        self.assertEqual(self.requests_to("start_session"), 0)
@@ -0,0 +1,132 @@
+# tests/test_resilience.py
+import time
+import unittest
+
+from mock_org import MockOrgTestCase, fast_policies
+
+from salesforce_errors import AuthError, CircuitOpenError, RateLimitError, ServerError
+from salesforce_resilience import CircuitBreaker, RetryPolicy
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def test_retry_after_wins_but_is_capped(self):
+        p = RetryPolicy(base_delay=0.5, max_retry_after=10.0)
+        self.assertEqual(p.delay(1, retry_after=3.0), 3.0)
+        self.assertEqual(p.delay(1, retry_after=120.0), 10.0)
+
+    def test_backoff_is_jittered_under_the_cap(self):
+        p = RetryPolicy(base_delay=1.0, max_delay=4.0)
+        for attempt in range(1, 8):
+            self.assertLessEqual(p.delay(attempt), min(4.0, 2 ** (attempt - 1)))
+
+    def test_status_and_attempt_limits(self):
+        p = RetryPolicy(max_attempts=3, retry_on=(429, 503), retry_connection_errors=False)
+        self.assertTrue(p.should_retry_status(429, 2))
+        self.assertFalse(p.should_retry_status(429, 3))
+        self.assertFalse(p.should_retry_status(500, 1))
+        self.assertFalse(p.should_retry_exception(1))
+
+
+class RetryOnMockTest(MockOrgTestCase):
+    mock_config = {"retry_after": 0.01}
+
+    def _session(self, api):
+        token = api.get_access_token()
+        return token, api.start_session(token)
+
+    def test_token_429_retried_up_to_policy(self):
+        self.server.state.config.rate_429 = 1.0
+        with self.assertRaises(RateLimitError) as cm:
+            self.api().get_access_token()
+        self.assertEqual(cm.exception.status_code, 429)
+        self.assertEqual(self.requests_to("token"), 4)
+
+    def test_message_500_is_not_retried(self):
+        api = self.api()
+        token, sid = self._session(api)
+        self.server.state.config.error_rate = 1.0
+        with self.assertRaises(ServerError):
+            api.send_message_sync(token, sid, "hi")
+        self.assertEqual(self.requests_to("messages"), 1)
+
+    def test_message_429_is_retried(self):
+        api = self.api()
+        token, sid = self._session(api)
+        self.server.state.config.rate_429 = 1.0
+        with self.assertRaises(RateLimitError):
+            api.send_message_sync(token, sid, "hi")
+        self.assertEqual(self.requests_to("messages"), 3)
+
+    def test_policy_overrides_merge_over_defaults(self):
+        api = self.api(retry_policies=fast_policies(messages=RetryPolicy(max_attempts=1, retry_on=(429,))))
+        token, sid = self._session(api)
+        self.server.state.config.rate_429 = 1.0
+        with self.assertRaises(RateLimitError):
+            api.send_message_sync(token, sid, "hi")
+        self.assertEqual(self.requests_to("messages"), 1)
+
+
+class CircuitBreakerOnMockTest(MockOrgTestCase):
+    mock_config = {"chunk_size": 4096}  # whole answer in one write, so an abandoned stream leaves no broken pipe
+
+    def setUp(self):
+        super().setUp()
+        self.breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.2)
+        self.client = self.api(breaker=self.breaker)
+        self.token = self.client.get_access_token()
+        self.sid = self.client.start_session(self.token)
+
+    def _trip(self):
+        self.server.state.config.error_rate = 1.0
+        for _ in range(2):
+            with self.assertRaises(ServerError):
+                self.client.send_message_sync(self.token, self.sid, "hi")
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.server.state.config.error_rate = 0.0
+
+    def _stream(self, text="hi"):
+        return "".join(self.client.send_message_stream(self.token, self.sid, text))
+
+    def test_open_circuit_fails_fast_then_trial_closes_it(self):
+        self._trip()
+        with self.assertRaises(CircuitOpenError):
+            self.client.send_message_sync(self.token, self.sid, "hi")
+        self.assertEqual(self.requests_to("messages"), 2)
+
+        time.sleep(0.25)
+        self.assertIn("messages", self.client.send_message_sync(self.token, self.sid, "hi"))
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_stream_settles_the_breaker(self):
+        self._trip()
+        time.sleep(0.25)
+        self.assertTrue(self._stream())
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_half_open_stream_reopens(self):
+        self._trip()
+        time.sleep(0.25)
+        self.server.state.config.error_rate = 1.0
+        with self.assertRaises(ServerError):
+            self._stream()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_abandoned_stream_releases_the_trial(self):
+        self._trip()
+        time.sleep(0.25)
+        chunks = self.client.send_message_stream(self.token, self.sid, "hi")
+        next(chunks)
+        chunks.close()  # reader stopped early after a 200: the trial still settles
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self._stream())
+
+    def test_stream_401_is_not_an_org_failure(self):
+        self.revoke_tokens()
+        for _ in range(3):
+            with self.assertRaises(AuthError):
+                self._stream()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+
+if __name__ == "__main__":
+    unittest.main()
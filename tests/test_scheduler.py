@@ -0,0 +1,81 @@
+# tests/test_scheduler.py
+import threading
+import time
+
+from mock_org import MockOrgTestCase, fast_policies
+
+from salesforce_errors import AdmissionRejected, ServerError
+from salesforce_resilience import CircuitBreaker, OrgGuard, RetryPolicy
+from salesforce_scheduler import BATCH, INTERACTIVE, AdmissionScheduler, PriorityClass, default_classes, priority
+from salesforce_session_pool import AgentSessionPool
+
+
+class AdmissionOnMockTest(MockOrgTestCase):
+    def _hold_slot(self, scheduler, seconds=None):
+        """Occupy the scheduler's only slot from another thread; returns the event that frees it."""
+        held, release = threading.Event(), threading.Event()
+
+        def hold():
+            with scheduler.slot():
+                held.set()
+                release.wait(seconds if seconds is not None else 5.0)
+
+        t = threading.Thread(target=hold, daemon=True)
+        t.start()
+        held.wait(1.0)
+        self.addCleanup(t.join, 5.0)
+        self.addCleanup(release.set)
+        return release
+
+    def test_shed_call_does_not_take_the_half_open_trial(self):
+        scheduler = AdmissionScheduler(1, [PriorityClass(INTERACTIVE, weight=1, max_queue=0)])
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+        api = self.api(guard=OrgGuard(None, breaker, scheduler=scheduler),
+                       retry_policies=fast_policies(messages=RetryPolicy(max_attempts=1)))
+        token = api.get_access_token()
+        sid = api.start_session(token)
+
+        self.server.state.config.error_rate = 1.0
+        with self.assertRaises(ServerError):
+            api.send_message_sync(token, sid, "hi")
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.server.state.config.error_rate = 0.0
+        time.sleep(0.1)
+
+        release = self._hold_slot(scheduler)
+        with self.assertRaises(AdmissionRejected):
+            api.send_message_sync(token, sid, "shed")
+        release.set()
+        time.sleep(0.05)
+        # The shed call never reached the breaker, so the trial is still available
+        self.assertIn("messages", api.send_message_sync(token, sid, "trial"))
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_rejected_admission_is_retried(self):
+        scheduler = AdmissionScheduler(1, [PriorityClass(INTERACTIVE, weight=1, max_queue=0)])
+        api = self.api(guard=OrgGuard(None, None, scheduler=scheduler))
+        token = api.get_access_token()
+        sid = api.start_session(token)
+
+        self._hold_slot(scheduler, seconds=0.02)
+        self.assertIn("messages", api.send_message_sync(token, sid, "hi"))
+        self.assertGreaterEqual(scheduler.stats()["classes"][INTERACTIVE]["shed"], 1)
+        self.assertEqual(self.requests_to("messages"), 1)
+
+    def test_pool_background_work_keeps_the_callers_priority(self):
+        scheduler = AdmissionScheduler(4, default_classes(4))
+        pool = AgentSessionPool(self.api(guard=OrgGuard(None, None, scheduler=scheduler)), size=2, prewarm=False)
+        self.addCleanup(pool.close)
+        with priority(BATCH):
+            pool.warm()
+        s = pool.checkout(timeout=5.0)  # waits for a warmed session, no API call of its own
+        with priority(BATCH):
+            pool.checkin(s, discard=True)  # ends the session and re-warms in the background
+        deadline = time.monotonic() + 5.0
+        while self.server.stats()["requests"]["end_session"] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        classes = scheduler.stats()["classes"]
+        self.assertEqual(classes[INTERACTIVE]["admitted"], 0)
+        # token + two warm sessions + the ended session (+ its replacement)
+        self.assertGreaterEqual(classes[BATCH]["admitted"], 4)
@@ -0,0 +1,73 @@
+# tests/test_session_pool.py
+import gc
+import time
+import weakref
+
+from mock_org import MockOrgTestCase
+
+from salesforce_conversations import conversation
+from salesforce_session_pool import AgentSessionPool
+
+
+class SessionPoolTest(MockOrgTestCase):
+    def pool(self, **kwargs) -> AgentSessionPool:
+        pool = AgentSessionPool(self.api(), **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def wait_for(self, predicate, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not predicate() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(predicate())
+
+    def send(self, pool, key, text="hi"):
+        with conversation(key):
+            s = pool.checkout()
+            pool.send_message(text, session=s)
+        return s.session_id
+
+    def test_constructor_makes_no_calls_and_first_checkout_warms(self):
+        pool = self.pool(size=3)
+        time.sleep(0.05)
+        self.assertEqual(sum(self.server.stats()["requests"].values()), 0)
+
+        self.send(pool, "guest-1")
+        self.wait_for(lambda: pool.stats()["idle"] == 3)
+        self.assertEqual(self.server.stats()["sessions_opened"], 3)
+
+    def test_conversations_never_share_a_session(self):
+        pool = self.pool(size=2, prewarm=False)
+        a = self.send(pool, "guest-a")
+        b = self.send(pool, "guest-b")
+        self.assertNotEqual(a, b)
+        self.assertEqual(self.send(pool, "guest-a"), a)
+        self.assertEqual(self.send(pool, "guest-b"), b)
+
+    def test_full_pool_recycles_another_conversations_idle_session(self):
+        pool = self.pool(size=1, prewarm=False)
+        a = self.send(pool, "guest-a")
+        b = self.send(pool, "guest-b")
+        self.assertNotEqual(a, b)
+        self.assertEqual(pool.stats()["recycled"], 1)
+        self.wait_for(lambda: self.server.stats()["requests"]["end_session"] == 1)
+
+    def test_end_conversation_recycles_its_sessions(self):
+        pool = self.pool(size=1, prewarm=False)
+        a = self.send(pool, "guest-a")
+        self.assertEqual(pool.end_conversation("guest-a"), 1)
+        self.wait_for(lambda: pool.stats()["idle"] == 1)  # fresh replacement warmed in the background
+        self.assertNotEqual(self.send(pool, "guest-a"), a)
+
+    def test_unused_session_goes_back_fresh(self):
+        pool = self.pool(size=1, prewarm=False)
+        s = pool.checkout(key="prefetch-for-a")
+        pool.checkin(s)  # never sent anything, like an unadopted prefetch
+        self.assertEqual(self.send(pool, "guest-b"), s.session_id)
+
+    def test_unclosed_pool_can_be_collected(self):
+        pool = AgentSessionPool(self.api(), size=1, prewarm=False)
+        ref = weakref.ref(pool)
+        del pool
+        gc.collect()
+        self.assertIsNone(ref())
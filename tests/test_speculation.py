@@ -0,0 +1,83 @@
+# tests/test_speculation.py
+import threading
+import time
+import unittest
+
+from mock_org import MockOrgTestCase
+
+import crew_speculation
+from crew_speculation import SpeculationCancelled, Speculator
+
+
+class SpeculatorTest(unittest.TestCase):
+    def speculator(self, **kwargs) -> Speculator:
+        spec = Speculator(**kwargs)
+        self.addCleanup(spec.close)
+        return spec
+
+    def test_hit_keeps_the_speculative_result(self):
+        spec = self.speculator()
+        scope, fut = spec.start("vacation", lambda: "itinerary")
+        self.assertEqual(fut.result(1.0), "itinerary")
+        spec.hit(0.2)
+        stats = spec.stats()
+        self.assertEqual((stats["speculated"], stats["hits"], stats["hit_rate"]), (1, 1, 1.0))
+        self.assertEqual(stats["overlap_saved_s"], 0.2)
+
+    def test_no_free_slot_runs_serially(self):
+        spec = self.speculator(max_in_flight=1)
+        gate = threading.Event()
+        _, fut = spec.start("wedding", lambda: gate.wait(1.0))
+        self.assertIsNone(spec.start("wedding", lambda: None))
+        gate.set()
+        fut.result(1.0)
+        self.assertEqual(spec.stats()["skipped_busy"], 1)
+
+    def test_hooks_are_no_ops_outside_a_speculative_run(self):
+        crew_speculation.on_step()
+        crew_speculation.count_sf_call()
+        crew_speculation.check_cancelled()
+
+
+class CancelledRunTest(MockOrgTestCase):
+    def test_discarded_run_makes_no_further_salesforce_calls(self):
+        api = self.api()
+        token = api.get_access_token()
+        sid = api.start_session(token)
+        observations = []
+        sent = threading.Semaphore(0)
+
+        def crew_like_flow():
+            # Like CrewAI: step_callback each step, tool errors turned into observations
+            for seq in range(1, 51):
+                try:
+                    crew_speculation.on_step()
+                    crew_speculation.count_sf_call()
+                    api.send_message_sync(token, sid, "Which packages fit?", sequence_id=seq)
+                    sent.release()
+                except Exception as e:
+                    observations.append(e)
+                time.sleep(0.01)
+            return "finished"
+
+        spec = Speculator()
+        self.addCleanup(spec.close)
+        scope, fut = spec.start("wedding", crew_like_flow)
+        for _ in range(3):
+            self.assertTrue(sent.acquire(timeout=5.0))
+        spec.discard(scope, fut)
+
+        self.assertIsInstance(fut.exception(timeout=5.0), SpeculationCancelled)
+        calls = self.requests_to("messages")
+        time.sleep(0.1)
+        self.assertEqual(self.requests_to("messages"), calls)
+        self.assertLessEqual(calls, 4)
+        self.assertEqual(observations, [])
+        deadline = time.monotonic() + 1.0  # waste is accounted in a done-callback
+        while spec.stats()["wasted_sf_calls"] != calls and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(spec.stats()["wasted_sf_calls"], calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
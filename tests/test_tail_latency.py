@@ -0,0 +1,142 @@
+# tests/test_tail_latency.py
+import asyncio
+import threading
+import time
+import unittest
+
+from mock_org import MockOrgTestCase
+
+from salesforce_resilience import AdaptiveTimeout, Hedger, OrgGuard, build_timeouts
+
+
+class AdaptiveTimeoutTest(unittest.TestCase):
+    def test_ceiling_until_enough_samples(self):
+        t = AdaptiveTimeout(floor=1.0, ceiling=30.0, min_samples=5)
+        for _ in range(4):
+            t.observe(0.1)
+        self.assertEqual(t.current(), 30.0)
+        t.observe(0.1)
+        self.assertEqual(t.current(), 1.0)  # 3 x 0.1 clamped up to the floor
+
+    def test_follows_the_running_percentile(self):
+        t = AdaptiveTimeout(floor=0.1, ceiling=30.0, percentile=0.99, multiplier=3.0, min_samples=10)
+        for _ in range(10):
+            t.observe(2.0)
+        self.assertAlmostEqual(t.current(), 6.0)
+
+    def test_timeouts_widen_a_too_tight_value(self):
+        t = AdaptiveTimeout(floor=0.1, ceiling=30.0, multiplier=2.0, min_samples=4, window=4)
+        for _ in range(4):
+            t.observe(0.1)
+        tight = t.current()
+        for _ in range(4):
+            t.observe_timeout(tight)
+        self.assertGreater(t.current(), tight)
+        self.assertEqual(t.stats()["timeouts"], 4)
+
+
+class HedgerTest(unittest.TestCase):
+    def hedger(self, **kwargs) -> Hedger:
+        hedger = Hedger(min_delay=0.01, **kwargs)
+        self.addCleanup(hedger._pool.shutdown, wait=True)
+        return hedger
+
+    def test_fast_call_is_not_hedged(self):
+        hedger = self.hedger()
+        self.assertEqual(hedger.call("token", lambda: "tok", delay=0.5), "tok")
+        self.assertEqual(hedger.stats()["token"], {"calls": 1, "hedged": 0, "hedge_wins": 0, "surplus": 0})
+
+    def test_losing_attempt_is_handed_to_on_surplus(self):
+        hedger = self.hedger()
+        calls, surplus, released = [], [], threading.Event()
+
+        def start():
+            n = len(calls)
+            calls.append(n)
+            if n == 0:
+                time.sleep(0.2)  # the slow first attempt
+            return f"session-{n}"
+
+        def on_surplus(sid):
+            surplus.append(sid)
+            released.set()
+
+        self.assertEqual(hedger.call("start_session", start, delay=0.02, on_surplus=on_surplus), "session-1")
+        self.assertTrue(released.wait(2.0))
+        self.assertEqual(surplus, ["session-0"])
+        st = hedger.stats()["start_session"]
+        self.assertEqual((st["hedged"], st["hedge_wins"], st["surplus"]), (1, 1, 1))
+
+    def test_hedges_are_capped(self):
+        hedger = self.hedger(max_ratio=0.0)
+        hedger.call("token", lambda: time.sleep(0.05) or "slow", delay=0.01)  # the one hedge always allowed
+        hedger.call("token", lambda: time.sleep(0.05) or "slow", delay=0.01)
+        self.assertEqual(hedger.stats()["token"]["hedged"], 1)
+
+    def test_both_attempts_failing_raises(self):
+        hedger = self.hedger()
+
+        def fail():
+            time.sleep(0.03)
+            raise ConnectionError("org down")
+
+        with self.assertRaises(ConnectionError):
+            hedger.call("token", fail, delay=0.01)
+
+    def test_async_loser_is_cleaned_up(self):
+        hedger = self.hedger()
+        ended = []
+
+        async def run():
+            calls = []
+
+            async def start():
+                n = len(calls)
+                calls.append(n)
+                await asyncio.sleep(0.2 if n == 0 else 0.0)
+                return f"session-{n}"
+
+            async def end(sid):
+                ended.append(sid)
+
+            winner = await hedger.acall("start_session", start, delay=0.02, on_surplus=end)
+            await asyncio.sleep(0.3)
+            return winner
+
+        self.assertEqual(asyncio.run(run()), "session-1")
+        self.assertEqual(ended, ["session-0"])
+
+
+class HedgedSessionStartTest(MockOrgTestCase):
+    def test_losing_hedges_session_is_ended(self):
+        timeouts = build_timeouts()
+        for _ in range(timeouts["start_session"].min_samples):
+            timeouts["start_session"].observe(0.01)
+        hedger = Hedger(min_delay=0.01)
+        self.addCleanup(hedger._pool.shutdown, wait=True)
+        api = self.api(guard=OrgGuard(None, None, timeouts, hedger))
+        token = api.get_access_token()
+
+        real, first = api._start_session_once, threading.Event()
+
+        def slow_first(tok):
+            if not first.is_set():
+                first.set()
+                time.sleep(0.3)
+            return real(tok)
+
+        api._start_session_once = slow_first
+        sid = api.start_session(token)
+        api.send_message_sync(token, sid, "hi")
+
+        deadline = time.monotonic() + 5.0
+        while self.requests_to("end_session") < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stats = self.server.stats()
+        self.assertEqual((stats["sessions_opened"], stats["requests"]["end_session"]), (2, 1))
+        self.assertEqual(stats["sessions_open"], 1)
+        self.assertGreater(api.latency_stats()["timeouts"]["start_session"]["samples"], 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+# tests/test_token_cache.py
+import threading
+import time
+import unittest
+
+from mock_org import MockOrgTestCase
+
+from salesforce_session_pool import AgentSessionPool
+from salesforce_token_cache import TokenCache
+
+KEY = ("https://org.example", "client")
+
+
+class TokenCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = TokenCache(background_refresh=False)
+        self.addCleanup(self.cache.close)
+
+    def test_concurrent_misses_fetch_once(self):
+        calls = []
+        gate = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            gate.wait(1.0)
+            return f"tok-{len(calls)}", 60
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.cache.get(KEY, fetch))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        time.sleep(0.05)
+        gate.set()
+        for t in threads:
+            t.join(2.0)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["tok-1"] * 8)
+
+    def test_expired_token_is_refetched(self):
+        tokens = iter(["a", "b"])
+        fetch = lambda: (next(tokens), 0.05)  # noqa: E731
+        self.assertEqual(self.cache.get(KEY, fetch), "a")
+        time.sleep(0.1)
+        self.assertEqual(self.cache.get(KEY, fetch), "b")
+
+    def test_invalidate_only_drops_matching_token(self):
+        self.cache.put(KEY, "current", ttl=60)
+        self.cache.invalidate(KEY, "stale")
+        self.assertEqual(self.cache.peek(KEY), "current")
+        self.cache.invalidate(KEY, "current")
+        self.assertIsNone(self.cache.peek(KEY))
+
+
+class TokenRefreshOnMockTest(MockOrgTestCase):
+    def test_api_reuses_cached_token(self):
+        api = self.api()
+        self.assertEqual(api.get_access_token(), api.get_access_token())
+        self.assertEqual(self.requests_to("token"), 1)
+
+    def test_pool_recovers_after_tokens_are_revoked(self):
+        pool = AgentSessionPool(self.api(), size=1, prewarm=False)
+        self.addCleanup(pool.close)
+        self.assertIn("messages", pool.send_message("hello"))
+
+        self.revoke_tokens()
+        # Checkout of an idle session is local; the send hits the 401, refreshes and retries
+        self.assertIn("messages", pool.send_message("again"))
+        self.assertEqual(self.requests_to("token"), 2)
+
+        self.revoke_tokens()
+        pool.close()
+        pool = AgentSessionPool(pool.api, size=1, prewarm=False)
+        self.addCleanup(pool.close)
+        # Opening a session on a revoked token also refreshes once
+        s = pool.checkout()
+        self.assertTrue(s.session_id)
+        pool.checkin(s)
+        self.assertEqual(self.requests_to("token"), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
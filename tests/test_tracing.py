@@ -0,0 +1,100 @@
+# tests/test_tracing.py
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from mock_org import MockOrgTestCase
+
+import tracing
+from salesforce_llm_adapter import SalesforceAgentLLM
+
+
+def path_of(report):
+    return {r["span"]: r["s"] for r in report["critical_path"]}
+
+
+class TracingTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        os.remove(self.path)
+        self.addCleanup(lambda: os.path.exists(self.path) and os.remove(self.path))
+
+    def events(self):
+        with open(self.path, encoding="utf-8") as f:
+            return json.loads(f.read().rstrip().rstrip(",") + "]")
+
+    def test_spans_are_no_ops_outside_a_run(self):
+        with tracing.span("messages", "agent_api") as sp:
+            self.assertIsNone(sp)
+        with tracing.trace_run("kickoff", "kickoff") as root:  # no path, no SF_TRACE
+            self.assertIsNone(root)
+
+    def test_sequential_stages_are_all_on_the_critical_path(self):
+        with tracing.trace_run("kickoff", "kickoff", path=self.path):
+            with tracing.span("route", "route"):
+                with tracing.span("llama", "llm"):
+                    time.sleep(0.03)
+            with tracing.span("wedding", "flow"):
+                with tracing.span("messages", "agent_api"):
+                    time.sleep(0.06)
+        report = tracing.last_report()
+        crit = path_of(report)
+        self.assertGreater(crit["route > llm:llama"], 0.025)
+        self.assertGreater(crit["wedding > agent_api:messages"], 0.055)
+        self.assertGreater(report["by_category"]["agent_api"], report["by_category"]["llm"])
+        self.assertAlmostEqual(sum(crit.values()), report["total_s"], places=3)
+
+    def test_overlapped_work_only_counts_the_longer_branch(self):
+        with tracing.trace_run("kickoff", "kickoff", path=self.path):
+            def prefetch():
+                with tracing.span("start_session", "agent_api"):
+                    time.sleep(0.02)
+
+            t = threading.Thread(target=contextvars.copy_context().run, args=(prefetch,))
+            t.start()
+            with tracing.span("route", "route"):
+                time.sleep(0.08)
+            t.join()
+        report = tracing.last_report()
+        self.assertNotIn("agent_api:start_session", path_of(report))
+        self.assertLess(report["total_s"], 0.095)
+        self.assertEqual(report["spans"], 3)
+
+    def test_runs_append_chrome_events_with_errors_marked(self):
+        for _ in range(2):
+            with tracing.trace_run("kickoff", "kickoff", path=self.path):
+                with tracing.span("route", "route"):
+                    pass
+        with self.assertRaises(ValueError):
+            with tracing.trace_run("kickoff", "kickoff", path=self.path):
+                raise ValueError("boom")
+
+        events = self.events()
+        spans = [e for e in events if e["ph"] == "X"]
+        self.assertEqual(len(spans), 5)
+        self.assertEqual(spans[-1]["args"]["error"], "ValueError")
+        self.assertEqual(sum(1 for e in events if e["name"] == "critical_path"), 3)
+        self.assertIn("critical path of kickoff", tracing.format_report(tracing.last_report()))
+
+
+class TracedAgentCallTest(MockOrgTestCase):
+    def test_agent_api_calls_nest_under_the_run(self):
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        llm = SalesforceAgentLLM(api=self.api())
+        self.addCleanup(llm.close)
+        with tracing.trace_run("ask", "run", path=path):
+            llm.call(prompt="Pool hours?")
+        crit = path_of(tracing.last_report())
+        for endpoint in ("token", "start_session", "messages"):
+            self.assertIn(f"agent_api:{endpoint}", crit)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,279 @@
+# tracing.py
+"""
+Nested timing spans for one kickoff (or any block wrapped in trace_run), written
+as Chrome trace events (open in chrome://tracing or https://ui.perfetto.dev) and
+summarized as a critical-path breakdown.
+
+    SF_TRACE=runs/trace.json python crew_salesforce_cli.py route "..."
+    python crew_salesforce_cli.py --trace runs/trace.json route "..."
+
+Spans are only recorded inside trace_run(); everywhere else span() is a shared
+no-op context manager. The current span travels in a contextvar, so work handed
+to executors with contextvars.copy_context() (speculative runs, hedges,
+prefetches) nests under the right parent on its own thread lane.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional, Tuple
+
+_NULL = nullcontext()
+_EPS = 1e-6
+# Critical-path entries are prefixed with the enclosing stage, so the router's and
+# the planner's LLM calls stay apart even when they use the same model
+STAGE_CATS = ("route", "flow")
+# Own time of these spans is CrewAI/app orchestration rather than waiting on a backend
+ORCHESTRATION_CATS = ("run", "kickoff", "flow", "crew", "task")
+_current: contextvars.ContextVar = contextvars.ContextVar("trace_span", default=None)
+_last_report: Optional[dict] = None
+_file_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("trace", "parent", "name", "cat", "attrs", "start", "end", "tid", "children")
+
+    def __init__(self, trace: "Trace", name: str, cat: str, attrs: dict, parent: Optional["Span"] = None):
+        self.trace = trace
+        self.parent = parent
+        self.name = name
+        self.cat = cat
+        self.attrs = attrs
+        self.tid = threading.get_ident()
+        self.children: List["Span"] = []
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+
+    @property
+    def label(self) -> str:
+        p = self.parent
+        while p is not None and p.cat not in STAGE_CATS:
+            p = p.parent
+        own = f"{self.cat}:{self.name}"
+        return own if p is None or p is self else f"{p.name} > {own}"
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class Trace:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.spans: List[Span] = []
+        self.threads: Dict[int, str] = {}
+
+    def add(self, span: Span, parent: Optional[Span]):
+        with self.lock:
+            self.spans.append(span)
+            self.threads.setdefault(span.tid, threading.current_thread().name)
+            if parent is not None:
+                parent.children.append(span)
+
+
+def enabled() -> bool:
+    return bool(os.getenv("SF_TRACE"))
+
+
+def current() -> Optional[Span]:
+    return _current.get()
+
+
+@contextmanager
+def _span(parent: Span, name: str, cat: str, attrs: dict):
+    s = Span(parent.trace, name, cat, attrs, parent)
+    parent.trace.add(s, parent)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        s.end = time.perf_counter()
+        _current.reset(token)
+
+
+def span(name: str, cat: str = "app", **attrs):
+    """Child span of the current one; a no-op outside trace_run()."""
+    parent = _current.get()
+    if parent is None:
+        return _NULL
+    return _span(parent, name, cat, attrs)
+
+
+@contextmanager
+def trace_run(name: str, cat: str = "run", path: Optional[str] = None, **attrs):
+    """
+    Root span for one run. With tracing on (SF_TRACE=<file> or an explicit path)
+    its events are appended to the file and the critical-path summary is kept for
+    last_report(). Nested inside another traced run it is just a child span.
+    """
+    if _current.get() is not None:
+        with _span(_current.get(), name, cat, attrs) as s:
+            yield s
+        return
+    path = path or os.getenv("SF_TRACE")
+    if not path:
+        yield None
+        return
+    trace = Trace()
+    root = Span(trace, name, cat, attrs)
+    trace.add(root, None)
+    token = _current.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        root.end = time.perf_counter()
+        _current.reset(token)
+        _finish(root, path)
+
+
+def _finish(root: Span, path: str):
+    global _last_report
+    _last_report = critical_path_report(root)
+    try:
+        write_chrome_trace(root.trace, path, _last_report)
+    except OSError:
+        pass  # tracing must never fail the run
+
+
+# --- Chrome trace output ---
+def _us(t: float) -> float:
+    return round(t * 1e6, 1)
+
+
+def chrome_events(trace: Trace) -> List[dict]:
+    pid = os.getpid()
+    with trace.lock:
+        spans = list(trace.spans)
+        threads = dict(trace.threads)
+    events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": n}}
+              for tid, n in threads.items()]
+    for s in spans:
+        end = s.end if s.end is not None else time.perf_counter()
+        events.append({
+            "name": s.name, "cat": s.cat, "ph": "X", "pid": pid, "tid": s.tid,
+            "ts": _us(s.start), "dur": _us(end - s.start),
+            "args": {k: (v if isinstance(v, (int, float, bool)) or v is None else str(v)[:200])
+                     for k, v in s.attrs.items()},
+        })
+    return events
+
+
+def write_chrome_trace(trace: Trace, path: str, report: Optional[dict] = None):
+    """
+    Append events to `path` in Chrome's JSON array format (the closing bracket is
+    optional there), so many runs share one file. The critical-path summary is
+    attached as an instant event on the root.
+    """
+    events = chrome_events(trace)
+    if report is not None:
+        root = trace.spans[0]
+        events.append({"name": "critical_path", "ph": "i", "s": "p", "pid": os.getpid(), "tid": root.tid,
+                       "ts": _us(root.end), "args": report})
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    with _file_lock:
+        fresh = not os.path.exists(path) or os.path.getsize(path) == 0
+        with open(path, "a", encoding="utf-8") as f:
+            if fresh:
+                f.write("[\n")
+            for e in events:
+                f.write(json.dumps(e, ensure_ascii=False) + ",\n")
+
+
+# --- Critical path ---
+def _walk(s: Span, out: List[Tuple[str, float]]):
+    """Walk back from s.end: the latest-finishing child is on the path; gaps are s's own time."""
+    cursor = s.end
+    children = sorted((c for c in s.children if c.end is not None), key=lambda c: c.end, reverse=True)
+    for c in children:
+        if c.end > cursor + _EPS or c.start < s.start - _EPS:
+            continue  # overlapped by a later child that is already on the path
+        out.append((s.label, cursor - c.end))
+        _walk(c, out)
+        cursor = c.start
+    out.append((s.label, cursor - s.start))
+
+
+def critical_path_report(root: Span) -> dict:
+    """Where the wall-clock time of `root` went, along its critical path, largest first."""
+    segments: List[Tuple[str, float]] = []
+    _walk(root, segments)
+    totals: Dict[str, float] = {}
+    for label, secs in segments:
+        if secs > _EPS:
+            totals[label] = totals.get(label, 0.0) + secs
+    total = root.end - root.start
+    with root.trace.lock:
+        spans = list(root.trace.spans)
+    by_cat: Dict[str, float] = {}
+    for label, secs in totals.items():
+        cat = label.rsplit(" > ", 1)[-1].split(":", 1)[0]
+        if cat in ORCHESTRATION_CATS:
+            cat = "orchestration"
+        by_cat[cat] = by_cat.get(cat, 0.0) + secs
+    return {
+        "name": root.name,
+        "total_s": total,
+        "spans": len(spans),
+        "critical_path": [{"span": k, "s": v, "pct": 100.0 * v / total if total else 0.0}
+                          for k, v in sorted(totals.items(), key=lambda kv: kv[1], reverse=True)],
+        "by_category": {k: v for k, v in sorted(by_cat.items(), key=lambda kv: kv[1], reverse=True)},
+    }
+
+
+def last_report() -> Optional[dict]:
+    return _last_report
+
+
+def format_report(report: dict, top: int = 15) -> str:
+    lines = [f"critical path of {report['name']}: {report['total_s'] * 1000:.1f} ms over {report['spans']} spans"]
+    width = max([len(r["span"]) for r in report["critical_path"][:top]] + [10])
+    for r in report["critical_path"][:top]:
+        lines.append(f"  {r['span']:<{width}}  {r['s'] * 1000:>9.1f} ms  {r['pct']:>5.1f}%")
+    lines.append("  by category: " + ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in report["by_category"].items()))
+    return "\n".join(lines)
+
+
+# --- CrewAI instrumentation ---
+_instrumented = False
+
+
+def _wrap(cls, attr: str, cat: str, name_of):
+    fn = getattr(cls, attr, None)
+    if fn is None or getattr(fn, "_traced", False):
+        return
+
+    def traced(self, *args, **kwargs):
+        if _current.get() is None:
+            return fn(self, *args, **kwargs)
+        with _span(_current.get(), name_of(self), cat, {}):
+            return fn(self, *args, **kwargs)
+
+    traced._traced = True
+    traced.__wrapped__ = fn
+    traced.__name__ = getattr(fn, "__name__", attr)
+    traced.__doc__ = fn.__doc__
+    setattr(cls, attr, traced)
+
+
+def instrument_crewai():
+    """Wrap Crew.kickoff, Task.execute_sync and crewai.LLM.call in spans (once; only when tracing is on)."""
+    global _instrumented
+    if _instrumented or not enabled():
+        return
+    _instrumented = True
+    try:
+        from crewai import LLM, Crew, Task
+    except ImportError:
+        return
+    _wrap(Crew, "kickoff", "crew", lambda c: "/".join(getattr(a, "role", "?") for a in c.agents))
+    _wrap(Task, "execute_sync", "task", lambda t: getattr(t.agent, "role", None) or "task")
+    _wrap(LLM, "call", "llm", lambda llm: getattr(llm, "model", "llm"))